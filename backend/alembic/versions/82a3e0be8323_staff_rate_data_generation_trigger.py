@@ -0,0 +1,71 @@
+"""staff rate data generation trigger
+
+Revision ID: 82a3e0be8323
+Revises: a5229accfc4c
+Create Date: 2026-10-16 23:39:29.732134
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '82a3e0be8323'
+down_revision: Union[str, None] = 'a5229accfc4c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Staff rates are maintained directly in the database, so the branch data
+# generation (query cache keys, ETags) is bumped by a trigger rather than by
+# application code. Same NOTIFY payload as query_cache.bump_generation.
+FUNCTION = """
+CREATE FUNCTION staff_rates_bump_generation() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    changed integer[];
+    b integer;
+    g integer;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT branch_id) INTO changed FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT branch_id) INTO changed FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT branch_id) INTO changed
+        FROM (SELECT branch_id FROM new_rows UNION SELECT branch_id FROM old_rows) r;
+    END IF;
+    FOR b, g IN
+        UPDATE branches SET data_generation = data_generation + 1
+        WHERE id = ANY(changed)
+        RETURNING id, data_generation
+    LOOP
+        PERFORM pg_notify('data_generation', b || ':' || g);
+    END LOOP;
+    RETURN NULL;
+END
+$$
+"""
+
+TRIGGERS = {
+    "INSERT": "REFERENCING NEW TABLE AS new_rows",
+    "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "DELETE": "REFERENCING OLD TABLE AS old_rows",
+}
+
+
+def upgrade() -> None:
+    op.execute(FUNCTION)
+    for event, referencing in TRIGGERS.items():
+        op.execute(
+            f"CREATE TRIGGER staff_rates_generation_{event.lower()} AFTER {event} "
+            f"ON staff_rates {referencing} "
+            f"FOR EACH STATEMENT EXECUTE FUNCTION staff_rates_bump_generation()"
+        )
+
+
+def downgrade() -> None:
+    for event in TRIGGERS:
+        op.execute(f"DROP TRIGGER staff_rates_generation_{event.lower()} ON staff_rates")
+    op.execute("DROP FUNCTION staff_rates_bump_generation()")
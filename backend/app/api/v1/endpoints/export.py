@@ -0,0 +1,31 @@
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.services.export_service import EXPORT_FORMATS, check_format, export_stream
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+
+@router.get("/{dataset}")
+async def export_dataset(
+    dataset: Literal["revenue", "labor", "writeoffs"],
+    branch_id: list[int] = Query(default=[1]),
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    format: Literal["csv", "xlsx", "parquet"] = Query(default="csv"),
+):
+    """Download rows of one or more branches as a file, streamed as it is produced."""
+    try:
+        check_format(format)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    branch_ids = list(dict.fromkeys(branch_id))
+    filename = f"{dataset}_{date_from.isoformat()}_{date_to.isoformat()}.{format}"
+    return StreamingResponse(
+        export_stream(dataset, format, branch_ids, date_from, date_to),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,19 +1,84 @@
 from datetime import date
+from typing import Literal
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 
-from app.api.v1.schemas.revenue import RevenueRow
-from app.dependencies import SessionDep
-from app.services.revenue_service import get_revenue
+from app.api.v1.schemas.common import Page
+from app.api.v1.schemas.revenue import GroupedRevenueRow, RevenueRow
+from app.dependencies import ConditionalGet, SessionDep
+from app.services.query_cache import cached
+from app.services.revenue_service import get_revenue, get_revenue_grouped, get_revenue_page
 
 router = APIRouter(prefix="/revenue", tags=["revenue"])
 
+Dimension = Literal["date", "week", "month", "order_type", "order_type_detail", "item_name"]
+Metric = Literal["revenue", "quantity", "adjusted_quantity"]
 
-@router.get("", response_model=list[RevenueRow])
+
+@router.get("", response_model=list[RevenueRow], dependencies=[ConditionalGet])
 async def list_revenue(
     session: SessionDep,
     branch_id: int = Query(default=1),
     date_from: date = Query(...),
     date_to: date = Query(...),
 ):
-    return await get_revenue(session, branch_id, date_from, date_to)
+    return await cached(
+        "revenue",
+        branch_id,
+        date_from,
+        date_to,
+        lambda: get_revenue(session, branch_id, date_from, date_to),
+    )
+
+
+@router.get("/page", response_model=Page[RevenueRow], dependencies=[ConditionalGet])
+async def page_revenue(
+    session: SessionDep,
+    branch_id: int = Query(default=1),
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    sort: Literal["date", "amount", "item"] = Query(default="date"),
+    order: Literal["asc", "desc"] = Query(default="asc"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = Query(default=None),
+    order_type: str | None = Query(default=None),
+    item: str | None = Query(default=None, description="Dish name substring"),
+):
+    try:
+        return await get_revenue_page(
+            session,
+            branch_id,
+            date_from,
+            date_to,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            order_type=order_type,
+            item=item,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/grouped",
+    response_model=list[GroupedRevenueRow],
+    response_model_exclude_unset=True,
+    dependencies=[ConditionalGet],
+)
+async def grouped_revenue(
+    session: SessionDep,
+    branch_id: int = Query(default=1),
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    group_by: list[Dimension] = Query(default=["date"]),
+    metrics: list[Metric] = Query(default=["revenue", "quantity", "adjusted_quantity"]),
+):
+    return await cached(
+        f"revenue_grouped:{','.join(group_by)}:{','.join(metrics)}",
+        branch_id,
+        date_from,
+        date_to,
+        lambda: get_revenue_grouped(session, branch_id, date_from, date_to, group_by, metrics),
+    )
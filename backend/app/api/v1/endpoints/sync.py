@@ -1,19 +1,23 @@
-import asyncio
 from datetime import date, timedelta
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from sqlalchemy import select
 
 from app.api.v1.schemas.sync import (
+    ReferenceRefreshResponse,
+    RollupRebuildResponse,
+    SyncJobResponse,
     SyncStatusResponse,
     SyncTriggerRequest,
     SyncTriggerResponse,
 )
 from app.dependencies import SessionDep
-from app.models import SyncLog
-from app.services.iiko_client import IikoClient, IikoAuthError
-from app.services.sync_service import daily_sync
+from app.models import SyncJob, SyncLog
+from app.services.iiko_client import IikoClient, IikoAuthError, iiko_sessions
+from app.services.job_queue import enqueue_sync
+from app.services.reference_cache import REFERENCE_KINDS, refresh_references
+from app.services.rollup_service import rebuild_rollups
 
 router = APIRouter(prefix="/sync", tags=["sync"])
 
@@ -24,13 +28,19 @@ class IikoHealthResponse(BaseModel):
     auth_ok: bool = False
     auth_error: str | None = None
     departments: list[dict] | None = None
+    circuit_state: str = "closed"
+    client_stats: dict | None = None  # retry / failure counters since process start
 
 
 @router.get("/health/iiko", response_model=IikoHealthResponse)
 async def iiko_health_check():
     """Check iiko server connectivity, auth, and retrieve departments."""
     client = IikoClient()
-    result = IikoHealthResponse(server_reachable=False)
+    result = IikoHealthResponse(
+        server_reachable=False,
+        circuit_state=iiko_sessions.breaker.state,
+        client_stats=iiko_sessions.stats.snapshot(),
+    )
 
     # Check licence (no auth needed)
     try:
@@ -54,22 +64,63 @@ async def iiko_health_check():
 
 @router.post("/trigger", response_model=SyncTriggerResponse)
 async def trigger_sync(session: SessionDep, body: SyncTriggerRequest | None = None):
-    """Manually trigger a sync. Defaults to yesterday if no dates provided."""
+    """Queue a sync for the worker. Defaults to yesterday if no dates provided.
+
+    With date_to after date_from the range runs as a chunked, resumable
+    backfill; re-posting the same range continues an interrupted one. While
+    a job for the same window is queued or running, that job is returned.
+    """
     target = None
     if body and body.date_from:
         target = body.date_from
     else:
         target = date.today() - timedelta(days=1)
 
-    # Run sync in background task
-    asyncio.create_task(daily_sync(target_date=target, sync_type="manual"))
+    if body and body.date_to and body.date_to > target:
+        kind, date_to = "backfill", body.date_to
+        period = f"Backfill {target.isoformat()}..{date_to.isoformat()}"
+    else:
+        kind, date_to = "daily", target
+        period = f"Sync for {target.isoformat()}"
 
+    job, created = await enqueue_sync(session, kind, target, date_to, sync_type="manual")
     return SyncTriggerResponse(
-        sync_batch_id="pending",
-        message=f"Sync triggered for {target.isoformat()}",
+        job_id=job.id,
+        status=job.status,
+        message=f"{period} {'queued' if created else 'already ' + job.status}",
     )
 
 
+@router.get("/jobs/{job_id}", response_model=SyncJobResponse)
+async def sync_job_status(session: SessionDep, job_id: int):
+    """Status of a queued sync job."""
+    job = await session.get(SyncJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return SyncJobResponse.model_validate(job, from_attributes=True)
+
+
+@router.post("/rollup/rebuild", response_model=RollupRebuildResponse)
+async def rebuild_rollup(session: SessionDep, branch_id: int = Query(default=1)):
+    """Rebuild the daily KPF rollup over a branch's full history.
+
+    Run once for data synced before the rollup existed; KPF aggregates those
+    days live until then.
+    """
+    days = await rebuild_rollups(session, branch_id)
+    return RollupRebuildResponse(branch_id=branch_id, days_refreshed=days)
+
+
+@router.post("/reference/refresh", response_model=ReferenceRefreshResponse)
+async def refresh_reference_cache(kind: list[str] | None = Query(default=None)):
+    """Re-download cached iiko reference dictionaries (all kinds by default)."""
+    kinds = [k for k in (kind or REFERENCE_KINDS) if k in REFERENCE_KINDS]
+    client = IikoClient()
+    async with client.session():
+        counts = await refresh_references(client, kinds)
+    return ReferenceRefreshResponse(counts=counts)
+
+
 @router.get("/status", response_model=SyncStatusResponse | None)
 async def sync_status(session: SessionDep):
     """Get latest sync log."""
@@ -81,9 +132,11 @@ async def sync_status(session: SessionDep):
         return None
     return SyncStatusResponse(
         batch_id=log.batch_id,
+        branch_id=log.branch_id,
         sync_type=log.sync_type,
         status=log.status,
         records_processed=log.records_processed,
+        stages_skipped=log.stages_skipped.split(",") if log.stages_skipped else [],
         error_message=log.error_message,
         started_at=log.started_at,
         completed_at=log.completed_at,
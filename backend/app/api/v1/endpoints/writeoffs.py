@@ -1,29 +1,80 @@
 from datetime import date
+from typing import Literal
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 
+from app.api.v1.schemas.common import Page
 from app.api.v1.schemas.writeoffs import WriteoffRow, WriteoffSummaryRow
-from app.dependencies import SessionDep
-from app.services.writeoff_service import get_writeoff_summary, get_writeoffs
+from app.dependencies import ConditionalGet, SessionDep
+from app.services.query_cache import cached
+from app.services.writeoff_service import (
+    get_writeoff_summary,
+    get_writeoffs,
+    get_writeoffs_page,
+)
 
 router = APIRouter(prefix="/writeoffs", tags=["writeoffs"])
 
 
-@router.get("", response_model=list[WriteoffRow])
+@router.get("", response_model=list[WriteoffRow], dependencies=[ConditionalGet])
 async def list_writeoffs(
     session: SessionDep,
     branch_id: int = Query(default=1),
     date_from: date = Query(...),
     date_to: date = Query(...),
 ):
-    return await get_writeoffs(session, branch_id, date_from, date_to)
+    return await cached(
+        "writeoffs",
+        branch_id,
+        date_from,
+        date_to,
+        lambda: get_writeoffs(session, branch_id, date_from, date_to),
+    )
 
 
-@router.get("/summary", response_model=list[WriteoffSummaryRow])
+@router.get("/page", response_model=Page[WriteoffRow], dependencies=[ConditionalGet])
+async def page_writeoffs(
+    session: SessionDep,
+    branch_id: int = Query(default=1),
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+    sort: Literal["date", "amount", "item"] = Query(default="date"),
+    order: Literal["asc", "desc"] = Query(default="asc"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = Query(default=None),
+    category: str | None = Query(default=None),
+    item: str | None = Query(default=None, description="Product name substring"),
+):
+    try:
+        return await get_writeoffs_page(
+            session,
+            branch_id,
+            date_from,
+            date_to,
+            sort=sort,
+            order=order,
+            limit=limit,
+            cursor=cursor,
+            category=category,
+            item=item,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/summary", response_model=list[WriteoffSummaryRow], dependencies=[ConditionalGet]
+)
 async def writeoff_summary(
     session: SessionDep,
     branch_id: int = Query(default=1),
     date_from: date = Query(...),
     date_to: date = Query(...),
 ):
-    return await get_writeoff_summary(session, branch_id, date_from, date_to)
+    return await cached(
+        "writeoff_summary",
+        branch_id,
+        date_from,
+        date_to,
+        lambda: get_writeoff_summary(session, branch_id, date_from, date_to),
+    )
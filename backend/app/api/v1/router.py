@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import branches, dashboard, labor, revenue, sync, writeoffs
+from app.api.v1.endpoints import branches, dashboard, export, labor, revenue, sync, writeoffs
 
 v1_router = APIRouter()
 
@@ -8,5 +8,6 @@ v1_router.include_router(dashboard.router)
 v1_router.include_router(revenue.router)
 v1_router.include_router(labor.router)
 v1_router.include_router(writeoffs.router)
+v1_router.include_router(export.router)
 v1_router.include_router(sync.router)
 v1_router.include_router(branches.router)
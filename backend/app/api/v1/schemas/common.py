@@ -1,9 +1,19 @@
 from datetime import date
+from typing import Generic, TypeVar
 
 from pydantic import BaseModel
 
+T = TypeVar("T")
+
 
 class DateRangeParams(BaseModel):
     branch_id: int = 1
     date_from: date
     date_to: date
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None  # pass back as ?cursor= for the next page
+    total_estimate: int  # matching rows, counted up to a cap
+    total_exact: bool  # False when total_estimate hit the cap
@@ -1,3 +1,4 @@
+import datetime
 from datetime import date
 from decimal import Decimal
 
@@ -13,3 +14,16 @@ class RevenueRow(BaseModel):
     item_name: str | None = None
     item_quantity: Decimal | None = None
     item_quantity_adjusted: Decimal | None = None
+
+
+class GroupedRevenueRow(BaseModel):
+    # Only the requested dimensions and metrics are present
+    date: datetime.date | None = None  # the field name rebinds `date` in this body
+    week: datetime.date | None = None  # Monday of the week
+    month: datetime.date | None = None  # first day of the month
+    order_type: str | None = None
+    order_type_detail: str | None = None
+    item_name: str | None = None
+    revenue: Decimal | None = None
+    quantity: Decimal | None = None
+    adjusted_quantity: Decimal | None = None
@@ -9,15 +9,41 @@ class SyncTriggerRequest(BaseModel):
 
 
 class SyncTriggerResponse(BaseModel):
-    sync_batch_id: str
+    job_id: int
+    status: str  # queued / running — an identical active job is reused
     message: str
 
 
+class SyncJobResponse(BaseModel):
+    id: int
+    kind: str
+    date_from: date
+    date_to: date
+    status: str
+    attempts: int
+    records_processed: int
+    error_message: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    completed_at: datetime | None = None
+
+
 class SyncStatusResponse(BaseModel):
     batch_id: str
+    branch_id: int | None = None
     sync_type: str
     status: str
     records_processed: int
+    stages_skipped: list[str] = []  # stages whose payload was unchanged (no DB writes)
     error_message: str | None = None
     started_at: datetime
     completed_at: datetime | None = None
+
+
+class RollupRebuildResponse(BaseModel):
+    branch_id: int
+    days_refreshed: int
+
+
+class ReferenceRefreshResponse(BaseModel):
+    counts: dict[str, int]  # reference kind → entries downloaded
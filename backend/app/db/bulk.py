@@ -0,0 +1,109 @@
+"""Bulk row writers that bypass ORM unit-of-work for high-volume ETL inserts."""
+
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Iterable
+
+from sqlalchemy import column, insert, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import TableClause
+
+
+async def copy_rows(session: AsyncSession, table: TableClause, rows: list[dict]) -> int:
+    """Insert plain dict rows inside the session's current transaction.
+
+    Uses asyncpg's binary COPY (copy_records_to_table) when the session runs on
+    asyncpg; otherwise falls back to a single executemany Core INSERT. Columns
+    are taken from the first row; omitted columns get their server defaults.
+    No ORM instances are created and nothing is committed.
+    """
+    if not rows:
+        return 0
+    columns = list(rows[0])
+    conn = await session.connection()
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    if hasattr(driver, "copy_records_to_table"):
+        await driver.copy_records_to_table(
+            table.name,
+            records=[tuple(r[c] for c in columns) for r in rows],
+            columns=columns,
+            schema_name=table.schema,
+        )
+    else:
+        await session.execute(insert(table), rows)
+    return len(rows)
+
+
+async def create_staging_table(
+    session: AsyncSession, target: TableClause, columns: list[str]
+) -> TableClause:
+    """Create an empty temp table with ``columns`` of ``target``, dropped on commit.
+
+    Used to spool a large stream out of memory before it is merged into the
+    target in one statement.
+    """
+    name = f"_staging_{target.name}"
+    cols = ", ".join(f'"{c}"' for c in columns)
+    await session.execute(
+        text(
+            f'CREATE TEMP TABLE "{name}" ON COMMIT DROP AS '
+            f'SELECT {cols} FROM "{target.name}" WITH NO DATA'
+        )
+    )
+    return table(name, *(column(c) for c in columns))
+
+
+async def drop_staging_table(session: AsyncSession, staging: TableClause) -> None:
+    """Drop a staging table before commit (when its rows are not needed)."""
+    await session.execute(text(f'DROP TABLE "{staging.name}"'))
+
+
+async def abatched(
+    rows: AsyncIterable[dict] | Iterable[dict], size: int
+) -> AsyncIterator[list[dict]]:
+    """Group a sync or async row stream into lists of at most ``size`` rows."""
+    batch: list[dict] = []
+    if isinstance(rows, AsyncIterable):
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    else:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+async def prefetch(items: AsyncIterable, depth: int = 2) -> AsyncIterator:
+    """Read ``items`` in a background task, at most ``depth`` ahead of the consumer.
+
+    Lets network reads of the next batches overlap with DB writes of the
+    current one while keeping memory bounded.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=depth)
+    done = object()
+
+    async def produce() -> None:
+        try:
+            async for item in items:
+                await queue.put(item)
+            await queue.put(done)
+        except Exception as e:  # re-raised in the consumer
+            await queue.put(e)
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        task.cancel()
@@ -1,9 +1,13 @@
+import hashlib
+from datetime import date
 from typing import Annotated, AsyncGenerator
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.engine import async_session
+from app.services.checkpoint_service import latest_write
+from app.services.query_cache import cached
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -12,3 +16,52 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 
 
 SessionDep = Annotated[AsyncSession, Depends(get_session)]
+
+
+def make_etag(path: str, params: list[tuple[str, str]], version: str) -> str:
+    """Strong ETag for a read of ``path`` with ``params`` at a data version."""
+    raw = "\n".join([path, *(f"{k}={v}" for k, v in sorted(params)), version])
+    return f'"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    session: SessionDep,
+    branch_id: int = Query(default=1),
+    date_from: date = Query(...),
+    date_to: date = Query(...),
+) -> None:
+    """Tag a branch/date-range read with an ETag; answer a matching If-None-Match with 304.
+
+    The tag follows the branch's data generation and the last sync batch
+    that wrote into the range, so the 304 is decided before any service
+    query runs (and, with the query cache following data generations,
+    without a database round-trip).
+    """
+    version = await cached(
+        "data_version",
+        branch_id,
+        date_from,
+        date_to,
+        lambda: latest_write(session, branch_id, date_from, date_to),
+    )
+    etag = make_etag(request.url.path, request.query_params.multi_items(), version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+ConditionalGet = Depends(conditional_get)
@@ -1,19 +1,25 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.router import v1_router
 from app.core.logger import logger
-from app.worker.scheduler import start_scheduler, shutdown_scheduler
+from app.services.iiko_client import iiko_sessions
+from app.services.query_cache import listen_for_generations
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Syncs and the nightly schedule run in the worker process (app.worker)
     logger.info("Starting iiko KPF backend...")
-    start_scheduler()
+    listener = asyncio.create_task(listen_for_generations())
     yield
-    shutdown_scheduler()
+    listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await listener
+    await iiko_sessions.close()
     logger.info("Shutting down iiko KPF backend.")
 
 
@@ -1,15 +1,26 @@
+from app.models.backfill_chunk import BackfillChunk
 from app.models.branch import Branch
+from app.models.daily_kpf_rollup import DailyKpfRollup
 from app.models.daily_revenue import DailyRevenue
 from app.models.employee_attendance import EmployeeAttendance
+from app.models.reference_entry import ReferenceEntry, ReferenceRefresh
 from app.models.staff_rate import StaffRate
 from app.models.writeoff import Writeoff
+from app.models.sync_checkpoint import SyncCheckpoint
+from app.models.sync_job import SyncJob
 from app.models.sync_log import SyncLog
 
 __all__ = [
+    "BackfillChunk",
     "Branch",
+    "DailyKpfRollup",
     "DailyRevenue",
     "EmployeeAttendance",
+    "ReferenceEntry",
+    "ReferenceRefresh",
     "StaffRate",
     "Writeoff",
+    "SyncCheckpoint",
+    "SyncJob",
     "SyncLog",
 ]
@@ -0,0 +1,30 @@
+from datetime import date, datetime
+
+from sqlalchemy import ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.base import TimestampMixin
+
+
+class BackfillChunk(TimestampMixin, Base):
+    """Progress of one backfill chunk (date window) for one branch.
+
+    A re-run of the same backfill skips chunks already marked success.
+    """
+
+    __tablename__ = "backfill_chunks"
+    __table_args__ = (
+        UniqueConstraint(
+            "branch_id", "chunk_from", "chunk_to", name="uq_backfill_chunks_branch_window"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    branch_id: Mapped[int] = mapped_column(ForeignKey("branches.id"))
+    chunk_from: Mapped[date]
+    chunk_to: Mapped[date]
+    status: Mapped[str] = mapped_column(String(16))  # success / failed
+    records_processed: Mapped[int] = mapped_column(default=0)
+    error_message: Mapped[str | None] = mapped_column(Text)
+    completed_at: Mapped[datetime | None]
@@ -14,6 +14,8 @@ class Branch(TimestampMixin, Base):
     city: Mapped[str | None] = mapped_column(String(128))
     territory: Mapped[str | None] = mapped_column(String(128))
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Bumped whenever a sync changes the branch's data; see query_cache.
+    data_generation: Mapped[int] = mapped_column(default=0, server_default="0")
 
     revenues: Mapped[list["DailyRevenue"]] = relationship(back_populates="branch")  # noqa: F821
     attendances: Mapped[list["EmployeeAttendance"]] = relationship(back_populates="branch")  # noqa: F821
@@ -0,0 +1,45 @@
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import ForeignKey, Numeric, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.base import TimestampMixin
+
+
+class DailyKpfRollup(TimestampMixin, Base):
+    """Pre-aggregated KPF inputs, one row per branch per day.
+
+    Refreshed by sync from daily_revenue / employee_attendance / writeoffs;
+    dashboard KPF queries sum these rows instead of scanning item-level data.
+    """
+
+    __tablename__ = "daily_kpf_rollup"
+    __table_args__ = (
+        UniqueConstraint("branch_id", "date", name="uq_daily_kpf_rollup_branch_date"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    branch_id: Mapped[int] = mapped_column(ForeignKey("branches.id"))
+    date: Mapped[date]
+
+    revenue_delivery: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    revenue_hall: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    revenue_excluded: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+
+    labor_total: Mapped[Decimal] = mapped_column(Numeric(16, 4), default=0)
+    labor_kitchen: Mapped[Decimal] = mapped_column(Numeric(16, 4), default=0)
+    labor_hall: Mapped[Decimal] = mapped_column(Numeric(16, 4), default=0)
+    labor_hours: Mapped[Decimal] = mapped_column(Numeric(10, 2), default=0)
+
+    writeoff_total: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
+    writeoffs_by_category: Mapped[dict] = mapped_column(JSONB, default=dict)  # category → amount
+
+    khinkali_count: Mapped[Decimal] = mapped_column(Numeric(12, 3), default=0)
+    upsell_uzvar_qty: Mapped[Decimal] = mapped_column(Numeric(12, 3), default=0)
+    upsell_sauce_qty: Mapped[Decimal] = mapped_column(Numeric(12, 3), default=0)
+    upsell_bread_qty: Mapped[Decimal] = mapped_column(Numeric(12, 3), default=0)
+
+    sync_batch_id: Mapped[str | None] = mapped_column(String(64))
@@ -1,7 +1,7 @@
 from datetime import date
 from decimal import Decimal
 
-from sqlalchemy import ForeignKey, Index, Numeric, String
+from sqlalchemy import ForeignKey, Numeric, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -11,7 +11,20 @@ from app.models.base import TimestampMixin
 class DailyRevenue(TimestampMixin, Base):
     __tablename__ = "daily_revenue"
     __table_args__ = (
-        Index("ix_daily_revenue_branch_date", "branch_id", "date"),
+        # Natural key of an OLAP SALES row; also serves (branch_id, date) lookups.
+        # Source and dish may be NULL, which must still match on upsert.
+        # order_type follows from type and source for synced rows; it keeps
+        # rows stored before delivery_source existed apart by class.
+        UniqueConstraint(
+            "branch_id",
+            "date",
+            "order_type_detail",
+            "delivery_source",
+            "item_name",
+            "order_type",
+            name="uq_daily_revenue_natural_key",
+            postgresql_nulls_not_distinct=True,
+        ),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -19,6 +32,7 @@ class DailyRevenue(TimestampMixin, Base):
     date: Mapped[date]
     order_type: Mapped[str] = mapped_column(String(32))  # delivery / hall / excluded
     order_type_detail: Mapped[str] = mapped_column(String(128))  # original iiko value
+    delivery_source: Mapped[str | None] = mapped_column(String(128))  # iiko Delivery.SourceKey
     revenue_amount: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
     order_count: Mapped[int] = mapped_column(default=0)
     item_name: Mapped[str | None] = mapped_column(String(255))
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.base import TimestampMixin
+
+
+class ReferenceEntry(TimestampMixin, Base):
+    """Cached iiko reference dictionary entry (kind: roles / employees /
+    products / accounts / store_departments), id → value."""
+
+    __tablename__ = "reference_entries"
+    __table_args__ = (
+        UniqueConstraint("kind", "iiko_id", name="uq_reference_entries_kind_iiko_id"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32))
+    iiko_id: Mapped[str] = mapped_column(String(64))
+    value: Mapped[str] = mapped_column(Text)
+
+
+class ReferenceRefresh(TimestampMixin, Base):
+    """When each reference dictionary kind was last downloaded from iiko."""
+
+    __tablename__ = "reference_refreshes"
+
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    refreshed_at: Mapped[datetime]
+    entry_count: Mapped[int] = mapped_column(default=0)
@@ -14,6 +14,7 @@ class StaffRate(TimestampMixin, Base):
     __tablename__ = "staff_rates"
     __table_args__ = (
         Index("ix_staff_rates_employee_current", "employee_id", "is_current"),
+        Index("ix_staff_rates_branch_employee_valid", "branch_id", "employee_id", "valid_from"),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
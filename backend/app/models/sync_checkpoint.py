@@ -0,0 +1,37 @@
+from datetime import date
+
+from sqlalchemy import ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.base import TimestampMixin
+
+
+class SyncCheckpoint(TimestampMixin, Base):
+    """Outcome of one sync stage (revenue / attendance / writeoffs / rollup)
+    for one branch and date window. A daily sync is the window
+    date_from == date_to.
+
+    payload_hash fingerprints the rows the stage wrote, so a re-run whose
+    payload is unchanged can skip the write. For the rollup it fingerprints
+    the stage hashes the rollup was computed from.
+    """
+
+    __tablename__ = "sync_checkpoints"
+    __table_args__ = (
+        UniqueConstraint(
+            "branch_id", "date_from", "date_to", "stage", name="uq_sync_checkpoints_branch_window_stage"
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    branch_id: Mapped[int] = mapped_column(ForeignKey("branches.id"))
+    date_from: Mapped[date]
+    date_to: Mapped[date]
+    stage: Mapped[str] = mapped_column(String(32))
+    status: Mapped[str] = mapped_column(String(16))  # success / failed
+    row_count: Mapped[int] = mapped_column(default=0)
+    duration_ms: Mapped[int] = mapped_column(default=0)
+    payload_hash: Mapped[str | None] = mapped_column(String(80))
+    batch_id: Mapped[str | None] = mapped_column(String(64))
+    error_message: Mapped[str | None] = mapped_column(Text)
@@ -0,0 +1,47 @@
+from datetime import date, datetime
+
+from sqlalchemy import Index, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.models.base import TimestampMixin
+
+
+class SyncJob(TimestampMixin, Base):
+    """A queued sync run, executed by the worker process (app.worker).
+
+    Workers claim queued jobs with SELECT ... FOR UPDATE SKIP LOCKED, so each
+    job runs once however many workers poll. At most one queued or running
+    job exists per (kind, window): enqueueing a duplicate returns it instead.
+    """
+
+    __tablename__ = "sync_jobs"
+    __table_args__ = (
+        Index(
+            "uq_sync_jobs_active_window",
+            "kind",
+            "date_from",
+            "date_to",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        Index(
+            "ix_sync_jobs_queued",
+            "id",
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(16))  # daily / backfill / trailing
+    date_from: Mapped[date]
+    date_to: Mapped[date]
+    sync_type: Mapped[str] = mapped_column(String(32))  # daily / manual / backfill
+    status: Mapped[str] = mapped_column(String(16))  # queued / running / success / failed
+    attempts: Mapped[int] = mapped_column(default=0)
+    records_processed: Mapped[int] = mapped_column(default=0)
+    error_message: Mapped[str | None] = mapped_column(Text)
+    worker_id: Mapped[str | None] = mapped_column(String(64))
+    started_at: Mapped[datetime | None]
+    heartbeat_at: Mapped[datetime | None]  # refreshed while running; stale = worker died
+    completed_at: Mapped[datetime | None]
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import String, Text
+from sqlalchemy import ForeignKey, String, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.base import Base
@@ -12,9 +12,11 @@ class SyncLog(TimestampMixin, Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     batch_id: Mapped[str] = mapped_column(String(64), unique=True)
+    branch_id: Mapped[int | None] = mapped_column(ForeignKey("branches.id"))
     sync_type: Mapped[str] = mapped_column(String(32))  # daily / manual
     status: Mapped[str] = mapped_column(String(16))  # running / success / failed
     records_processed: Mapped[int] = mapped_column(default=0)
+    stages_skipped: Mapped[str | None] = mapped_column(String(64))  # e.g. "revenue,rollup"
     error_message: Mapped[str | None] = mapped_column(Text)
     started_at: Mapped[datetime]
     completed_at: Mapped[datetime | None]
@@ -1,7 +1,7 @@
 from datetime import date
 from decimal import Decimal
 
-from sqlalchemy import ForeignKey, Index, Numeric, String
+from sqlalchemy import ForeignKey, Index, Numeric, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -12,6 +12,9 @@ class Writeoff(TimestampMixin, Base):
     __tablename__ = "writeoffs"
     __table_args__ = (
         Index("ix_writeoffs_branch_date", "branch_id", "date"),
+        UniqueConstraint(
+            "iiko_document_id", "line_number", name="uq_writeoffs_document_line"
+        ),
     )
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -21,6 +24,8 @@ class Writeoff(TimestampMixin, Base):
     category: Mapped[str] = mapped_column(String(64))  # mapped: spoilage/marketing/promo/...
     amount: Mapped[Decimal] = mapped_column(Numeric(14, 2), default=0)
     document_number: Mapped[str | None] = mapped_column(String(64))
+    iiko_document_id: Mapped[str | None] = mapped_column(String(64))
+    line_number: Mapped[int | None]  # item "num" within the document
     account_name: Mapped[str | None] = mapped_column(String(255))
     product_name: Mapped[str | None] = mapped_column(String(255))
     item_quantity: Mapped[Decimal | None] = mapped_column(Numeric(12, 3))
@@ -0,0 +1,146 @@
+"""Date-range backfill: chunked, concurrent, resumable runs of the sync pipeline."""
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.engine import async_session
+from app.models import BackfillChunk, Branch
+from app.services.iiko_client import IikoClient
+from app.services.sync_service import BranchSyncError, get_active_branches, sync_window
+
+
+def split_range(date_from: date, date_to: date, chunk_days: int) -> list[tuple[date, date]]:
+    """Split [date_from, date_to] into consecutive inclusive windows of chunk_days."""
+    chunk_days = max(chunk_days, 1)
+    chunks = []
+    start = date_from
+    while start <= date_to:
+        end = min(start + timedelta(days=chunk_days - 1), date_to)
+        chunks.append((start, end))
+        start = end + timedelta(days=1)
+    return chunks
+
+
+async def backfill(date_from: date, date_to: date, sync_type: str = "backfill") -> int:
+    """Sync every active branch over [date_from, date_to].
+
+    The range is split into BACKFILL_CHUNK_DAYS windows; each window is one
+    OLAP / attendance / documents request set, and at most
+    BACKFILL_CONCURRENCY windows are in flight over a single iiko login.
+    Progress is recorded per branch and window in backfill_chunks, so
+    re-running the same range after an interruption only redoes the windows
+    that did not succeed (chunk boundaries must match, i.e. same
+    BACKFILL_CHUNK_DAYS).
+    """
+    chunks = split_range(date_from, date_to, settings.BACKFILL_CHUNK_DAYS)
+
+    async with async_session() as session:
+        branches = await get_active_branches(session)
+        result = await session.execute(
+            select(BackfillChunk.branch_id, BackfillChunk.chunk_from, BackfillChunk.chunk_to)
+            .where(
+                and_(
+                    BackfillChunk.status == "success",
+                    BackfillChunk.chunk_from >= date_from,
+                    BackfillChunk.chunk_to <= date_to,
+                )
+            )
+        )
+        done = set(result.tuples().all())
+
+    pending = []
+    for chunk_from, chunk_to in chunks:
+        todo = [b for b in branches if (b.id, chunk_from, chunk_to) not in done]
+        if todo:
+            pending.append((chunk_from, chunk_to, todo))
+    logger.info(
+        f"Backfill {date_from}..{date_to}: {len(chunks)} chunk(s), "
+        f"{len(chunks) - len(pending)} already done"
+    )
+    if not pending:
+        return 0
+
+    semaphore = asyncio.Semaphore(settings.BACKFILL_CONCURRENCY)
+    client = IikoClient()
+    async with client.session():
+
+        async def run(chunk_from: date, chunk_to: date, todo: list[Branch]) -> dict[str, str]:
+            async with semaphore:
+                try:
+                    outcomes = await sync_window(client, todo, chunk_from, chunk_to, sync_type)
+                except Exception as e:
+                    # Shared fetch failed: the whole window failed for every branch
+                    logger.error(f"Backfill chunk {chunk_from}..{chunk_to} failed: {e}")
+                    outcomes = [e] * len(todo)
+                await _record_chunk(todo, chunk_from, chunk_to, outcomes)
+                return {
+                    f"{b.name} {chunk_from}..{chunk_to}": str(o)[:200]
+                    for b, o in zip(todo, outcomes)
+                    if isinstance(o, BaseException)
+                }
+
+        results = await asyncio.gather(*(run(*p) for p in pending))
+
+    async with async_session() as session:
+        result = await session.execute(
+            select(BackfillChunk.records_processed).where(
+                and_(
+                    BackfillChunk.status == "success",
+                    BackfillChunk.chunk_from >= date_from,
+                    BackfillChunk.chunk_to <= date_to,
+                )
+            )
+        )
+        total_records = sum(result.scalars().all())
+
+    failed = {k: v for r in results for k, v in r.items()}
+    logger.info(
+        f"Backfill {date_from}..{date_to} done — {total_records} records, "
+        f"{len(failed)} failed branch chunk(s)"
+    )
+    if failed:
+        raise BranchSyncError(failed)
+    return total_records
+
+
+async def _record_chunk(
+    branches: list[Branch],
+    chunk_from: date,
+    chunk_to: date,
+    outcomes: list[int | BaseException],
+) -> None:
+    """Upsert the progress row of each branch for one window."""
+    now = datetime.utcnow()
+    rows = []
+    for branch, outcome in zip(branches, outcomes):
+        failed = isinstance(outcome, BaseException)
+        rows.append(
+            {
+                "branch_id": branch.id,
+                "chunk_from": chunk_from,
+                "chunk_to": chunk_to,
+                "status": "failed" if failed else "success",
+                "records_processed": 0 if failed else outcome,
+                "error_message": str(outcome)[:2000] if failed else None,
+                "completed_at": now,
+            }
+        )
+    stmt = insert(BackfillChunk).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_backfill_chunks_branch_window",
+        set_={
+            "status": stmt.excluded.status,
+            "records_processed": stmt.excluded.records_processed,
+            "error_message": stmt.excluded.error_message,
+            "completed_at": stmt.excluded.completed_at,
+            "updated_at": now,
+        },
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
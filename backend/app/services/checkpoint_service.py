@@ -0,0 +1,95 @@
+"""Per-stage sync checkpoints: what each stage last wrote for a branch and window."""
+
+from datetime import date
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Branch, SyncCheckpoint
+
+
+async def get_checkpoint(
+    session: AsyncSession, branch_id: int, date_from: date, date_to: date, stage: str
+) -> SyncCheckpoint | None:
+    result = await session.execute(
+        select(SyncCheckpoint).where(
+            and_(
+                SyncCheckpoint.branch_id == branch_id,
+                SyncCheckpoint.date_from == date_from,
+                SyncCheckpoint.date_to == date_to,
+                SyncCheckpoint.stage == stage,
+            )
+        )
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def save_checkpoint(
+    session: AsyncSession,
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    stage: str,
+    status: str,
+    row_count: int = 0,
+    duration_ms: int = 0,
+    payload_hash: str | None = None,
+    batch_id: str | None = None,
+    error_message: str | None = None,
+) -> None:
+    """Insert or overwrite the checkpoint of one stage. Does not commit.
+
+    A failed checkpoint has no payload_hash, so the next attempt always
+    rewrites the stage.
+    """
+    values = {
+        "status": status,
+        "row_count": row_count,
+        "duration_ms": duration_ms,
+        "payload_hash": payload_hash,
+        "batch_id": batch_id,
+        "error_message": error_message,
+    }
+    stmt = insert(SyncCheckpoint).values(
+        branch_id=branch_id, date_from=date_from, date_to=date_to, stage=stage, **values
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_sync_checkpoints_branch_window_stage",
+        set_={**values, "updated_at": func.now()},
+    )
+    await session.execute(stmt)
+
+
+async def latest_write(
+    session: AsyncSession, branch_id: int, date_from: date, date_to: date
+) -> str:
+    """Identify the data a read of a branch's range reflects.
+
+    Combines the branch's data generation (moved by rollup rebuilds and
+    staff-rate edits as well as syncs) with the last successful write to
+    any day of the range. Stages that skipped an unchanged payload keep
+    their older checkpoint. Empty for an unknown branch.
+    """
+    result = await session.execute(
+        select(Branch.data_generation, SyncCheckpoint.batch_id, SyncCheckpoint.updated_at)
+        .outerjoin(
+            SyncCheckpoint,
+            and_(
+                SyncCheckpoint.branch_id == Branch.id,
+                SyncCheckpoint.status == "success",
+                SyncCheckpoint.date_from <= date_to,
+                SyncCheckpoint.date_to >= date_from,
+            ),
+        )
+        .where(Branch.id == branch_id)
+        .order_by(SyncCheckpoint.updated_at.desc().nulls_last(), SyncCheckpoint.id.desc())
+        .limit(1)
+    )
+    row = result.first()
+    if row is None:
+        return ""
+    if row.batch_id is None:
+        return f"g{row.data_generation}"
+    return f"g{row.data_generation}/{row.batch_id}@{row.updated_at.isoformat()}"
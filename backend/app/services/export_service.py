@@ -0,0 +1,289 @@
+"""Streaming exports of revenue, labor and write-offs as CSV, XLSX or Parquet.
+
+Rows are read through a server-side cursor (``AsyncSession.stream`` with
+``yield_per``) in index order, so Postgres returns the first rows without
+sorting the whole range and neither the database nor the API holds the
+full result. CSV and Parquet bytes are produced batch by batch as rows
+arrive. XLSX is a zip archive that is only valid once complete: it is
+built in openpyxl's write-only mode (rows go to a temporary file, not
+memory) and sent when finished.
+
+openpyxl and pyarrow are optional (``pip install .[export]``).
+"""
+
+import asyncio
+import csv
+import io
+import tempfile
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, AsyncIterator, Callable
+
+from sqlalchemy import Select, select
+
+from app.db.engine import async_session
+from app.models import DailyRevenue, Writeoff
+from app.services.labor_service import priced_shifts
+from app.services.transformers import get_labor_group
+
+BATCH_ROWS = 2000  # rows per server-side cursor fetch and per output chunk
+XLSX_MAX_ROWS = 1_048_575  # data rows per sheet (Excel limit minus the header)
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+@dataclass
+class Dataset:
+    columns: list[tuple[str, str]]  # (name, kind): date / str / int / decimal
+    query: Callable[[int, date, date], Select]
+    row: Callable[[Any], tuple] = tuple  # DB row -> values after branch_id
+
+
+def _revenue_query(branch_id: int, date_from: date, date_to: date) -> Select:
+    # Ordered like uq_daily_revenue_natural_key: an index scan, no sort
+    return (
+        select(
+            DailyRevenue.date,
+            DailyRevenue.order_type,
+            DailyRevenue.order_type_detail,
+            DailyRevenue.delivery_source,
+            DailyRevenue.item_name,
+            DailyRevenue.revenue_amount,
+            DailyRevenue.order_count,
+            DailyRevenue.item_quantity,
+            DailyRevenue.item_quantity_adjusted,
+        )
+        .where(
+            DailyRevenue.branch_id == branch_id,
+            DailyRevenue.date >= date_from,
+            DailyRevenue.date <= date_to,
+        )
+        .order_by(
+            DailyRevenue.date,
+            DailyRevenue.order_type_detail,
+            DailyRevenue.delivery_source,
+            DailyRevenue.item_name,
+        )
+    )
+
+
+def _labor_query(branch_id: int, date_from: date, date_to: date) -> Select:
+    shifts = priced_shifts(branch_id, date_from, date_to)
+    return select(
+        shifts.c.shift_date,
+        shifts.c.employee_id,
+        shifts.c.employee_name,
+        shifts.c.role_name,
+        shifts.c.worked_hours,
+        shifts.c.labor_cost,
+    ).order_by(shifts.c.started_at)
+
+
+def _labor_row(r) -> tuple:
+    return (*r[:4], get_labor_group(r.role_name), *r[4:])
+
+
+def _writeoffs_query(branch_id: int, date_from: date, date_to: date) -> Select:
+    return (
+        select(
+            Writeoff.date,
+            Writeoff.document_number,
+            Writeoff.account_name,
+            Writeoff.product_name,
+            Writeoff.category,
+            Writeoff.item_quantity,
+            Writeoff.amount,
+        )
+        .where(
+            Writeoff.branch_id == branch_id,
+            Writeoff.date >= date_from,
+            Writeoff.date <= date_to,
+        )
+        .order_by(Writeoff.date)
+    )
+
+
+DATASETS = {
+    "revenue": Dataset(
+        [
+            ("branch_id", "int"),
+            ("date", "date"),
+            ("order_type", "str"),
+            ("order_type_detail", "str"),
+            ("delivery_source", "str"),
+            ("item_name", "str"),
+            ("revenue_amount", "decimal"),
+            ("order_count", "int"),
+            ("item_quantity", "decimal"),
+            ("item_quantity_adjusted", "decimal"),
+        ],
+        _revenue_query,
+    ),
+    "labor": Dataset(
+        [
+            ("branch_id", "int"),
+            ("date", "date"),
+            ("employee_id", "str"),
+            ("employee_name", "str"),
+            ("role_name", "str"),
+            ("group", "str"),
+            ("worked_hours", "decimal"),
+            ("labor_cost", "decimal"),
+        ],
+        _labor_query,
+        _labor_row,
+    ),
+    "writeoffs": Dataset(
+        [
+            ("branch_id", "int"),
+            ("date", "date"),
+            ("document_number", "str"),
+            ("account_name", "str"),
+            ("product_name", "str"),
+            ("category", "str"),
+            ("item_quantity", "decimal"),
+            ("amount", "decimal"),
+        ],
+        _writeoffs_query,
+    ),
+}
+
+
+def check_format(fmt: str) -> None:
+    """Raise RuntimeError if the optional writer for ``fmt`` is not installed."""
+    package = {"xlsx": "openpyxl", "parquet": "pyarrow"}.get(fmt)
+    if package is None:
+        return
+    try:
+        __import__(package)
+    except ImportError as e:
+        raise RuntimeError(f"{fmt} export requires the '{package}' package") from e
+
+
+async def export_rows(
+    dataset: str, branch_ids: list[int], date_from: date, date_to: date
+) -> AsyncIterator[list[tuple]]:
+    """Yield rows in batches of BATCH_ROWS, branch after branch."""
+    spec = DATASETS[dataset]
+    async with async_session() as session:
+        for branch_id in branch_ids:
+            stmt = spec.query(branch_id, date_from, date_to)
+            result = await session.stream(stmt.execution_options(yield_per=BATCH_ROWS))
+            async for partition in result.partitions():
+                yield [(branch_id, *spec.row(r)) for r in partition]
+
+
+async def write_csv(
+    columns: list[tuple[str, str]], batches: AsyncIterator[list[tuple]]
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The BOM makes Excel read the file as UTF-8 (Cyrillic names)
+    buffer.write("\ufeff")
+    writer.writerow([name for name, _ in columns])
+    yield buffer.getvalue().encode()
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+
+
+async def write_xlsx(
+    columns: list[tuple[str, str]], batches: AsyncIterator[list[tuple]], title: str
+) -> AsyncIterator[bytes]:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    header = [name for name, _ in columns]
+    sheet, sheet_rows, sheets = None, XLSX_MAX_ROWS, 0
+
+    def append(batch: list[tuple]) -> None:
+        nonlocal sheet, sheet_rows, sheets
+        for row in batch:
+            if sheet_rows == XLSX_MAX_ROWS:
+                sheets += 1
+                sheet = workbook.create_sheet(title if sheets == 1 else f"{title} ({sheets})")
+                sheet.append(header)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+
+    async for batch in batches:
+        # Cell serialization is CPU-bound; keep it off the event loop
+        await asyncio.to_thread(append, batch)
+    if sheet is None:
+        workbook.create_sheet(title).append(header)
+    with tempfile.TemporaryFile() as f:
+        await asyncio.to_thread(workbook.save, f)
+        f.seek(0)
+        while chunk := await asyncio.to_thread(f.read, 1 << 20):
+            yield chunk
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose contents are taken out as they are produced."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+async def write_parquet(
+    columns: list[tuple[str, str]], batches: AsyncIterator[list[tuple]]
+) -> AsyncIterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "int": pa.int64(),
+        "date": pa.date32(),
+        "str": pa.string(),
+        "decimal": pa.decimal128(18, 4),
+    }
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for batch in batches:
+            arrays = [
+                pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)
+            ]
+            # Each batch becomes one row group; its bytes go out right away
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def export_stream(
+    dataset: str, fmt: str, branch_ids: list[int], date_from: date, date_to: date
+) -> AsyncIterator[bytes]:
+    """Encoded export of ``dataset`` in ``fmt``; call check_format() first."""
+    columns = DATASETS[dataset].columns
+    batches = export_rows(dataset, branch_ids, date_from, date_to)
+    if fmt == "xlsx":
+        return write_xlsx(columns, batches, dataset)
+    if fmt == "parquet":
+        return write_parquet(columns, batches)
+    return write_csv(columns, batches)
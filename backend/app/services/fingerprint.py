@@ -0,0 +1,39 @@
+"""Order-independent content fingerprints for sync payloads."""
+
+import hashlib
+from typing import Iterable
+
+_MOD = 1 << 256
+
+
+class Fingerprint:
+    """Incremental payload fingerprint; rows can be added in any order and batches.
+
+    Each row is hashed (sha256 of its sorted key/value repr, minus the
+    ``exclude`` keys) and the digests are summed mod 2**256, so the same rows
+    returned in a different order give the same result while a changed,
+    added or removed row changes it.
+    """
+
+    def __init__(self, exclude: tuple[str, ...] = ("sync_batch_id",)):
+        self.exclude = exclude
+        self.total = 0
+        self.count = 0
+
+    def update(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            items = sorted((k, v) for k, v in row.items() if k not in self.exclude)
+            digest = hashlib.sha256(repr(items).encode()).digest()
+            self.total = (self.total + int.from_bytes(digest, "big")) % _MOD
+            self.count += 1
+
+    def hexdigest(self) -> str:
+        """``"<count>:<hex>"``."""
+        return f"{self.count}:{self.total:064x}"
+
+
+def payload_fingerprint(rows: Iterable[dict], exclude: tuple[str, ...] = ("sync_batch_id",)) -> str:
+    """Fingerprint a collection of row dicts, ignoring row order."""
+    fingerprint = Fingerprint(exclude)
+    fingerprint.update(rows)
+    return fingerprint.hexdigest()
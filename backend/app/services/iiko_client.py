@@ -1,12 +1,47 @@
+import asyncio
 import hashlib
 from contextlib import asynccontextmanager
-from typing import Any, AsyncGenerator
+from typing import Any, AsyncGenerator, AsyncIterator, Iterator
 
 import httpx
+import ijson
 from lxml import etree
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.resilience import (
+    RETRY_STATUSES,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryStats,
+    TokenBucket,
+    backoff_delay,
+    endpoint_class,
+    endpoint_concurrency,
+    endpoint_timeout,
+    parse_retry_after,
+)
+
+
+def _drain_events(parser: etree.XMLPullParser) -> Iterator[etree._Element]:
+    """Yield elements parsed so far, freeing each one once the caller resumes.
+
+    Clearing the element and deleting already-processed siblings keeps the
+    partial tree from growing with the document.
+    """
+    for _event, elem in parser.read_events():
+        yield elem
+        elem.clear(keep_tail=True)
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def _with_key(params: dict | list | None, token: str) -> list[tuple[str, str]]:
+    """Query params with the auth token prepended (dicts and pair lists)."""
+    pairs = list(params.items()) if isinstance(params, dict) else list(params or [])
+    return [("key", token), *pairs]
 
 
 class IikoAuthError(Exception):
@@ -18,15 +53,61 @@ class IikoAuthError(Exception):
         super().__init__(f"iiko auth failed (HTTP {status_code}): {detail}")
 
 
-class IikoClient:
-    """Async client for iiko Server API (read-only)."""
+class IikoSessionManager:
+    """Process-wide iiko connection state shared by every IikoClient.
 
-    def __init__(self):
+    Holds one pooled httpx client and a small pool of auth tokens. Each
+    token occupies one iiko licence slot, so the pool never grows beyond
+    IIKO_LICENCE_SLOTS: a new token is only logged in when every existing
+    one is busy and the cap allows it, otherwise concurrent callers share
+    the least-loaded token. Tokens are reused across syncs and requests,
+    replaced when iiko answers 401, and logged out by close() at shutdown.
+
+    Every outbound request also passes throttle(): a process-wide token
+    bucket (IIKO_RATE_LIMIT) and a per-endpoint-class semaphore
+    (IIKO_MAX_CONCURRENT_*), so concurrent syncs, backfill chunks and
+    health checks together stay within what the iiko server tolerates.
+    """
+
+    def __init__(self, max_tokens: int | None = None):
+        self._max_tokens = max(max_tokens or settings.IIKO_LICENCE_SLOTS, 1)
         self._base_url = settings.IIKO_BASE_URL
         self._login = settings.IIKO_LOGIN
         self._password = settings.IIKO_PASSWORD
-        self._token: str | None = None
-        self._http = httpx.AsyncClient(timeout=60.0, verify=True)
+        self._tokens: dict[str, int] = {}  # token → requests in flight
+        self._pending_logins = 0
+        self._http: httpx.AsyncClient | None = None
+        self._cond: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.stats = RetryStats()
+        self.breaker = CircuitBreaker(
+            settings.IIKO_BREAKER_THRESHOLD, settings.IIKO_BREAKER_COOLDOWN
+        )
+        self._bucket = TokenBucket(settings.IIKO_RATE_LIMIT, settings.IIKO_RATE_BURST)
+        self._gates: dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        self._bind_loop()
+        return self._http
+
+    def _bind_loop(self) -> None:
+        # httpx clients and asyncio primitives belong to one event loop; a new
+        # loop (e.g. a separate asyncio.run) gets fresh ones. Tokens are kept.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._http = httpx.AsyncClient(
+                timeout=endpoint_timeout("reference"), verify=True
+            )
+            self._cond = asyncio.Condition()
+            self._gates = {
+                endpoint: asyncio.Semaphore(limit)
+                for endpoint in ("olap", "documents", "reference")
+                if (limit := endpoint_concurrency(endpoint))
+            }
+            self._tokens = dict.fromkeys(self._tokens, 0)
+            self._pending_logins = 0
 
     def _password_hash(self) -> str:
         # This server accepts SHA1(password) without the "resto#" prefix.
@@ -35,42 +116,288 @@ class IikoClient:
         return hashlib.sha1(self._password.encode("utf-8")).hexdigest()
 
     @asynccontextmanager
-    async def session(self) -> AsyncGenerator["IikoClient", None]:
-        """Login on enter, logout on exit (always, even on error)."""
-        await self._login_request()
+    async def throttle(self, endpoint: str) -> AsyncGenerator[None, None]:
+        """Hold a concurrency slot of ``endpoint``'s class and a rate-limit token."""
+        self._bind_loop()
+        gate = self._gates.get(endpoint)
+        if gate is None:
+            self.stats.throttle_wait_seconds += await self._bucket.acquire()
+            yield
+            return
+        async with gate:
+            self.stats.throttle_wait_seconds += await self._bucket.acquire()
+            yield
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncGenerator[str, None]:
+        """Borrow a token for the duration of one request."""
+        token = await self._acquire()
         try:
-            yield self
+            yield token
         finally:
-            await self._logout()
-            await self._http.aclose()
+            if token in self._tokens:
+                self._tokens[token] -= 1
+            async with self._cond:
+                self._cond.notify_all()
+
+    async def _acquire(self) -> str:
+        self._bind_loop()
+        async with self._cond:
+            while True:
+                at_cap = len(self._tokens) + self._pending_logins >= self._max_tokens
+                if self._tokens:
+                    token = min(self._tokens, key=self._tokens.get)
+                    if self._tokens[token] == 0 or at_cap:
+                        self._tokens[token] += 1
+                        return token
+                if not at_cap:
+                    self._pending_logins += 1
+                    break
+                await self._cond.wait()  # first login still in flight
 
-    async def _login_request(self) -> None:
-        """Authenticate via form-encoded POST body (iiko requires this)."""
+        token = None
+        try:
+            token = await self._login_request()
+        finally:
+            async with self._cond:
+                self._pending_logins -= 1
+                if token is not None:
+                    self._tokens[token] = 1
+                self._cond.notify_all()
+        return token
+
+    def invalidate(self, token: str) -> None:
+        """Drop a token iiko rejected; the next lease logs in again."""
+        if self._tokens.pop(token, None) is not None:
+            logger.info("iiko token rejected — will re-login")
+
+    async def _login_request(self) -> str:
+        """Authenticate via form-encoded POST body (iiko requires this).
+
+        Transient failures are retried like any idempotent call; a rejected
+        login raises IikoAuthError straight away. Outcomes feed the breaker,
+        but admission is decided by the call that needed the token.
+        """
         url = f"{self._base_url}/resto/api/auth"
         data = {"login": self._login, "pass": self._password_hash()}
-        resp = await self._http.post(url, data=data)
+        timeout = endpoint_timeout("auth")
+        attempt = 0
+        while True:
+            self.stats.requests += 1
+            try:
+                async with self.throttle("auth"):
+                    resp = await self.http.post(url, data=data, timeout=timeout)
+            except httpx.TransportError as e:
+                resp, error = None, e
+            if resp is not None and resp.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                break
+            self.breaker.record_failure()
+            attempt += 1
+            if attempt >= settings.IIKO_RETRY_ATTEMPTS:
+                self.stats.failures += 1
+                if resp is None:
+                    raise error
+                break
+            delay = backoff_delay(
+                attempt,
+                settings.IIKO_RETRY_BASE_DELAY,
+                settings.IIKO_RETRY_MAX_DELAY,
+                parse_retry_after(resp.headers.get("Retry-After")) if resp is not None else None,
+            )
+            self.stats.record_retry("auth", delay)
+            await asyncio.sleep(delay)
+
         if resp.status_code != 200:
             detail = resp.text.strip()
             logger.error(f"iiko auth failed (HTTP {resp.status_code}): {detail}")
             raise IikoAuthError(resp.status_code, detail)
-        self._token = resp.text.strip().strip('"')
         logger.info("iiko login OK — token acquired")
+        return resp.text.strip().strip('"')
 
-    async def _logout(self) -> None:
-        if not self._token:
-            return
+    async def _logout(self, token: str) -> None:
         try:
             url = f"{self._base_url}/resto/api/logout"
             # Use form body (same as auth) — this server rejects query params on POST
-            resp = await self._http.post(url, data={"key": self._token})
+            timeout = endpoint_timeout("auth")
+            async with self.throttle("auth"):
+                resp = await self.http.post(url, data={"key": token}, timeout=timeout)
             if resp.status_code != 200:
                 # Fallback: try GET with query param
-                resp = await self._http.get(url, params={"key": self._token})
+                async with self.throttle("auth"):
+                    resp = await self.http.get(url, params={"key": token}, timeout=timeout)
             logger.info("iiko logout OK — license released")
         except Exception as e:
             logger.warning(f"iiko logout failed: {e}")
+
+    async def close(self) -> None:
+        """Log out every token (releasing licence slots) and close the HTTP pool."""
+        tokens, self._tokens = list(self._tokens), {}
+        for token in tokens:
+            await self._logout(token)
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._loop = None
+
+
+iiko_sessions = IikoSessionManager()
+
+
+class IikoClient:
+    """Async client for iiko Server API (read-only).
+
+    Cheap to create: connections and tokens come from the shared
+    IikoSessionManager (``iiko_sessions`` by default).
+    """
+
+    def __init__(self, sessions: IikoSessionManager | None = None):
+        self._sessions = sessions or iiko_sessions
+        self._base_url = settings.IIKO_BASE_URL
+
+    @asynccontextmanager
+    async def session(self) -> AsyncGenerator["IikoClient", None]:
+        """Make sure iiko auth works before the block (raises IikoAuthError).
+
+        The token stays in the shared pool afterwards; licence slots are
+        released by ``iiko_sessions.close()`` at shutdown.
+        """
+        breaker = self._sessions.breaker
+        probe = breaker.before_call()
+        try:
+            async with self._sessions.lease():
+                pass
+        finally:
+            if probe:
+                breaker.release_probe()
+        yield self
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: dict | list | None = None,
+        idempotent: bool | None = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """Authenticated request with retries; see _call."""
+        async with self._call(method, path, params, idempotent, stream=False, **kwargs) as resp:
+            return resp
+
+    def _stream(
+        self,
+        method: str,
+        path: str,
+        params: dict | list | None = None,
+        idempotent: bool | None = None,
+        **kwargs,
+    ):
+        """Streaming variant of _request; the body is read inside the block."""
+        return self._call(method, path, params, idempotent, stream=True, **kwargs)
+
+    @asynccontextmanager
+    async def _call(
+        self,
+        method: str,
+        path: str,
+        params: dict | list | None,
+        idempotent: bool | None,
+        stream: bool,
+        **kwargs,
+    ) -> AsyncGenerator[httpx.Response, None]:
+        """One logical iiko call: throttle, token lease, 401 re-login, retries, breaker.
+
+        Idempotent calls (GET by default) are retried on timeouts, connection
+        errors and 429/5xx with jittered exponential backoff, honouring
+        Retry-After; up to IIKO_RETRY_ATTEMPTS tries. A 401 drops the token
+        and re-logs in once. Every transient failure feeds the shared circuit
+        breaker; while it is open, calls raise CircuitOpenError immediately.
+        Streams are only retried before their body is handed to the caller.
+        """
+        sessions = self._sessions
+        endpoint = endpoint_class(path)
+        if idempotent is None:
+            idempotent = method == "GET"
+        attempts = settings.IIKO_RETRY_ATTEMPTS if idempotent else 1
+        url = f"{self._base_url}{path}"
+        relogged = False
+        attempt = 0
+        # before_call() admits one attempt; the 401 re-login reuses it. A
+        # probe left without an outcome (cancelled, auth error) is released.
+        admitted = probe = False
+        try:
+            while True:
+                if not admitted:
+                    try:
+                        probe = sessions.breaker.before_call()
+                    except CircuitOpenError:
+                        sessions.stats.short_circuited += 1
+                        raise
+                    admitted = True
+                sessions.stats.requests += 1
+                async with sessions.throttle(endpoint), sessions.lease() as token:
+                    request = sessions.http.build_request(
+                        method,
+                        url,
+                        params=_with_key(params, token),
+                        timeout=endpoint_timeout(endpoint),
+                        **kwargs,
+                    )
+                    try:
+                        resp = await sessions.http.send(request, stream=stream)
+                    except httpx.TransportError as e:
+                        resp, error = None, e
+                    else:
+                        error = None
+
+                    if resp is not None and resp.status_code == 401 and not relogged:
+                        await resp.aclose()
+                        sessions.invalidate(token)
+                        relogged = True
+                        continue
+                    if resp is not None and resp.status_code not in RETRY_STATUSES:
+                        sessions.breaker.record_success()
+                        admitted = probe = False
+                        try:
+                            resp.raise_for_status()
+                            yield resp
+                        finally:
+                            await resp.aclose()
+                        return
+
+                    # Transient failure: timeout, connection error, 429 or 5xx
+                    sessions.breaker.record_failure()
+                    admitted = probe = False
+                    attempt += 1
+                    retry_after = None
+                    if resp is not None:
+                        retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                        await resp.aclose()
+                    if attempt >= attempts:
+                        sessions.stats.failures += 1
+                        if resp is not None:
+                            resp.raise_for_status()
+                        raise error
+                    if resp is not None:
+                        reason = f"HTTP {resp.status_code}"
+                    else:
+                        reason = type(error).__name__
+
+                delay = backoff_delay(
+                    attempt,
+                    settings.IIKO_RETRY_BASE_DELAY,
+                    settings.IIKO_RETRY_MAX_DELAY,
+                    retry_after,
+                )
+                sessions.stats.record_retry(endpoint, delay)
+                logger.warning(
+                    f"iiko {method} {path} failed ({reason}) — "
+                    f"retry {attempt}/{attempts - 1} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
         finally:
-            self._token = None
+            if probe:
+                sessions.breaker.release_probe()
 
     async def get_olap_report(
         self,
@@ -82,7 +409,28 @@ class IikoClient:
         filters: dict[str, Any] | None = None,
     ) -> list[dict]:
         """Fetch OLAP report. Dates in YYYY-MM-DD format."""
-        url = f"{self._base_url}/resto/api/v2/reports/olap"
+        return [
+            row
+            async for row in self.iter_olap_report(
+                report_type, group_fields, agg_fields, date_from, date_to, filters
+            )
+        ]
+
+    async def iter_olap_report(
+        self,
+        report_type: str,
+        group_fields: list[str],
+        agg_fields: list[str],
+        date_from: str,
+        date_to: str,
+        filters: dict[str, Any] | None = None,
+    ) -> AsyncIterator[dict]:
+        """Stream OLAP report rows one at a time.
+
+        The response body is decoded incrementally (ijson) as it arrives, so
+        neither the raw JSON nor the full row list is held in memory.
+        Non-integer numbers are yielded as Decimal.
+        """
         body: dict[str, Any] = {
             "reportType": report_type,
             "groupByRowFields": group_fields,
@@ -107,50 +455,87 @@ class IikoClient:
                 **(filters or {}),
             },
         }
-        resp = await self._http.post(url, params={"key": self._token}, json=body)
-        resp.raise_for_status()
-        data = resp.json()
-        return data.get("data", [])
+        # Read-only report: safe to retry despite POST
+        async with self._stream(
+            "POST", "/resto/api/v2/reports/olap", idempotent=True, json=body
+        ) as resp:
+            rows = ijson.sendable_list()
+            decoder = ijson.items_coro(rows, "data.item")
+            async for chunk in resp.aiter_bytes():
+                decoder.send(chunk)
+                for row in rows:
+                    yield row
+                del rows[:]
+            decoder.close()
+            for row in rows:
+                yield row
 
     async def get_attendance(self, date_from: str, date_to: str) -> list[dict]:
         """Fetch employee attendance. Returns parsed XML as list of dicts."""
-        url = f"{self._base_url}/resto/api/employees/attendance"
+        return [r async for r in self.iter_attendance(date_from, date_to)]
+
+    async def iter_attendance(self, date_from: str, date_to: str) -> AsyncIterator[dict]:
+        """Stream attendance records one by one (constant parser memory)."""
         params = {
-            "key": self._token,
             "from": date_from,
             "to": date_to,
             "withPaymentDetails": "true",
         }
-        resp = await self._http.get(url, params=params)
-        resp.raise_for_status()
-        return self._parse_attendance_xml(resp.content)
+        async for item in self._stream_xml("/resto/api/employees/attendance", params, "attendance"):
+            yield self._attendance_record(item)
 
     @staticmethod
     def _parse_attendance_xml(xml_bytes: bytes) -> list[dict]:
-        """Parse iiko attendance XML into list of dicts.
+        """Parse iiko attendance XML into list of dicts."""
+        parser = etree.XMLPullParser(events=("end",), tag="attendance")
+        parser.feed(xml_bytes)
+        parser.close()
+        return [IikoClient._attendance_record(item) for item in _drain_events(parser)]
+
+    @staticmethod
+    def _attendance_record(item) -> dict:
+        """Flatten one <attendance> element.
 
         XML uses <attendance> elements (not <attendanceRecord>).
         paymentDetails is a flat group of sub-elements, not a list.
         """
-        root = etree.fromstring(xml_bytes)
-        records = []
-        for item in root.findall(".//attendance"):
-            record: dict[str, str | None] = {}
-            for child in item:
-                if child.tag == "paymentDetails":
-                    # Flatten paymentDetails sub-fields
-                    for pd_child in child:
-                        record[pd_child.tag] = pd_child.text
-                else:
-                    record[child.tag] = child.text
-            records.append(record)
-        return records
+        record: dict[str, str | None] = {}
+        for child in item:
+            if child.tag == "paymentDetails":
+                # Flatten paymentDetails sub-fields
+                for pd_child in child:
+                    record[pd_child.tag] = pd_child.text
+            else:
+                record[child.tag] = child.text
+        return record
+
+    async def _stream_xml(
+        self, path: str, params: dict | None, tag: str
+    ) -> AsyncIterator[etree._Element]:
+        """GET an XML document and yield its ``tag`` elements as they arrive.
+
+        The body is fed chunk by chunk into an lxml pull parser; each element
+        is cleared after the consumer is done with it, so neither the raw
+        response nor the full tree is ever held in memory.
+        """
+        async with self._stream("GET", path, params) as resp:
+            parser = etree.XMLPullParser(events=("end",), tag=tag)
+            async for chunk in resp.aiter_bytes():
+                parser.feed(chunk)
+                for item in _drain_events(parser):
+                    yield item
+            parser.close()
+            for item in _drain_events(parser):
+                yield item
 
     async def get_departments(self) -> list[dict]:
         """Fetch corporation department hierarchy (XML → list of dicts)."""
-        url = f"{self._base_url}/resto/api/corporation/departments"
-        resp = await self._http.get(url, params={"key": self._token})
-        resp.raise_for_status()
+        resp = await self._request("GET", "/resto/api/corporation/departments")
+        return self._parse_departments_xml(resp.content)
+
+    async def get_stores(self) -> list[dict]:
+        """Fetch corporation stores (XML → list of dicts; parentId = department)."""
+        resp = await self._request("GET", "/resto/api/corporation/stores")
         return self._parse_departments_xml(resp.content)
 
     @staticmethod
@@ -169,34 +554,24 @@ class IikoClient:
         self, root_types: list[str], include_deleted: bool = False
     ) -> list[dict]:
         """Fetch reference entities (OrderType, PaymentType, etc.) via v2 JSON API."""
-        url = f"{self._base_url}/resto/api/v2/entities/list"
-        params: list[tuple[str, str]] = [("key", self._token or "")]
-        for rt in root_types:
-            params.append(("rootType", rt))
+        params: list[tuple[str, str]] = [("rootType", rt) for rt in root_types]
         params.append(("includeDeleted", str(include_deleted).lower()))
-        resp = await self._http.get(url, params=params)
-        resp.raise_for_status()
+        resp = await self._request("GET", "/resto/api/v2/entities/list", params)
         return resp.json()
 
     async def get_olap_columns(self, report_type: str) -> list[dict]:
-        url = f"{self._base_url}/resto/api/v2/reports/olap/columns"
-        resp = await self._http.get(
-            url, params={"key": self._token, "reportType": report_type}
+        resp = await self._request(
+            "GET", "/resto/api/v2/reports/olap/columns", {"reportType": report_type}
         )
-        resp.raise_for_status()
         return resp.json()
 
     async def get_olap_presets(self) -> list[dict]:
-        url = f"{self._base_url}/resto/api/v2/reports/olap/presets"
-        resp = await self._http.get(url, params={"key": self._token})
-        resp.raise_for_status()
+        resp = await self._request("GET", "/resto/api/v2/reports/olap/presets")
         return resp.json()
 
     async def get_roles(self) -> dict[str, str]:
         """Fetch role ID → role name mapping from /resto/api/employees/roles."""
-        url = f"{self._base_url}/resto/api/employees/roles"
-        resp = await self._http.get(url, params={"key": self._token})
-        resp.raise_for_status()
+        resp = await self._request("GET", "/resto/api/employees/roles")
         root = etree.fromstring(resp.content)
         roles: dict[str, str] = {}
         for role in root.findall(".//role"):
@@ -207,13 +582,9 @@ class IikoClient:
         return roles
 
     async def get_employees(self) -> dict[str, str]:
-        """Fetch employee ID → name mapping from /resto/api/employees."""
-        url = f"{self._base_url}/resto/api/employees"
-        resp = await self._http.get(url, params={"key": self._token})
-        resp.raise_for_status()
-        root = etree.fromstring(resp.content)
+        """Fetch employee ID → name mapping from /resto/api/employees (streamed)."""
         employees: dict[str, str] = {}
-        for emp in root.findall(".//employee"):
+        async for emp in self._stream_xml("/resto/api/employees", None, "employee"):
             emp_id = emp.findtext("id")
             emp_name = emp.findtext("name")
             if emp_id and emp_name:
@@ -221,38 +592,39 @@ class IikoClient:
         return employees
 
     async def get_products(self) -> dict[str, str]:
-        """Fetch product ID → name mapping from /resto/api/products."""
-        url = f"{self._base_url}/resto/api/products"
-        resp = await self._http.get(url, params={"key": self._token})
-        resp.raise_for_status()
-        root = etree.fromstring(resp.content)
+        """Fetch product ID → name mapping from /resto/api/products (streamed)."""
         products: dict[str, str] = {}
-        for p in root.findall(".//productDto"):
+        async for p in self._stream_xml("/resto/api/products", None, "productDto"):
             pid = p.findtext("id")
             pname = p.findtext("name")
             if pid and pname:
                 products[pid] = pname
         return products
 
+    async def get_reference(self, kind: str, required=()) -> dict[str, str]:
+        """Reference dictionary (roles, employees, products, accounts,
+        store_departments) read through the local cache; see reference_cache."""
+        from app.services.reference_cache import get_reference
+
+        return await get_reference(self, kind, required)
+
     async def get_writeoff_documents(
         self, date_from: str, date_to: str
     ) -> list[dict]:
         """Fetch write-off acts via /resto/api/v2/documents/writeoff (JSON)."""
-        url = f"{self._base_url}/resto/api/v2/documents/writeoff"
         params = {
-            "key": self._token,
             "dateFrom": date_from,
             "dateTo": date_to,
             "status": "PROCESSED",
         }
-        resp = await self._http.get(url, params=params)
-        resp.raise_for_status()
+        resp = await self._request("GET", "/resto/api/v2/documents/writeoff", params)
         data = resp.json()
         return data.get("response", [])
 
     async def check_licence(self) -> str:
         """Check licence slot availability (no auth required)."""
         url = f"{self._base_url}/resto/api/licence/info"
-        resp = await self._http.get(url)
+        async with self._sessions.throttle("auth"):
+            resp = await self._sessions.http.get(url, timeout=endpoint_timeout("auth"))
         resp.raise_for_status()
         return resp.text.strip()
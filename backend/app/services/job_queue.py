@@ -0,0 +1,158 @@
+"""Persistent sync job queue in Postgres: the API enqueues, app.worker executes.
+
+Jobs survive API reloads and restarts, duplicates of a queued or running
+window are folded into one job, and the number of syncs in flight is set
+by the worker (SYNC_WORKER_CONCURRENCY), not by how often someone clicks.
+"""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.engine import async_session
+from app.models import SyncJob
+from app.services.backfill_service import backfill
+from app.services.sync_service import daily_sync, trailing_sync
+
+JOB_KINDS = ("daily", "backfill", "trailing")
+_ACTIVE = ("queued", "running")
+
+
+async def enqueue_sync(
+    session: AsyncSession, kind: str, date_from: date, date_to: date, sync_type: str
+) -> tuple[SyncJob, bool]:
+    """Queue a sync job, or return the queued/running job for the same window.
+
+    Returns (job, created). Commits.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown sync job kind: {kind}")
+    for _ in range(3):
+        stmt = (
+            insert(SyncJob)
+            .values(
+                kind=kind,
+                date_from=date_from,
+                date_to=date_to,
+                sync_type=sync_type,
+                status="queued",
+            )
+            .on_conflict_do_nothing(
+                index_elements=["kind", "date_from", "date_to"],
+                index_where=text("status IN ('queued', 'running')"),
+            )
+            .returning(SyncJob.id)
+        )
+        job_id = await session.scalar(stmt)
+        created = job_id is not None
+        if not created:
+            job_id = await session.scalar(
+                select(SyncJob.id).where(
+                    SyncJob.kind == kind,
+                    SyncJob.date_from == date_from,
+                    SyncJob.date_to == date_to,
+                    SyncJob.status.in_(_ACTIVE),
+                )
+            )
+        await session.commit()
+        if job_id is None:
+            continue  # the active duplicate finished in between; insert again
+        job = await session.get(SyncJob, job_id, populate_existing=True)
+        if created:
+            logger.info(f"Queued sync job {job.id}: {kind} {date_from}..{date_to}")
+        return job, created
+    raise RuntimeError(f"Could not enqueue {kind} sync for {date_from}..{date_to}")
+
+
+async def claim_job(worker_id: str) -> SyncJob | None:
+    """Take the oldest queued job and mark it running (FOR UPDATE SKIP LOCKED)."""
+    async with async_session() as session:
+        job = await session.scalar(
+            select(SyncJob)
+            .where(SyncJob.status == "queued")
+            .order_by(SyncJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if job is None:
+            return None
+        now = datetime.utcnow()
+        job.status = "running"
+        job.attempts += 1
+        job.worker_id = worker_id
+        job.started_at = now
+        job.heartbeat_at = now
+        job.error_message = None
+        await session.commit()
+        return job
+
+
+async def heartbeat(job_id: int) -> None:
+    """Mark a running job as alive; see requeue_stale()."""
+    async with async_session() as session:
+        await session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.status == "running")
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        await session.commit()
+
+
+async def finish_job(job_id: int, outcome: int | BaseException) -> None:
+    """Record a job's record count or the exception that failed it."""
+    failed = isinstance(outcome, BaseException)
+    async with async_session() as session:
+        await session.execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id)
+            .values(
+                status="failed" if failed else "success",
+                records_processed=0 if failed else outcome,
+                error_message=str(outcome)[:2000] if failed else None,
+                completed_at=datetime.utcnow(),
+            )
+        )
+        await session.commit()
+
+
+async def requeue_stale() -> int:
+    """Return jobs of dead workers (no heartbeat for SYNC_JOB_STALE_MINUTES) to the queue.
+
+    A job that already used SYNC_JOB_MAX_ATTEMPTS is failed instead. Syncs
+    are checkpointed, so a re-run resumes rather than starting over.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.SYNC_JOB_STALE_MINUTES)
+    stale = (SyncJob.status == "running") & (SyncJob.heartbeat_at < cutoff)
+    async with async_session() as session:
+        failed = await session.execute(
+            update(SyncJob)
+            .where(stale, SyncJob.attempts >= settings.SYNC_JOB_MAX_ATTEMPTS)
+            .values(
+                status="failed",
+                error_message="worker lost; attempts exhausted",
+                completed_at=datetime.utcnow(),
+            )
+        )
+        requeued = await session.execute(
+            update(SyncJob).where(stale).values(status="queued", worker_id=None)
+        )
+        await session.commit()
+    if failed.rowcount or requeued.rowcount:
+        logger.warning(
+            f"Stale sync jobs: {requeued.rowcount} requeued, {failed.rowcount} failed"
+        )
+    return requeued.rowcount
+
+
+async def run_job(job: SyncJob) -> int:
+    """Execute a claimed job with the matching sync entry point."""
+    if job.kind == "daily":
+        return await daily_sync(job.date_from, job.sync_type)
+    if job.kind == "backfill":
+        return await backfill(job.date_from, job.date_to, job.sync_type)
+    days = (job.date_to - job.date_from).days + 1
+    return await trailing_sync(days, job.sync_type, date_to=job.date_to)
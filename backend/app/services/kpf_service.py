@@ -3,28 +3,28 @@ from decimal import Decimal, ROUND_HALF_UP
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.services.labor_service import get_hall_labor_total, get_kitchen_labor_total, get_labor_total
-from app.services.revenue_service import (
-    get_khinkali_count,
-    get_revenue_totals,
-    get_upsell_counts,
-)
-from app.services.writeoff_service import get_writeoff_total
+from app.services.rollup_service import get_rollup_totals
 
 
 async def get_kpf(
     session: AsyncSession, branch_id: int, date_from: date, date_to: date
 ) -> dict:
-    revenue_by_type = await get_revenue_totals(session, branch_id, date_from, date_to)
-    labor_total = await get_labor_total(session, branch_id, date_from, date_to)
-    kitchen_labor_total = await get_kitchen_labor_total(session, branch_id, date_from, date_to)
-    hall_labor_total = await get_hall_labor_total(session, branch_id, date_from, date_to)
-    writeoff_total = await get_writeoff_total(session, branch_id, date_from, date_to)
-    khinkali = await get_khinkali_count(session, branch_id, date_from, date_to)
-    upsells = await get_upsell_counts(session, branch_id, date_from, date_to)
-
-    revenue_delivery = revenue_by_type.get("delivery", Decimal("0"))
-    revenue_hall = revenue_by_type.get("hall", Decimal("0"))
+    """Compute all KPF metrics from the daily rollup in a single statement.
+
+    Sums at most one row per day of the range; see rollup_service for how the
+    rows are built from item-level data during sync, and for the live
+    fallback on days that have no row yet.
+    """
+    totals = await get_rollup_totals(session, branch_id, date_from, date_to)
+
+    labor_total = totals["labor_total"]
+    kitchen_labor_total = totals["labor_kitchen"]
+    hall_labor_total = totals["labor_hall"]
+    writeoff_total = totals["writeoff_total"]
+    khinkali = totals["khinkali_count"]
+
+    revenue_delivery = totals["revenue_delivery"]
+    revenue_hall = totals["revenue_hall"]
     revenue_total = revenue_delivery + revenue_hall
 
     lc_percent = Decimal("0")
@@ -51,8 +51,8 @@ async def get_kpf(
         "kc_percent": kc_percent,
         "khinkali_count": khinkali,
         "upsells": {
-            "uzvar_qty": upsells.get("uzvar", Decimal("0")),
-            "sauce_qty": upsells.get("sauce", Decimal("0")),
-            "bread_qty": upsells.get("bread", Decimal("0")),
+            "uzvar_qty": totals["upsell_uzvar_qty"],
+            "sauce_qty": totals["upsell_sauce_qty"],
+            "bread_qty": totals["upsell_bread_qty"],
         },
     }
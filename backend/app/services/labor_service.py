@@ -1,104 +1,132 @@
-from datetime import date
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Date, and_, cast, func, not_, or_, select, true
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import EmployeeAttendance, StaffRate
-from app.services.transformers import get_labor_group, is_excluded_role, is_hall_role, is_kitchen_role
+from app.services.transformers import (
+    EXCLUDED_LABOR_PATTERNS,
+    HALL_PATTERNS,
+    KITCHEN_PATTERNS,
+    get_labor_group,
+)
 
 
-async def get_labor(
-    session: AsyncSession, branch_id: int, date_from: date, date_to: date
-) -> list[dict]:
-    """Get labor cost per employee, joining attendance with SCD2 rates."""
-    att_result = await session.execute(
-        select(EmployeeAttendance)
+def _role_matches(role_name, patterns: list[str]):
+    """SQL twin of the transformers.is_*_role substring checks."""
+    role = func.coalesce(role_name, "")
+    return or_(*(role.ilike(f"%{p}%") for p in patterns))
+
+
+def _attendance_window(branch_id: int, date_from: date, date_to: date):
+    """Shifts of a branch that start within [date_from, date_to] (index-friendly)."""
+    return and_(
+        EmployeeAttendance.branch_id == branch_id,
+        EmployeeAttendance.date_from >= datetime.combine(date_from, time.min),
+        EmployeeAttendance.date_from
+        < datetime.combine(date_to + timedelta(days=1), time.min),
+    )
+
+
+def priced_shifts(branch_id: int, date_from: date, date_to: date):
+    """Non-excluded shifts in the window, each priced at the rate valid that day.
+
+    Every shift is range-joined (LATERAL) to the SCD2 StaffRate version with
+    valid_from <= shift date < valid_to, so a mid-period raise only applies
+    from its effective date. Shifts without a rate are priced at 0.
+    """
+    shift_date = cast(EmployeeAttendance.date_from, Date)
+    rate = (
+        select(StaffRate.hourly_rate)
         .where(
             and_(
-                EmployeeAttendance.branch_id == branch_id,
-                func.date(EmployeeAttendance.date_from) >= date_from,
-                func.date(EmployeeAttendance.date_from) <= date_to,
+                StaffRate.branch_id == EmployeeAttendance.branch_id,
+                StaffRate.employee_id == EmployeeAttendance.employee_id,
+                StaffRate.valid_from <= shift_date,
+                (StaffRate.valid_to > shift_date) | (StaffRate.valid_to.is_(None)),
             )
         )
-        .order_by(EmployeeAttendance.employee_name)
+        .order_by(StaffRate.valid_from.desc())
+        .limit(1)
+        .lateral("rate")
     )
-    attendances = att_result.scalars().all()
-
-    # Aggregate hours per employee, excluding manager roles in Python
-    emp_hours: dict[str, dict] = {}
-    for att in attendances:
-        if is_excluded_role(att.role_name):
-            continue
-        eid = att.employee_id
-        if eid not in emp_hours:
-            emp_hours[eid] = {
-                "employee_name": att.employee_name or eid,
-                "role_name": att.role_name,
-                "group": get_labor_group(att.role_name),
-                "total_hours": Decimal("0"),
-            }
-        emp_hours[eid]["total_hours"] += att.worked_hours
-
-    # Get current rates for each employee
-    rows = []
-    for eid, data in emp_hours.items():
-        rate_result = await session.execute(
-            select(StaffRate)
-            .where(
-                and_(
-                    StaffRate.employee_id == eid,
-                    StaffRate.branch_id == branch_id,
-                    StaffRate.valid_from <= date_to,
-                    (StaffRate.valid_to > date_from) | (StaffRate.valid_to.is_(None)),
-                )
+    return (
+        select(
+            shift_date.label("shift_date"),
+            EmployeeAttendance.date_from.label("started_at"),
+            EmployeeAttendance.employee_id,
+            EmployeeAttendance.employee_name,
+            EmployeeAttendance.role_name,
+            EmployeeAttendance.worked_hours,
+            (
+                EmployeeAttendance.worked_hours
+                * func.coalesce(rate.c.hourly_rate, 0)
+            ).label("labor_cost"),
+        )
+        .select_from(EmployeeAttendance)
+        .outerjoin(rate, true())
+        .where(
+            and_(
+                _attendance_window(branch_id, date_from, date_to),
+                not_(_role_matches(EmployeeAttendance.role_name, EXCLUDED_LABOR_PATTERNS)),
             )
-            .order_by(StaffRate.valid_from.desc())
-            .limit(1)
         )
-        rate = rate_result.scalar_one_or_none()
-        hourly_rate = rate.hourly_rate if rate else Decimal("0")
-        labor_cost = data["total_hours"] * hourly_rate
+        .subquery("shifts")
+    )
 
+
+async def get_labor(
+    session: AsyncSession, branch_id: int, date_from: date, date_to: date
+) -> list[dict]:
+    """Get labor cost per employee and role, joining attendance with SCD2 rates.
+
+    Set-based: excluded roles are filtered, each shift is priced at the rate
+    valid on its date and hours/costs are summed in SQL, so the statement
+    count stays at one regardless of headcount or period length.
+    ``hourly_rate`` is the effective (hours-weighted) rate for the period.
+    """
+    shifts = priced_shifts(branch_id, date_from, date_to)
+    total_hours = func.sum(shifts.c.worked_hours)
+    labor_cost = func.sum(shifts.c.labor_cost)
+    employee_name = func.coalesce(func.max(shifts.c.employee_name), shifts.c.employee_id)
+    result = await session.execute(
+        select(
+            employee_name.label("employee_name"),
+            shifts.c.role_name,
+            total_hours.label("total_hours"),
+            labor_cost.label("labor_cost"),
+        )
+        .group_by(shifts.c.employee_id, shifts.c.role_name)
+        .order_by(employee_name, shifts.c.role_name)
+    )
+    rows = []
+    for row in result:
+        hourly_rate = Decimal("0")
+        if row.total_hours:
+            hourly_rate = (row.labor_cost / row.total_hours).quantize(Decimal("0.01"))
         rows.append(
             {
-                "employee_name": data["employee_name"],
-                "role_name": data["role_name"],
-                "group": data["group"],
-                "total_hours": data["total_hours"],
+                "employee_name": row.employee_name,
+                "role_name": row.role_name,
+                "group": get_labor_group(row.role_name),
+                "total_hours": row.total_hours,
                 "hourly_rate": hourly_rate,
-                "labor_cost": labor_cost,
+                "labor_cost": row.labor_cost,
             }
         )
-
     return rows
 
 
-async def get_labor_total(
-    session: AsyncSession, branch_id: int, date_from: date, date_to: date
-) -> Decimal:
-    """Total labor cost for the period."""
-    rows = await get_labor(session, branch_id, date_from, date_to)
-    return sum((r["labor_cost"] for r in rows), Decimal("0"))
-
-
-async def get_kitchen_labor_total(
-    session: AsyncSession, branch_id: int, date_from: date, date_to: date
-) -> Decimal:
-    """Kitchen labor cost only (Повар*, Мангал*, Заготовщик*) for KC%."""
-    rows = await get_labor(session, branch_id, date_from, date_to)
-    return sum(
-        (r["labor_cost"] for r in rows if is_kitchen_role(r["role_name"])),
-        Decimal("0"),
-    )
-
+def labor_split_columns(shifts) -> list:
+    """Total / kitchen / hall labor cost and total hours over priced_shifts().
 
-async def get_hall_labor_total(
-    session: AsyncSession, branch_id: int, date_from: date, date_to: date
-) -> Decimal:
-    """Hall labor cost only (Официант*, Хостес*, Раннер*, Бармен*, Администратор*)."""
-    rows = await get_labor(session, branch_id, date_from, date_to)
-    return sum(
-        (r["labor_cost"] for r in rows if is_hall_role(r["role_name"])),
-        Decimal("0"),
-    )
+    Labels match DailyKpfRollup column names.
+    """
+    cost = func.sum(shifts.c.labor_cost)
+    return [
+        cost.label("labor_total"),
+        cost.filter(_role_matches(shifts.c.role_name, KITCHEN_PATTERNS)).label("labor_kitchen"),
+        cost.filter(_role_matches(shifts.c.role_name, HALL_PATTERNS)).label("labor_hall"),
+        func.sum(shifts.c.worked_hours).label("labor_hours"),
+    ]
@@ -0,0 +1,84 @@
+"""Keyset pagination for list endpoints.
+
+A page is fetched as ``WHERE (sort_key, id) > (last_key, last_id) ORDER BY
+sort_key, id LIMIT n``, so every page costs the same however deep the
+client scrolls, unlike OFFSET. The cursor is an opaque token carrying the
+sort, direction and the last row's key; it is only valid for the sort it
+was issued for.
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+COUNT_CAP = 10_000  # total_estimate stops counting here
+
+
+@dataclass
+class SortKey:
+    column: Any  # column or SQL expression; must not be NULL
+    parse: Callable[[str], Any]  # cursor text -> value comparable with column
+
+
+def encode_cursor(sort: str, order: str, value: Any, row_id: int) -> str:
+    raw = json.dumps([sort, order, str(value), row_id], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, order: str, key: SortKey) -> tuple[Any, int]:
+    """Return (last sort value, last id). Raises ValueError for a foreign or garbled cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        c_sort, c_order, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if (c_sort, c_order) != (sort, order):
+        raise ValueError("Cursor belongs to a different sort order")
+    try:
+        return key.parse(value), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+async def keyset_page(
+    session: AsyncSession,
+    stmt: Select,
+    id_column: Any,
+    sort: str,
+    order: str,
+    key: SortKey,
+    limit: int,
+    cursor: str | None = None,
+) -> tuple[list, str | None, int, bool]:
+    """Fetch one page of ``stmt`` (a filtered, unordered select of entities).
+
+    Returns (rows, next_cursor, total_estimate, total_exact). The total
+    counts matches up to COUNT_CAP, bounding its cost on large ranges.
+    """
+    count_stmt = select(func.count()).select_from(
+        stmt.with_only_columns(id_column).limit(COUNT_CAP + 1).subquery()
+    )
+    total = await session.scalar(count_stmt)
+
+    keyset = tuple_(key.column, id_column)
+    if cursor:
+        last = tuple_(*decode_cursor(cursor, sort, order, key))
+        stmt = stmt.where(keyset < last if order == "desc" else keyset > last)
+    if order == "desc":
+        stmt = stmt.order_by(key.column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(key.column, id_column)
+    page_stmt = stmt.add_columns(key.column).limit(limit + 1)
+    result = await session.execute(page_stmt)
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        entity, last_value = rows[-1]
+        next_cursor = encode_cursor(sort, order, last_value, entity.id)
+    return [r[0] for r in rows], next_cursor, min(total, COUNT_CAP), total <= COUNT_CAP
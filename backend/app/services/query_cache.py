@@ -0,0 +1,206 @@
+"""Read-through cache for dashboard queries, invalidated by per-branch data generations.
+
+Dashboard data only changes when a sync or rollup rebuild commits or staff
+rates are edited. Each branch carries a ``data_generation`` counter that
+these bump in the same transaction (a trigger does it for staff_rates) and
+announce with NOTIFY; API processes keep the latest value per branch in
+memory through a LISTEN connection. Cache keys include the generation, so
+a finished sync makes older entries unreachable without any explicit
+purge, and a cache hit costs no database round-trip at all.
+
+Entries live in an in-process LRU with a TTL (CACHE_BACKEND=memory) or in
+Redis (CACHE_BACKEND=redis, needs the optional ``redis`` package) when
+several API processes should share them. While the LISTEN connection is
+down, generations cannot be trusted and every lookup bypasses the cache.
+"""
+
+import asyncio
+import pickle
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Protocol
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.engine import engine
+from app.models import Branch
+
+GENERATION_CHANNEL = "data_generation"
+
+_MISSING = object()
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Any: ...  # _MISSING when absent
+
+    async def set(self, key: str, value: Any) -> None: ...
+
+    async def clear(self) -> None: ...
+
+
+class MemoryCache:
+    """Process-local LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires, value = entry
+        if self._clock() >= expires:
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache:
+    """Shared cache in Redis; entries expire after the TTL."""
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self._redis = aioredis.from_url(url)
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Any:
+        raw = await self._redis.get(key)
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._redis.set(key, pickle.dumps(value), ex=max(int(self.ttl), 1))
+
+    async def clear(self) -> None:
+        async for key in self._redis.scan_iter("kpf:*"):
+            await self._redis.delete(key)
+
+
+def _make_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCache(settings.CACHE_REDIS_URL, settings.CACHE_TTL_SECONDS)
+    return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+
+
+backend: CacheBackend = _make_backend()
+_generations: dict[int, int] = {}
+_listening = False
+
+
+def cache_key(
+    endpoint: str, branch_id: int, date_from: date, date_to: date, generation: int
+) -> str:
+    return f"kpf:{endpoint}:{branch_id}:{date_from}:{date_to}:{generation}"
+
+
+async def cached(
+    endpoint: str,
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    compute: Callable[[], Awaitable[Any]],
+) -> Any:
+    """Return the cached result for the query, or compute and store it."""
+    generation = _generations.get(branch_id)
+    if not settings.CACHE_ENABLED or not _listening or generation is None:
+        return await compute()
+    key = cache_key(endpoint, branch_id, date_from, date_to, generation)
+    value = await backend.get(key)
+    if value is _MISSING:
+        value = await compute()
+        # A sync may have landed while computing; store under the generation
+        # the query started from, so the entry is simply never read again.
+        await backend.set(key, value)
+    return value
+
+
+async def bump_generation(session: AsyncSession, branch_id: int) -> None:
+    """Advance a branch's data generation when the session commits. Does not commit.
+
+    pg_notify is transactional: listeners hear about the new generation
+    only once the data written in the same transaction is visible.
+    """
+    generation = await session.scalar(
+        update(Branch)
+        .where(Branch.id == branch_id)
+        .values(data_generation=Branch.data_generation + 1)
+        .returning(Branch.data_generation)
+    )
+    await session.execute(
+        select(func.pg_notify(GENERATION_CHANNEL, f"{branch_id}:{generation}"))
+    )
+
+
+def _on_notify(connection, pid, channel, payload: str) -> None:
+    # Runs inside asyncpg's protocol callback: an exception here would only
+    # reach the event loop's handler, so bad payloads are logged and dropped
+    try:
+        branch_id, generation = (int(part) for part in payload.split(":"))
+    except (AttributeError, ValueError):
+        logger.warning(f"Ignoring malformed {channel} notification: {payload!r}")
+        return
+    if generation > _generations.get(branch_id, -1):
+        _generations[branch_id] = generation
+
+
+async def listen_for_generations() -> None:
+    """Keep the in-memory generations current; runs for the API's lifetime.
+
+    Loads every branch's generation, then follows NOTIFYs. If the LISTEN
+    connection drops, caching is disabled until it is re-established.
+    """
+    global _listening
+    while True:
+        lost = asyncio.Event()
+        try:
+            async with engine.connect() as conn:
+                raw = (await conn.get_raw_connection()).driver_connection
+                on_lost = lambda _: lost.set()  # noqa: E731
+                raw.add_termination_listener(on_lost)
+                await raw.add_listener(GENERATION_CHANNEL, _on_notify)
+                try:
+                    result = await conn.execute(select(Branch.id, Branch.data_generation))
+                    _generations.update(dict(result.tuples().all()))
+                    await conn.commit()
+                    _listening = True
+                    logger.info(
+                        f"Query cache following data generations of "
+                        f"{len(_generations)} branch(es)"
+                    )
+                    await lost.wait()
+                    logger.warning("Query cache LISTEN connection lost — caching paused")
+                finally:
+                    _listening = False
+                    if not raw.is_closed():
+                        # The connection goes back to the pool; detach from it
+                        raw.remove_termination_listener(on_lost)
+                        await raw.remove_listener(GENERATION_CHANNEL, _on_notify)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Query cache LISTEN failed: {e} — caching paused")
+        finally:
+            _listening = False
+        await asyncio.sleep(5)
@@ -0,0 +1,137 @@
+"""Read-through cache for iiko reference dictionaries: memory → Postgres → iiko.
+
+Roles, employees, products, accounts and store → department mappings change
+rarely but are needed by every sync. A dictionary is downloaded from iiko
+only when its stored copy is older than REFERENCE_TTL_HOURS, when a sync
+sees ids the copy does not know (at most every
+REFERENCE_MISS_REFRESH_MINUTES), or on explicit refresh. Lookups in between
+are served from a process-local dict.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.bulk import copy_rows
+from app.db.engine import async_session
+from app.models import ReferenceEntry, ReferenceRefresh
+
+REFERENCE_KINDS = ("roles", "employees", "products", "accounts", "store_departments")
+
+
+@dataclass
+class _CachedReference:
+    entries: dict[str, str]
+    refreshed_at: datetime
+
+
+_memory: dict[str, _CachedReference] = {}
+_locks = {kind: asyncio.Lock() for kind in REFERENCE_KINDS}
+
+
+async def get_reference(client, kind: str, required: Iterable[str] = ()) -> dict[str, str]:
+    """Dictionary ``kind`` as id → value, refreshed from iiko only when needed.
+
+    ``required`` ids that are missing from the cached copy trigger a refresh
+    (new hires, new products), rate-limited by REFERENCE_MISS_REFRESH_MINUTES.
+    If iiko is unreachable, a stale copy is returned rather than failing.
+    """
+    async with _locks[kind]:
+        cached = _memory.get(kind) or await _load(kind)
+        now = datetime.utcnow()
+        stale = cached is None or now - cached.refreshed_at > timedelta(
+            hours=settings.REFERENCE_TTL_HOURS
+        )
+        missing = (
+            cached is not None
+            and now - cached.refreshed_at
+            > timedelta(minutes=settings.REFERENCE_MISS_REFRESH_MINUTES)
+            and any(key and key not in cached.entries for key in required)
+        )
+        if stale or missing:
+            try:
+                cached = await _refresh(client, kind)
+            except Exception as e:
+                if cached is None:
+                    raise
+                logger.warning(
+                    f"Reference refresh of {kind} failed: {e} — "
+                    f"using copy from {cached.refreshed_at:%Y-%m-%d %H:%M}"
+                )
+        _memory[kind] = cached
+        return cached.entries
+
+
+async def refresh_references(
+    client, kinds: Iterable[str] = REFERENCE_KINDS
+) -> dict[str, int]:
+    """Force-download the given dictionaries from iiko. Returns entry counts."""
+    counts = {}
+    for kind in kinds:
+        async with _locks[kind]:
+            cached = await _refresh(client, kind)
+            _memory[kind] = cached
+            counts[kind] = len(cached.entries)
+    return counts
+
+
+async def _download(client, kind: str) -> dict[str, str]:
+    if kind == "roles":
+        return await client.get_roles()
+    if kind == "employees":
+        return await client.get_employees()
+    if kind == "products":
+        return await client.get_products()
+    if kind == "accounts":
+        entities = await client.get_entity_list(["Account"], include_deleted=True)
+        return {e["id"]: e.get("name", "") for e in entities}
+    if kind == "store_departments":
+        stores = await client.get_stores()
+        return {s["id"]: s["parentId"] for s in stores if s.get("id") and s.get("parentId")}
+    raise ValueError(f"Unknown reference kind: {kind}")
+
+
+async def _load(kind: str) -> _CachedReference | None:
+    """Stored copy of a dictionary, or None if it was never downloaded."""
+    async with async_session() as session:
+        refreshed_at = await session.scalar(
+            select(ReferenceRefresh.refreshed_at).where(ReferenceRefresh.kind == kind)
+        )
+        if refreshed_at is None:
+            return None
+        result = await session.execute(
+            select(ReferenceEntry.iiko_id, ReferenceEntry.value).where(
+                ReferenceEntry.kind == kind
+            )
+        )
+        return _CachedReference(entries=dict(result.tuples().all()), refreshed_at=refreshed_at)
+
+
+async def _refresh(client, kind: str) -> _CachedReference:
+    """Download a dictionary from iiko and replace its stored copy."""
+    entries = await _download(client, kind)
+    now = datetime.utcnow()
+    async with async_session() as session:
+        await session.execute(delete(ReferenceEntry).where(ReferenceEntry.kind == kind))
+        await copy_rows(
+            session,
+            ReferenceEntry.__table__,
+            [{"kind": kind, "iiko_id": k, "value": v} for k, v in entries.items()],
+        )
+        stmt = insert(ReferenceRefresh).values(
+            kind=kind, refreshed_at=now, entry_count=len(entries)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ReferenceRefresh.kind],
+            set_={"refreshed_at": now, "entry_count": len(entries), "updated_at": now},
+        )
+        await session.execute(stmt)
+        await session.commit()
+    logger.info(f"Reference {kind} refreshed from iiko — {len(entries)} entries")
+    return _CachedReference(entries=entries, refreshed_at=now)
@@ -0,0 +1,203 @@
+"""Retry, backoff, circuit-breaker and throttling primitives for outbound iiko calls."""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from app.core.config import settings
+
+# Statuses worth retrying: throttling and transient server/gateway errors.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling iiko while the circuit breaker is open."""
+
+    def __init__(self, retry_in: float):
+        self.retry_in = retry_in
+        super().__init__(f"iiko circuit open — failing fast, next probe in {retry_in:.0f}s")
+
+
+def endpoint_class(path: str) -> str:
+    """Group an iiko API path into olap / documents / reference / auth."""
+    if path.endswith(("/auth", "/logout", "/licence/info")):
+        return "auth"
+    if path.endswith("/v2/reports/olap"):
+        return "olap"
+    if "/documents/" in path or path.endswith("/employees/attendance"):
+        return "documents"
+    return "reference"
+
+
+def endpoint_timeout(endpoint: str) -> httpx.Timeout:
+    """Per-class read timeout (OLAP reports are slow; auth must be quick)."""
+    read = {
+        "olap": settings.IIKO_TIMEOUT_OLAP,
+        "documents": settings.IIKO_TIMEOUT_DOCUMENTS,
+        "reference": settings.IIKO_TIMEOUT_REFERENCE,
+        "auth": settings.IIKO_TIMEOUT_AUTH,
+    }[endpoint]
+    return httpx.Timeout(read, connect=min(read, 10.0))
+
+
+def endpoint_concurrency(endpoint: str) -> int | None:
+    """Max in-flight requests per class; None = ungated (auth is capped by licence slots)."""
+    return {
+        "olap": settings.IIKO_MAX_CONCURRENT_OLAP,
+        "documents": settings.IIKO_MAX_CONCURRENT_DOCUMENTS,
+        "reference": settings.IIKO_MAX_CONCURRENT_REFERENCE,
+    }.get(endpoint)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def backoff_delay(
+    attempt: int,
+    base: float,
+    cap: float,
+    retry_after: float | None = None,
+    rng=random.random,
+) -> float:
+    """Delay before retry number ``attempt`` (1-based).
+
+    Full jitter: uniform in [0, min(cap, base * 2**(attempt-1))]. A server
+    Retry-After wins when present, capped at ``cap``.
+    """
+    if retry_after is not None:
+        return min(retry_after, cap)
+    return rng() * min(cap, base * 2 ** (attempt - 1))
+
+
+@dataclass
+class RetryStats:
+    """Process-wide counters for outbound iiko calls."""
+
+    requests: int = 0  # HTTP attempts sent, including retries
+    retries: int = 0
+    retry_wait_seconds: float = 0.0  # time spent sleeping between retries
+    failures: int = 0  # calls that gave up after their last attempt
+    short_circuited: int = 0  # calls rejected by the open breaker
+    throttle_wait_seconds: float = 0.0  # time spent waiting on the rate limiter
+    retries_by_endpoint: dict[str, int] = field(default_factory=dict)
+
+    def record_retry(self, endpoint: str, delay: float) -> None:
+        self.retries += 1
+        self.retry_wait_seconds += delay
+        self.retries_by_endpoint[endpoint] = self.retries_by_endpoint.get(endpoint, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "retry_wait_seconds": round(self.retry_wait_seconds, 3),
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+            "retries_by_endpoint": dict(self.retries_by_endpoint),
+        }
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed → open → half-open → closed.
+
+    After ``threshold`` transient failures in a row the breaker opens and
+    calls fail immediately for ``cooldown`` seconds. Then a single probe is
+    let through; its success closes the breaker, its failure re-opens it.
+    A probe that ends without either (cancelled, or an error that is not an
+    outcome of the call) must be handed back with release_probe().
+    """
+
+    def __init__(self, threshold: int, cooldown: float, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.cooldown:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpenError unless a call may go out now.
+
+        Returns True when the call is the half-open probe.
+        """
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        retry_in = self.cooldown - (self._clock() - self._opened_at)
+        raise CircuitOpenError(max(retry_in, 0.0))
+
+    def release_probe(self) -> None:
+        """Let another probe through after one ended without an outcome."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._probing or self._failures >= self.threshold:
+            self._opened_at = self._clock()
+        self._probing = False
+
+
+class TokenBucket:
+    """Request-rate limiter: ``rate`` requests/second with bursts up to ``burst``.
+
+    Callers reserve a token up front and sleep off any deficit, so waiters
+    are served in arrival order without a lock. A rate of 0 disables it.
+    """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def reserve(self) -> float:
+        """Take one token; return how long to wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> float:
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
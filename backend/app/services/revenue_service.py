@@ -1,10 +1,11 @@
 from datetime import date
 from decimal import Decimal
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import Date, and_, cast, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import DailyRevenue
+from app.services.pagination import SortKey, keyset_page
 
 
 async def get_revenue(
@@ -21,20 +22,111 @@ async def get_revenue(
         )
         .order_by(DailyRevenue.date)
     )
-    rows = result.scalars().all()
-    return [
-        {
-            "date": r.date,
-            "order_type": r.order_type,
-            "order_type_detail": r.order_type_detail,
-            "revenue_amount": r.revenue_amount,
-            "order_count": r.order_count,
-            "item_name": r.item_name,
-            "item_quantity": r.item_quantity,
-            "item_quantity_adjusted": r.item_quantity_adjusted,
-        }
-        for r in rows
-    ]
+    return [_revenue_dict(r) for r in result.scalars().all()]
+
+
+REVENUE_SORTS = {
+    "date": SortKey(DailyRevenue.date, date.fromisoformat),
+    "amount": SortKey(DailyRevenue.revenue_amount, Decimal),
+    "item": SortKey(func.coalesce(DailyRevenue.item_name, ""), str),
+}
+
+
+async def get_revenue_page(
+    session: AsyncSession,
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    sort: str = "date",
+    order: str = "asc",
+    limit: int = 100,
+    cursor: str | None = None,
+    order_type: str | None = None,
+    item: str | None = None,
+) -> dict:
+    """One keyset page of revenue rows, filtered by order type and dish substring."""
+    stmt = select(DailyRevenue).where(
+        and_(
+            DailyRevenue.branch_id == branch_id,
+            DailyRevenue.date >= date_from,
+            DailyRevenue.date <= date_to,
+        )
+    )
+    if order_type:
+        stmt = stmt.where(DailyRevenue.order_type == order_type)
+    if item:
+        stmt = stmt.where(DailyRevenue.item_name.icontains(item, autoescape=True))
+    rows, next_cursor, total, exact = await keyset_page(
+        session, stmt, DailyRevenue.id, sort, order, REVENUE_SORTS[sort], limit, cursor
+    )
+    return {
+        "items": [_revenue_dict(r) for r in rows],
+        "next_cursor": next_cursor,
+        "total_estimate": total,
+        "total_exact": exact,
+    }
+
+
+REVENUE_DIMENSIONS = {
+    "date": DailyRevenue.date,
+    "week": cast(func.date_trunc("week", DailyRevenue.date), Date),  # Monday
+    "month": cast(func.date_trunc("month", DailyRevenue.date), Date),
+    "order_type": DailyRevenue.order_type,
+    "order_type_detail": DailyRevenue.order_type_detail,
+    "item_name": DailyRevenue.item_name,
+}
+
+REVENUE_METRICS = {
+    "revenue": DailyRevenue.revenue_amount,
+    "quantity": DailyRevenue.item_quantity,
+    "adjusted_quantity": DailyRevenue.item_quantity_adjusted,
+}
+
+
+async def get_revenue_grouped(
+    session: AsyncSession,
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    group_by: list[str],
+    metrics: list[str],
+) -> list[dict]:
+    """Revenue aggregated in SQL over the requested dimensions.
+
+    Each row holds one value per dimension in ``group_by`` (week and month
+    as their first day) and one sum per metric. No dimensions gives a
+    single total row.
+    """
+    group_by = list(dict.fromkeys(group_by))
+    metrics = list(dict.fromkeys(metrics))
+    dims = [REVENUE_DIMENSIONS[d].label(d) for d in group_by]
+    sums = [func.coalesce(func.sum(REVENUE_METRICS[m]), 0).label(m) for m in metrics]
+    result = await session.execute(
+        select(*dims, *sums)
+        .where(
+            and_(
+                DailyRevenue.branch_id == branch_id,
+                DailyRevenue.date >= date_from,
+                DailyRevenue.date <= date_to,
+            )
+        )
+        .group_by(*dims)
+        .order_by(*dims)
+    )
+    return [dict(row._mapping) for row in result]
+
+
+def _revenue_dict(r: DailyRevenue) -> dict:
+    return {
+        "date": r.date,
+        "order_type": r.order_type,
+        "order_type_detail": r.order_type_detail,
+        "revenue_amount": r.revenue_amount,
+        "order_count": r.order_count,
+        "item_name": r.item_name,
+        "item_quantity": r.item_quantity,
+        "item_quantity_adjusted": r.item_quantity_adjusted,
+    }
 
 
 async def get_revenue_totals(
@@ -61,27 +153,11 @@ async def get_revenue_totals(
     return totals
 
 
-_KPF_TYPES = ["delivery", "hall"]
-
+ORDER_TYPES = ["delivery", "hall", "excluded"]
 
-async def get_khinkali_count(
-    session: AsyncSession, branch_id: int, date_from: date, date_to: date
-) -> Decimal:
-    """Sum adjusted quantities for all khinkali items (delivery + hall only)."""
-    result = await session.execute(
-        select(func.sum(DailyRevenue.item_quantity_adjusted))
-        .where(
-            and_(
-                DailyRevenue.branch_id == branch_id,
-                DailyRevenue.date >= date_from,
-                DailyRevenue.date <= date_to,
-                DailyRevenue.item_name.ilike("%хинкали%"),
-                DailyRevenue.order_type.in_(_KPF_TYPES),
-            )
-        )
-    )
-    return result.scalar() or Decimal("0")
+_KPF_TYPES = ["delivery", "hall"]
 
+KHINKALI_PATTERN = "%хинкали%"
 
 UPSELL_PATTERNS = {
     "uzvar": "%узвар%",
@@ -90,23 +166,29 @@ UPSELL_PATTERNS = {
 }
 
 
-async def get_upsell_counts(
-    session: AsyncSession, branch_id: int, date_from: date, date_to: date
-) -> dict[str, Decimal]:
-    """Get quantity sold for each upsell category (delivery + hall only)."""
-    counts: dict[str, Decimal] = {}
-    for key, pattern in UPSELL_PATTERNS.items():
-        result = await session.execute(
-            select(func.sum(DailyRevenue.item_quantity))
-            .where(
-                and_(
-                    DailyRevenue.branch_id == branch_id,
-                    DailyRevenue.date >= date_from,
-                    DailyRevenue.date <= date_to,
-                    DailyRevenue.item_name.ilike(pattern),
-                    DailyRevenue.order_type.in_(_KPF_TYPES),
-                )
-            )
-        )
-        counts[key] = result.scalar() or Decimal("0")
-    return counts
+def kpf_revenue_columns() -> list:
+    """Aggregates over DailyRevenue feeding the KPF rollup, in a single scan.
+
+    Revenue per order type, khinkali count and upsell quantities via
+    conditional aggregation (SUM ... FILTER), so adding an upsell pattern adds
+    a column, not a query. Labels match DailyKpfRollup column names.
+    """
+    kpf_row = DailyRevenue.order_type.in_(_KPF_TYPES)
+    columns = [
+        func.sum(DailyRevenue.revenue_amount)
+        .filter(DailyRevenue.order_type == order_type)
+        .label(f"revenue_{order_type}")
+        for order_type in ORDER_TYPES
+    ]
+    columns.append(
+        func.sum(DailyRevenue.item_quantity_adjusted)
+        .filter(and_(kpf_row, DailyRevenue.item_name.ilike(KHINKALI_PATTERN)))
+        .label("khinkali_count")
+    )
+    columns.extend(
+        func.sum(DailyRevenue.item_quantity)
+        .filter(and_(kpf_row, DailyRevenue.item_name.ilike(pattern)))
+        .label(f"upsell_{key}_qty")
+        for key, pattern in UPSELL_PATTERNS.items()
+    )
+    return columns
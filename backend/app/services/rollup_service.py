@@ -0,0 +1,238 @@
+"""Daily KPF rollup: one pre-aggregated row per branch per day."""
+
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import (
+    Date,
+    and_,
+    any_,
+    cast,
+    exists,
+    func,
+    literal,
+    literal_column,
+    select,
+    true,
+    union_all,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import DailyKpfRollup, DailyRevenue, EmployeeAttendance, Writeoff
+from app.services.checkpoint_service import save_checkpoint
+from app.services.labor_service import labor_split_columns, priced_shifts
+from app.services.query_cache import bump_generation
+from app.services.revenue_service import kpf_revenue_columns
+from app.services.writeoff_service import daily_writeoff_breakdown
+
+# Rollup columns filled from the per-day aggregate subqueries (all default 0).
+_METRIC_COLUMNS = [
+    "revenue_delivery",
+    "revenue_hall",
+    "revenue_excluded",
+    "labor_total",
+    "labor_kitchen",
+    "labor_hall",
+    "labor_hours",
+    "writeoff_total",
+    "khinkali_count",
+    "upsell_uzvar_qty",
+    "upsell_sauce_qty",
+    "upsell_bread_qty",
+]
+# Priced live by get_rollup_totals rather than read back from the rollup.
+_LABOR_COLUMNS = {"labor_total", "labor_kitchen", "labor_hall", "labor_hours"}
+
+
+def _day_series(date_from: date, date_to: date):
+    """generate_series of the days in [date_from, date_to] as a FROM clause."""
+    return (
+        func.generate_series(
+            literal(date_from, Date), literal(date_to, Date), literal_column("interval '1 day'")
+        )
+        .table_valued("day")
+        .render_derived(name="days")
+    )
+
+
+async def refresh_daily_rollup(
+    session: AsyncSession,
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    batch_id: str | None = None,
+) -> int:
+    """Recompute rollup rows for every day in [date_from, date_to].
+
+    Single INSERT ... SELECT ... ON CONFLICT statement: a generated day series
+    is left-joined to per-day revenue, labor and write-off aggregates, so days
+    that lost all their data are reset to zero instead of going stale. Labor is
+    priced per shift at the SCD2 rate valid that day, which keeps daily rows
+    additive; the stored labor columns are a snapshot (KPF prices labor live).
+    Does not commit.
+    """
+    days = _day_series(date_from, date_to)
+    day = cast(days.c.day, Date)
+
+    revenue = (
+        select(DailyRevenue.date, *kpf_revenue_columns())
+        .where(
+            and_(
+                DailyRevenue.branch_id == branch_id,
+                DailyRevenue.date >= date_from,
+                DailyRevenue.date <= date_to,
+            )
+        )
+        .group_by(DailyRevenue.date)
+        .subquery("rev")
+    )
+    shifts = priced_shifts(branch_id, date_from, date_to)
+    labor = (
+        select(shifts.c.shift_date, *labor_split_columns(shifts))
+        .group_by(shifts.c.shift_date)
+        .subquery("lab")
+    )
+    writeoffs = daily_writeoff_breakdown(branch_id, date_from, date_to)
+
+    sources = {}
+    for sub in (revenue, labor, writeoffs):
+        for col in sub.c:
+            if col.key in _METRIC_COLUMNS:
+                sources[col.key] = col
+
+    rows = (
+        select(
+            literal(branch_id).label("branch_id"),
+            day.label("date"),
+            *(func.coalesce(sources[name], 0).label(name) for name in _METRIC_COLUMNS),
+            func.coalesce(
+                writeoffs.c.writeoffs_by_category, cast(literal("{}"), JSONB)
+            ).label("writeoffs_by_category"),
+            literal(batch_id).label("sync_batch_id"),
+        )
+        .select_from(days)
+        .outerjoin(revenue, revenue.c.date == day)
+        .outerjoin(labor, labor.c.shift_date == day)
+        .outerjoin(writeoffs, writeoffs.c.date == day)
+    )
+    insert_cols = ["branch_id", "date", *_METRIC_COLUMNS, "writeoffs_by_category", "sync_batch_id"]
+    stmt = insert(DailyKpfRollup).from_select(insert_cols, rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyKpfRollup.branch_id, DailyKpfRollup.date],
+        set_={
+            **{name: stmt.excluded[name] for name in insert_cols[2:]},
+            "updated_at": func.now(),
+        },
+    )
+    await session.execute(stmt)
+    return (date_to - date_from).days + 1
+
+
+async def rebuild_rollups(session: AsyncSession, branch_id: int) -> int:
+    """Refresh the rollup over the full history of a branch. Commits."""
+    bounds = union_all(
+        select(func.min(DailyRevenue.date).label("lo"), func.max(DailyRevenue.date).label("hi"))
+        .where(DailyRevenue.branch_id == branch_id),
+        select(
+            func.min(cast(EmployeeAttendance.date_from, Date)),
+            func.max(cast(EmployeeAttendance.date_from, Date)),
+        ).where(EmployeeAttendance.branch_id == branch_id),
+        select(func.min(Writeoff.date), func.max(Writeoff.date))
+        .where(Writeoff.branch_id == branch_id),
+    ).subquery("bounds")
+    result = await session.execute(select(func.min(bounds.c.lo), func.max(bounds.c.hi)))
+    lo, hi = result.one()
+    if lo is None:
+        return 0
+    days = 0
+    # Year-sized slices keep each statement's working set small.
+    start = lo
+    while start <= hi:
+        end = min(start + timedelta(days=365), hi)
+        days += await refresh_daily_rollup(session, branch_id, start, end)
+        start = end + timedelta(days=1)
+    # Recorded so that ETags over any rebuilt range change (latest_write)
+    await save_checkpoint(
+        session,
+        branch_id,
+        lo,
+        hi,
+        "rollup",
+        status="success",
+        row_count=days,
+        batch_id=str(uuid.uuid4())[:8],
+    )
+    await bump_generation(session, branch_id)
+    await session.commit()
+    return days
+
+
+def _days_without_rollup(branch_id: int, date_from: date, date_to: date):
+    """Days of the range that have no rollup row yet, as one date[] value."""
+    days = _day_series(date_from, date_to)
+    day = cast(days.c.day, Date)
+    stored = exists().where(DailyKpfRollup.branch_id == branch_id, DailyKpfRollup.date == day)
+    missing = select(func.array_agg(day)).select_from(days).where(~stored).scalar_subquery()
+    # Wrapped so that ``= ANY(...)`` compares with the array, not a subquery row
+    return func.coalesce(missing, cast(literal("{}"), ARRAY(Date)))
+
+
+async def get_rollup_totals(
+    session: AsyncSession, branch_id: int, date_from: date, date_to: date
+) -> dict[str, Decimal]:
+    """Sum rollup metrics over a date range (≤ 365 rows per branch per year).
+
+    Labor is always priced live from priced_shifts(), so staff-rate edits
+    show up at once (the stored labor columns keep the rates of the last
+    refresh). Days without a rollup row (history synced before the rollup
+    existed and not yet rebuilt) have their revenue and write-offs
+    aggregated live too. Everything runs as one statement; the missing days
+    are collected once and matched with ``= ANY``, so a fully rolled-up
+    range reads no item-level revenue or write-off rows.
+    """
+    missing = _days_without_rollup(branch_id, date_from, date_to)
+    rollup = (
+        select(
+            *(
+                func.sum(getattr(DailyKpfRollup, name)).label(name)
+                for name in _METRIC_COLUMNS
+                if name not in _LABOR_COLUMNS
+            )
+        )
+        .where(
+            and_(
+                DailyKpfRollup.branch_id == branch_id,
+                DailyKpfRollup.date >= date_from,
+                DailyKpfRollup.date <= date_to,
+            )
+        )
+        .subquery("rollup")
+    )
+    revenue = (
+        select(*kpf_revenue_columns())
+        .where(DailyRevenue.branch_id == branch_id, DailyRevenue.date == any_(missing))
+        .subquery("rev")
+    )
+    shifts = priced_shifts(branch_id, date_from, date_to)
+    labor = select(*labor_split_columns(shifts)).subquery("lab")
+    writeoffs = (
+        select(func.sum(Writeoff.amount).label("writeoff_total"))
+        .where(Writeoff.branch_id == branch_id, Writeoff.date == any_(missing))
+        .subquery("wo")
+    )
+    live = {col.key: col for sub in (revenue, labor, writeoffs) for col in sub.c}
+    totals = [
+        func.coalesce(live[name], 0).label(name)
+        if name in _LABOR_COLUMNS
+        else (func.coalesce(rollup.c[name], 0) + func.coalesce(live[name], 0)).label(name)
+        for name in _METRIC_COLUMNS
+    ]
+    result = await session.execute(
+        select(*totals).select_from(
+            rollup.join(revenue, true()).join(labor, true()).join(writeoffs, true())
+        )
+    )
+    row = result.one()._mapping
+    return {name: Decimal(row[name]) for name in _METRIC_COLUMNS}
@@ -1,16 +1,34 @@
 """ETL pipeline: fetches data from iiko, transforms, and upserts to DB."""
 
+import asyncio
+import time
 import uuid
+from dataclasses import dataclass, field, replace
 from datetime import date, datetime, timedelta
 from decimal import Decimal, InvalidOperation
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
 
-from sqlalchemy import select
+from sqlalchemy import and_, delete, exists, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import TableClause
 
+from app.core.config import settings
 from app.core.logger import logger
+from app.db.bulk import (
+    abatched,
+    copy_rows,
+    create_staging_table,
+    drop_staging_table,
+    prefetch,
+)
 from app.db.engine import async_session
 from app.models import Branch, DailyRevenue, EmployeeAttendance, SyncLog, Writeoff
+from app.services.checkpoint_service import get_checkpoint, save_checkpoint
+from app.services.fingerprint import Fingerprint, payload_fingerprint
 from app.services.iiko_client import IikoClient
+from app.services.query_cache import bump_generation
+from app.services.rollup_service import refresh_daily_rollup
 from app.services.transformers import (
     adjust_quantity,
     map_order_type,
@@ -18,20 +36,413 @@ from app.services.transformers import (
 )
 
 
-async def daily_sync(target_date: date | None = None, sync_type: str = "daily"):
-    """Run full ETL pipeline for a single date."""
+class BranchSyncError(Exception):
+    """Raised after a multi-branch run in which at least one branch failed."""
+
+    def __init__(self, failed: dict[str, str]):
+        self.failed = failed
+        super().__init__(
+            f"{len(failed)} branch sync(s) failed: "
+            + "; ".join(f"{name}: {err}" for name, err in failed.items())
+        )
+
+
+@dataclass
+class SharedSyncData:
+    """iiko payloads that cover all departments, fetched once per run."""
+
+    attendance: list[dict] = field(default_factory=list)
+    role_map: dict[str, str] = field(default_factory=dict)
+    employee_map: dict[str, str] = field(default_factory=dict)
+    product_map: dict[str, str] = field(default_factory=dict)
+    account_map: dict[str, str] = field(default_factory=dict)
+    store_departments: dict[str, str] = field(default_factory=dict)  # store id → department id
+    revenue_rows: dict[str, list[dict]] | None = None  # department id → SALES rows (buffered)
+    revenue_streams: "_SalesFanOut | None" = None  # combined SALES, streamed per department
+    writeoff_docs: list[dict] | None = None  # None = documents API failed
+    single_branch: bool = True
+
+
+@dataclass
+class StageResult:
+    """Outcome of one stage write (see _write_stage)."""
+
+    records: int  # rows in the payload; 0 when skipped
+    payload_hash: str
+    skipped: bool = False  # payload identical to the last successful write
+
+
+async def daily_sync(target_date: date | None = None, sync_type: str = "daily") -> int:
+    """Run the ETL pipeline for every active branch for a single date.
+
+    Department-wide payloads (attendance, roles, employees, products,
+    accounts, stores, write-off documents) are fetched once, concurrently;
+    branch-specific OLAP and DB writes then fan out (see sync_window for
+    how many branches run at once). Each branch keeps its own
+    SyncLog and its revenue / attendance / write-off stages run side by side,
+    each through its own session, so one slow or failing branch or stage
+    does not block the rest.
+    """
     if target_date is None:
         target_date = date.today()
         # Default: yesterday's data (complete business day)
         target_date = target_date - timedelta(days=1)
 
+    date_str = target_date.isoformat()
+
+    async with async_session() as session:
+        branches = await get_active_branches(session)
+
+    logger.info(
+        f"Starting {sync_type} sync for {date_str} — {len(branches)} branch(es)"
+    )
+    client = IikoClient()
+    async with client.session():
+        results = await sync_window(client, branches, target_date, target_date, sync_type)
+
+    total_records = 0
+    failed: dict[str, str] = {}
+    for branch, outcome in zip(branches, results):
+        if isinstance(outcome, BaseException):
+            failed[branch.name] = str(outcome)[:200]
+        else:
+            total_records += outcome
+    logger.info(
+        f"{sync_type} sync for {date_str} done — {total_records} records, "
+        f"{len(branches) - len(failed)}/{len(branches)} branches OK"
+    )
+    if failed:
+        raise BranchSyncError(failed)
+    return total_records
+
+
+async def trailing_sync(
+    days: int | None = None, sync_type: str = "daily", date_to: date | None = None
+) -> int:
+    """Re-sync the last ``days`` days (default SYNC_RESYNC_DAYS) up to ``date_to``.
+
+    ``date_to`` defaults to yesterday.
+
+    iiko write-off documents and attendance are corrected after the fact,
+    so the nightly job revisits a trailing window instead of yesterday only.
+    The whole window is fetched in one request set, SALES included, and
+    split per day. Splitting needs the window's rows in memory, so the
+    SALES report is buffered here rather than streamed. Every day then
+    goes through the regular per-day checkpoints, so days whose
+    payload hashes match the last write cost no DB writes and no rollup
+    refresh. Only days whose upstream data changed are rewritten.
+    """
+    days = max(days or settings.SYNC_RESYNC_DAYS, 1)
+    if date_to is None:
+        date_to = date.today() - timedelta(days=1)
+    date_from = date_to - timedelta(days=days - 1)
+
+    async with async_session() as session:
+        branches = await get_active_branches(session)
+
+    logger.info(
+        f"Starting {sync_type} sync for {date_from}..{date_to} — "
+        f"{len(branches)} branch(es), {days} day(s)"
+    )
+    semaphore = asyncio.Semaphore(settings.SYNC_BRANCH_CONCURRENCY)
+    client = IikoClient()
+    started = datetime.utcnow()
+    async with client.session():
+        try:
+            shared = await _fetch_shared(
+                client,
+                date_from.isoformat(),
+                date_to.isoformat(),
+                [b.iiko_department_id for b in branches],
+                combine_sales=True,
+            )
+        except Exception as e:
+            await _log_shared_fetch_failure(branches, sync_type, started, e)
+            raise BranchSyncError({b.name: str(e)[:200] for b in branches}) from e
+        per_day = _split_shared_by_day(shared, date_from, date_to)
+
+        async def run(branch: Branch, day: date) -> int:
+            async with semaphore:
+                return await _sync_branch(client, per_day[day], branch, day, day, sync_type)
+
+        pairs = [(branch, day) for day in per_day for branch in branches]
+        results = await asyncio.gather(
+            *(run(branch, day) for branch, day in pairs), return_exceptions=True
+        )
+
+    total_records = 0
+    failed: dict[str, str] = {}
+    for (branch, day), outcome in zip(pairs, results):
+        if isinstance(outcome, BaseException):
+            failed[f"{branch.name} {day}"] = str(outcome)[:200]
+        else:
+            total_records += outcome
+    logger.info(
+        f"{sync_type} sync for {date_from}..{date_to} done — {total_records} records "
+        f"rewritten, {len(pairs) - len(failed)}/{len(pairs)} branch-days OK"
+    )
+    if failed:
+        raise BranchSyncError(failed)
+    return total_records
+
+
+async def get_active_branches(session: AsyncSession) -> list[Branch]:
+    """Active branches ordered by id (creates the configured branch if missing)."""
+    await _ensure_branch(session)
+    result = await session.execute(
+        select(Branch).where(Branch.is_active.is_(True)).order_by(Branch.id)
+    )
+    return list(result.scalars().all())
+
+
+async def sync_window(
+    client: IikoClient,
+    branches: list[Branch],
+    date_from: date,
+    date_to: date,
+    sync_type: str,
+) -> list[int | BaseException]:
+    """Sync [date_from, date_to] for the given branches over an open client session.
+
+    Returns one outcome per branch, in order: the record count, or the
+    exception that failed that branch (already logged and recorded in its
+    SyncLog). If the shared payloads cannot be fetched, every branch fails
+    with that error.
+
+    With SYNC_COMBINED_OLAP and several branches, one SALES request covers
+    them all and its rows are fanned out to the branches' revenue stages as
+    they arrive (see _SalesFanOut). Every branch has to be reading for the
+    report to advance, so all of them run at once; otherwise at most
+    SYNC_BRANCH_CONCURRENCY branches are in flight.
+    """
+    department_ids = [b.iiko_department_id for b in branches]
+    fan_out = None
+    if settings.SYNC_COMBINED_OLAP and len(branches) > 1:
+        # Opened now so the SALES request overlaps the shared fetches
+        fan_out = _SalesFanOut(
+            _fetch_sales(
+                client,
+                date_from.isoformat(),
+                date_to.isoformat(),
+                department_ids,
+                by_department=True,
+            ),
+            department_ids,
+            settings.SYNC_WRITE_BATCH_ROWS,
+        )
+    semaphore = asyncio.Semaphore(
+        len(branches) if fan_out is not None else settings.SYNC_BRANCH_CONCURRENCY
+    )
+    started = datetime.utcnow()
+    try:
+        try:
+            shared = await _fetch_shared(
+                client, date_from.isoformat(), date_to.isoformat(), department_ids
+            )
+        except Exception as e:
+            await _log_shared_fetch_failure(branches, sync_type, started, e)
+            return [e] * len(branches)
+        shared.revenue_streams = fan_out
+
+        async def run(branch: Branch) -> int:
+            try:
+                async with semaphore:
+                    return await _sync_branch(
+                        client, shared, branch, date_from, date_to, sync_type
+                    )
+            finally:
+                if fan_out is not None:
+                    # However the branch ended, its rows no longer hold up the rest
+                    fan_out.release(branch.iiko_department_id)
+
+        return await asyncio.gather(*(run(b) for b in branches), return_exceptions=True)
+    finally:
+        if fan_out is not None:
+            await fan_out.close()
+
+
+async def _log_shared_fetch_failure(
+    branches: list[Branch], sync_type: str, started: datetime, error: Exception
+) -> None:
+    """Record a failed SyncLog per branch when the shared payloads could not be fetched."""
+    logger.error(f"Shared sync payloads failed for {len(branches)} branch(es): {error}")
+    async with async_session() as session:
+        session.add_all(
+            SyncLog(
+                batch_id=str(uuid.uuid4())[:8],
+                branch_id=branch.id,
+                sync_type=sync_type,
+                status="failed",
+                records_processed=0,
+                error_message=str(error)[:2000],
+                started_at=started,
+                completed_at=datetime.utcnow(),
+            )
+            for branch in branches
+        )
+        await session.commit()
+
+
+async def _fetch_shared(
+    client: IikoClient,
+    date_from: str,
+    date_to: str,
+    department_ids: list[str],
+    combine_sales: bool = False,
+) -> SharedSyncData:
+    """Fetch the payloads every branch needs, once per run.
+
+    Attendance (+ roles and employees), write-off documents (+ products,
+    accounts and stores) and, with ``combine_sales``, the combined SALES
+    report are independent, so the chains run concurrently and the run
+    waits for the slowest one instead of their sum. ``combine_sales``
+    buffers every SALES row in revenue_rows (trailing_sync splits them per
+    day); sync_window streams SALES through a _SalesFanOut instead.
+    """
+    shared = SharedSyncData(single_branch=len(department_ids) == 1)
+    fetches = [
+        _fetch_shared_attendance(client, shared, date_from, date_to, department_ids),
+        _fetch_shared_writeoffs(client, shared, date_from, date_to),
+    ]
+    if combine_sales:
+        fetches.append(_fetch_shared_sales(client, shared, date_from, date_to, department_ids))
+    await asyncio.gather(*fetches)
+    return shared
+
+
+async def _fetch_shared_sales(
+    client: IikoClient,
+    shared: SharedSyncData,
+    date_from: str,
+    date_to: str,
+    department_ids: list[str],
+) -> None:
+    # One SALES request for all branches instead of one per branch
+    rows = _fetch_sales(client, date_from, date_to, department_ids, by_department=True)
+    shared.revenue_rows = await _demux_by_department(rows, department_ids)
+
+
+async def _fetch_shared_attendance(
+    client: IikoClient,
+    shared: SharedSyncData,
+    date_from: str,
+    date_to: str,
+    department_ids: list[str],
+) -> None:
+    # Attendance covers every department; stream it and keep only our branches
+    wanted = set(department_ids)
+    shared.attendance = [
+        rec
+        async for rec in client.iter_attendance(date_from=date_from, date_to=date_to)
+        if rec.get("departmentId") in wanted
+    ]
+    # Reference dictionaries come from the local cache; ids seen in the
+    # payloads but unknown to the cache trigger a refresh.
+    shared.role_map, shared.employee_map = await asyncio.gather(
+        client.get_reference("roles", {a.get("roleId") for a in shared.attendance}),
+        client.get_reference("employees", {a.get("employeeId") for a in shared.attendance}),
+    )
+
+
+async def _fetch_shared_writeoffs(
+    client: IikoClient, shared: SharedSyncData, date_from: str, date_to: str
+) -> None:
+    try:
+        docs = await client.get_writeoff_documents(date_from, date_to)
+    except Exception as e:
+        logger.warning(f"Write-off documents API failed: {e} — skipping writeoffs")
+        return
+
+    # Resolve product, account and store→department mappings
+    products, accounts, stores = await asyncio.gather(
+        client.get_reference(
+            "products", {i.get("productId") for d in docs for i in d.get("items", [])}
+        ),
+        client.get_reference("accounts", {d.get("accountId") for d in docs}),
+        client.get_reference("store_departments", {d.get("storeId") for d in docs}),
+        return_exceptions=True,
+    )
+    for name, result in (("Product name", products), ("Account name", accounts), ("Store", stores)):
+        if isinstance(result, BaseException):
+            logger.warning(f"{name} resolution failed: {result}")
+    if not isinstance(products, BaseException):
+        shared.product_map = products
+    if not isinstance(accounts, BaseException):
+        shared.account_map = accounts
+    if isinstance(stores, BaseException) and not shared.single_branch:
+        # Without the store→department map no branch would get any document,
+        # and an empty payload deletes the window's write-offs.
+        logger.warning("Store departments unknown — skipping writeoffs for this run")
+        return
+    if not isinstance(stores, BaseException):
+        shared.store_departments = stores
+    shared.writeoff_docs = docs
+
+
+def _split_shared_by_day(
+    shared: SharedSyncData, date_from: date, date_to: date
+) -> dict[date, SharedSyncData]:
+    """Slice window payloads into one SharedSyncData per day.
+
+    Rows are dated the way the stages date them (OLAP OpenDate.Typed, shift
+    start, document dateIncoming), so each slice equals what a single-day
+    fetch returns and hashes the same. Reference maps are shared.
+    """
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+    def by_day(items: list[dict], field_name: str) -> dict[date, list[dict]]:
+        buckets: dict[date, list[dict]] = {day: [] for day in days}
+        for item in items:
+            bucket = buckets.get(_row_date(item.get(field_name), date_from))
+            if bucket is not None:
+                bucket.append(item)
+        return buckets
+
+    attendance = by_day(shared.attendance, "dateFrom")
+    docs = None
+    if shared.writeoff_docs is not None:
+        docs = by_day(shared.writeoff_docs, "dateIncoming")
+    revenue = None
+    if shared.revenue_rows is not None:
+        revenue = {
+            dept_id: by_day(rows, "OpenDate.Typed")
+            for dept_id, rows in shared.revenue_rows.items()
+        }
+    return {
+        day: replace(
+            shared,
+            attendance=attendance[day],
+            writeoff_docs=docs[day] if docs is not None else None,
+            revenue_rows=(
+                {dept_id: rows[day] for dept_id, rows in revenue.items()}
+                if revenue is not None
+                else None
+            ),
+        )
+        for day in days
+    }
+
+
+async def _sync_branch(
+    client: IikoClient,
+    shared: SharedSyncData,
+    branch: Branch,
+    date_from: date,
+    date_to: date,
+    sync_type: str,
+) -> int:
+    """Sync one branch for a date window in its own session, with its own SyncLog."""
     batch_id = str(uuid.uuid4())[:8]
-    date_str = target_date.isoformat()  # for iiko API (expects YYYY-MM-DD string)
-    logger.info(f"[{batch_id}] Starting {sync_type} sync for {date_str}")
+    period = date_from.isoformat()
+    if date_to != date_from:
+        period = f"{period}..{date_to.isoformat()}"
+    dept_id = branch.iiko_department_id
+    logger.info(f"[{batch_id}] Starting {sync_type} sync of {branch.name} for {period}")
 
     async with async_session() as session:
         sync_log = SyncLog(
             batch_id=batch_id,
+            branch_id=branch.id,
             sync_type=sync_type,
             status="running",
             records_processed=0,
@@ -41,43 +452,121 @@ async def daily_sync(target_date: date | None = None, sync_type: str = "daily"):
         await session.commit()
 
         try:
-            branch = await _ensure_branch(session)
-            total_records = 0
-
-            dept_id = branch.iiko_department_id
-            client = IikoClient()
-            async with client.session():
-                # 1. Revenue (OLAP SALES)
-                n = await _sync_revenue(
-                    client, session, branch.id, target_date, date_str, batch_id, dept_id
+            # 1. Revenue (OLAP SALES — shared combined report or per department)
+            if shared.revenue_streams is not None:
+                rows = shared.revenue_streams.stream(dept_id)
+            elif shared.revenue_rows is not None:
+                rows = shared.revenue_rows.get(dept_id, [])
+            else:
+                # Streamed: rows are transformed and written batch by batch
+                rows = _fetch_sales(
+                    client, date_from.isoformat(), date_to.isoformat(), [dept_id]
                 )
-                total_records += n
-                logger.info(f"[{batch_id}] Revenue: {n} records")
-
-                # 2. Attendance
-                n = await _sync_attendance(
-                    client, session, branch.id, date_str, batch_id, dept_id
+            stages = [
+                _run_stage(
+                    "revenue",
+                    batch_id,
+                    lambda s: _sync_revenue(rows, s, branch.id, date_from, date_to, batch_id),
+                ),
+                # 2. Attendance (shared all-department payload)
+                _run_stage(
+                    "attendance",
+                    batch_id,
+                    lambda s: _sync_attendance(
+                        shared.attendance,
+                        shared.role_map,
+                        shared.employee_map,
+                        s,
+                        branch.id,
+                        date_from,
+                        date_to,
+                        batch_id,
+                        dept_id,
+                    ),
+                ),
+            ]
+            # 3. Write-offs (shared documents, split by store department)
+            if shared.writeoff_docs is not None:
+                docs = _docs_for_department(
+                    shared.writeoff_docs,
+                    shared.store_departments,
+                    dept_id,
+                    shared.single_branch,
+                )
+                stages.append(
+                    _run_stage(
+                        "writeoffs",
+                        batch_id,
+                        lambda s: _sync_writeoffs(
+                            docs,
+                            shared.product_map,
+                            shared.account_map,
+                            s,
+                            branch.id,
+                            date_from,
+                            date_to,
+                            batch_id,
+                        ),
+                    )
                 )
-                total_records += n
-                logger.info(f"[{batch_id}] Attendance: {n} records")
+            # Stages touch disjoint tables and checkpoint independently, so
+            # they run side by side; a failed one does not cancel the others.
+            outcomes = await asyncio.gather(*stages, return_exceptions=True)
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+            results = dict(zip(["revenue", "attendance", "writeoffs"], outcomes))
+            total_records = sum(r.records for r in results.values())
+            skipped = [stage for stage, r in results.items() if r.skipped]
 
-                # 3. Write-offs
-                n = await _sync_writeoffs(
-                    client, session, branch.id, target_date, date_str, batch_id, dept_id
+            # 4. KPF rollup for the synced days — only if some stage changed
+            # or the last rollup did not see the current stage payloads.
+            rollup_hash = payload_fingerprint(
+                [{"stage": stage, "hash": r.payload_hash} for stage, r in results.items()]
+            )
+            previous = await get_checkpoint(session, branch.id, date_from, date_to, "rollup")
+            if (
+                len(skipped) == len(results)
+                and previous is not None
+                and previous.status == "success"
+                and previous.payload_hash == rollup_hash
+            ):
+                skipped.append("rollup")
+                logger.info(f"[{batch_id}] Rollup: inputs unchanged, skipped")
+            else:
+                started = time.perf_counter()
+                await refresh_daily_rollup(session, branch.id, date_from, date_to, batch_id)
+                await save_checkpoint(
+                    session,
+                    branch.id,
+                    date_from,
+                    date_to,
+                    "rollup",
+                    status="success",
+                    row_count=(date_to - date_from).days + 1,
+                    duration_ms=int((time.perf_counter() - started) * 1000),
+                    payload_hash=rollup_hash,
+                    batch_id=batch_id,
                 )
-                total_records += n
-                logger.info(f"[{batch_id}] Write-offs: {n} records")
 
+            if "rollup" not in skipped:
+                # Dashboards cached for this branch are stale from this commit on
+                await bump_generation(session, branch.id)
             sync_log.status = "success"
             sync_log.records_processed = total_records
+            sync_log.stages_skipped = ",".join(skipped) or None
             sync_log.completed_at = datetime.utcnow()
             await session.commit()
             logger.info(
                 f"[{batch_id}] Sync complete — {total_records} records processed"
             )
+            return total_records
 
         except Exception as e:
-            logger.error(f"[{batch_id}] Sync failed: {e}")
+            logger.error(f"[{batch_id}] Sync of {branch.name} failed: {e}")
+            await session.rollback()
+            # Stages that did finish have already committed their rows
+            await bump_generation(session, branch.id)
             sync_log.status = "failed"
             sync_log.error_message = str(e)[:2000]
             sync_log.completed_at = datetime.utcnow()
@@ -85,10 +574,38 @@ async def daily_sync(target_date: date | None = None, sync_type: str = "daily"):
             raise
 
 
+async def _run_stage(
+    stage: str, batch_id: str, write: Callable[[AsyncSession], Awaitable[StageResult]]
+) -> StageResult:
+    """Run one stage writer in its own session so stages commit independently."""
+    async with async_session() as session:
+        result = await write(session)
+    if not result.skipped:
+        logger.info(f"[{batch_id}] {stage}: {result.records} records")
+    return result
+
+
+def _docs_for_department(
+    docs: list[dict],
+    store_departments: dict[str, str],
+    iiko_department_id: str,
+    single_branch: bool,
+) -> list[dict]:
+    """Select write-off documents whose store belongs to the department.
+
+    Documents carry a storeId, not a department. With a single active branch
+    every document is attributed to it (the pre multi-branch behaviour), so
+    an incomplete store mapping never drops data there.
+    """
+    if single_branch:
+        return docs
+    return [
+        d for d in docs if store_departments.get(d.get("storeId")) == iiko_department_id
+    ]
+
+
 async def _ensure_branch(session: AsyncSession) -> Branch:
     """Get or create the target branch from config."""
-    from app.core.config import settings
-
     dept_id = settings.IIKO_DEPARTMENT_ID
     result = await session.execute(
         select(Branch).where(Branch.iiko_department_id == dept_id)
@@ -123,145 +640,416 @@ def _safe_int(value, default: int = 0) -> int:
         return default
 
 
-async def _sync_revenue(
+_SALES_GROUP_FIELDS = ["OpenDate.Typed", "OrderType", "Delivery.SourceKey", "DishName"]
+_SALES_AGG_FIELDS = ["DishDiscountSumInt", "DishAmountInt"]
+
+
+def _fetch_sales(
     client: IikoClient,
-    session: AsyncSession,
-    branch_id: int,
-    target_date: date,
-    date_str: str,
-    batch_id: str,
-    iiko_department_id: str | None = None,
-) -> int:
+    date_from: str,
+    date_to: str,
+    department_ids: list[str],
+    by_department: bool = False,
+) -> AsyncIterator[dict]:
+    """Stream OLAP SALES rows for the given departments, one per day and dish.
+
+    With by_department=True, Department.Id is added as a group field so rows
+    from one request can be split per branch (see _demux_by_department).
+    """
+    group_fields = list(_SALES_GROUP_FIELDS)
+    if by_department:
+        group_fields.append("Department.Id")
     filters = {}
-    if iiko_department_id:
+    if department_ids:
         filters["Department.Id"] = {
             "filterType": "IncludeValues",
-            "values": [iiko_department_id],
+            "values": department_ids,
         }
-    rows = await client.get_olap_report(
+    return client.iter_olap_report(
         report_type="SALES",
-        group_fields=["OpenDate.Typed", "OrderType", "Delivery.SourceKey", "DishName"],
-        agg_fields=["DishDiscountSumInt", "DishAmountInt"],
-        date_from=date_str,
-        date_to=date_str,
+        group_fields=group_fields,
+        agg_fields=_SALES_AGG_FIELDS,
+        date_from=date_from,
+        date_to=date_to,
         filters=filters,
     )
 
-    # Delete old records for this date/branch before inserting
-    from sqlalchemy import and_, delete
 
-    await session.execute(
-        delete(DailyRevenue).where(
-            and_(
-                DailyRevenue.branch_id == branch_id,
-                DailyRevenue.date == target_date,
+async def _demux_by_department(
+    rows: AsyncIterable[dict], department_ids: list[str]
+) -> dict[str, list[dict]]:
+    """Collect combined SALES rows into one list per department.
+
+    The whole report ends up in memory; sync_window streams it through a
+    _SalesFanOut instead.
+    """
+    buckets: dict[str, list[dict]] = {dept_id: [] for dept_id in department_ids}
+    async for row in rows:
+        bucket = buckets.get(row.get("Department.Id"))
+        if bucket is not None:
+            bucket.append(row)
+    return buckets
+
+
+class _SalesFanOut:
+    """Fan one combined SALES stream out to a bounded row stream per department.
+
+    A background task reads the report and queues each row for its
+    department, at most ``depth`` rows ahead of that department's reader, so
+    every branch's revenue stage writes while the report is still arriving.
+    A full queue holds up the whole report: each department must be read via
+    stream() or given up via release(). A report failure is raised in every
+    stream still open.
+    """
+
+    def __init__(self, rows: AsyncIterable[dict], department_ids: list[str], depth: int):
+        self._queues = {dept_id: asyncio.Queue(maxsize=depth) for dept_id in department_ids}
+        self._released: set[str] = set()
+        self._done = object()
+        self._task = asyncio.create_task(self._produce(rows))
+
+    async def _produce(self, rows: AsyncIterable[dict]) -> None:
+        end = self._done
+        try:
+            async for row in rows:
+                dept_id = row.get("Department.Id")
+                if dept_id in self._queues and dept_id not in self._released:
+                    await self._queues[dept_id].put(row)
+                elif len(self._released) == len(self._queues):
+                    return  # nobody is reading any more
+        except Exception as e:  # re-raised in every open stream
+            end = e
+        for dept_id, queue in self._queues.items():
+            if dept_id not in self._released:
+                await queue.put(end)
+
+    async def stream(self, dept_id: str) -> AsyncIterator[dict]:
+        """Yield the department's rows as they arrive (once per department)."""
+        queue = self._queues[dept_id]
+        try:
+            while True:
+                item = await queue.get()
+                if item is self._done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.release(dept_id)
+
+    def release(self, dept_id: str) -> None:
+        """Stop queueing rows for a department and unblock the reader task."""
+        self._released.add(dept_id)
+        queue = self._queues[dept_id]
+        while not queue.empty():
+            queue.get_nowait()
+
+    async def close(self) -> None:
+        """Stop reading the report (it is abandoned if not fully read)."""
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+async def _write_stage(
+    session: AsyncSession,
+    stage: str,
+    model,
+    window,
+    records: AsyncIterable[dict] | Iterable[dict],
+    key: list[str],
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    batch_id: str,
+    require_rows: bool = False,
+) -> StageResult:
+    """Merge a stage's rows for the window by natural key, checkpointed by payload hash.
+
+    ``records`` may be a list or a stream. They are consumed in
+    SYNC_WRITE_BATCH_ROWS batches while the fingerprint is accumulated and
+    spooled into a temp staging table, so memory stays bounded and reading
+    the next batch overlaps with writing the current one.
+
+    If the last checkpoint for (branch, window, stage) succeeded with the
+    same payload fingerprint, nothing is written and the result is marked
+    skipped.
+    Otherwise the staged rows are upserted on ``key`` (rows whose values did
+    not change are left untouched), rows in ``window`` whose key is no longer
+    in the payload are deleted, and the checkpoint is upserted in the same
+    commit. Readers never see the window empty. A failed stage is rolled
+    back and recorded as a failed checkpoint.
+
+    ``require_rows`` marks a payload that cannot legitimately be empty (the
+    source had documents); an empty one fails the stage instead of deleting
+    everything in the window.
+    """
+    started = time.perf_counter()
+    try:
+        fingerprint = Fingerprint()
+        batches = prefetch(abatched(records, settings.SYNC_WRITE_BATCH_ROWS))
+        first = await anext(batches, [])
+        if require_rows and not first:
+            raise ValueError(
+                f"{stage}: source documents produced no rows — refusing to empty the window"
             )
+        fingerprint.update(first)
+        staging = None
+        async for batch in batches:
+            if staging is None:
+                staging = await create_staging_table(session, model.__table__, list(first[0]))
+                await copy_rows(session, staging, first)
+            fingerprint.update(batch)
+            await copy_rows(session, staging, batch)
+
+        payload_hash = fingerprint.hexdigest()
+        previous = await get_checkpoint(session, branch_id, date_from, date_to, stage)
+        if previous and previous.status == "success" and previous.payload_hash == payload_hash:
+            if staging is not None:
+                await drop_staging_table(session, staging)
+            await session.commit()
+            logger.info(
+                f"[{batch_id}] {stage}: payload unchanged since {previous.batch_id}, skipped"
+            )
+            return StageResult(0, payload_hash, skipped=True)
+
+        if staging is None and first:
+            staging = await create_staging_table(session, model.__table__, list(first[0]))
+            await copy_rows(session, staging, first)
+        changed = 0
+        if staging is not None:
+            changed = await _upsert_from_staging(session, model, staging, key)
+        removed = await _delete_vanished(session, model, window, staging, key)
+        count = fingerprint.count
+        await save_checkpoint(
+            session,
+            branch_id,
+            date_from,
+            date_to,
+            stage,
+            status="success",
+            row_count=count,
+            duration_ms=int((time.perf_counter() - started) * 1000),
+            payload_hash=payload_hash,
+            batch_id=batch_id,
+        )
+        await session.commit()
+        logger.info(
+            f"[{batch_id}] {stage}: {changed} of {count} rows inserted/updated, "
+            f"{removed} removed"
+        )
+    except Exception as e:
+        await session.rollback()
+        await save_checkpoint(
+            session,
+            branch_id,
+            date_from,
+            date_to,
+            stage,
+            status="failed",
+            duration_ms=int((time.perf_counter() - started) * 1000),
+            batch_id=batch_id,
+            error_message=str(e)[:2000],
         )
+        await session.commit()
+        raise
+    return StageResult(count, payload_hash)
+
+
+async def _upsert_from_staging(
+    session: AsyncSession, model, staging: TableClause, key: list[str]
+) -> int:
+    """INSERT staged rows ... ON CONFLICT (key) DO UPDATE only where values differ.
+
+    Returns the number of rows inserted or changed. sync_batch_id alone does
+    not count as a change, so identical rows keep their tuple (no dead rows).
+    """
+    table = model.__table__
+    columns = [c.name for c in staging.columns]
+    # DISTINCT ON guards against a payload repeating a key, which would make
+    # ON CONFLICT touch the same row twice and fail.
+    rows = select(staging).distinct(*(staging.c[k] for k in key))
+    stmt = insert(table).from_select(columns, rows)
+    updates = [c for c in columns if c not in key]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=key,
+        set_={**{c: stmt.excluded[c] for c in updates}, "updated_at": func.now()},
+        where=or_(
+            *(
+                table.c[c].is_distinct_from(stmt.excluded[c])
+                for c in updates
+                if c != "sync_batch_id"
+            )
+        ),
+    )
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+async def _delete_vanished(
+    session: AsyncSession, model, window, staging: TableClause | None, key: list[str]
+) -> int:
+    """Delete rows in ``window`` whose natural key is absent from the staged payload."""
+    table = model.__table__
+    stmt = delete(model).where(window)
+    if staging is not None:
+        match = []
+        for k in key:
+            column = table.c[k]
+            if not column.nullable:
+                match.append(column == staging.c[k])
+            else:
+                match.append(column.is_not_distinct_from(staging.c[k]))
+        stmt = stmt.where(~exists().where(*match))
+    result = await session.execute(stmt)
+    return result.rowcount
+
+
+# Natural key of a SALES row: the OLAP group-by fields, per branch, plus the
+# derived order_type (see DailyRevenue).
+_REVENUE_KEY = [
+    "branch_id", "date", "order_type_detail", "delivery_source", "item_name", "order_type"
+]
+
+
+async def _sync_revenue(
+    rows: AsyncIterable[dict] | Iterable[dict],
+    session: AsyncSession,
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    batch_id: str,
+) -> StageResult:
+    """Store OLAP SALES rows (a list, or a stream straight from iiko)."""
+    if isinstance(rows, AsyncIterable):
+        records = (_revenue_row(row, branch_id, date_from, batch_id) async for row in rows)
+    else:
+        records = (_revenue_row(row, branch_id, date_from, batch_id) for row in rows)
+    window = and_(
+        DailyRevenue.branch_id == branch_id,
+        DailyRevenue.date >= date_from,
+        DailyRevenue.date <= date_to,
+    )
+    return await _write_stage(
+        session,
+        "revenue",
+        DailyRevenue,
+        window,
+        records,
+        _REVENUE_KEY,
+        branch_id,
+        date_from,
+        date_to,
+        batch_id,
     )
 
-    count = 0
-    for row in rows:
-        raw_order_type = row.get("OrderType", "")
-        delivery_source = row.get("Delivery.SourceKey")
-        item_name = row.get("DishName")
-        quantity = _safe_decimal(row.get("DishAmountInt"))
-        quantity_adjusted = adjust_quantity(item_name, quantity)
-
-        record = DailyRevenue(
-            branch_id=branch_id,
-            date=target_date,
-            order_type=map_order_type(raw_order_type, delivery_source),
-            order_type_detail=raw_order_type,
-            revenue_amount=_safe_decimal(row.get("DishDiscountSumInt")),
-            order_count=_safe_int(row.get("DishAmountInt")),
-            item_name=item_name,
-            item_quantity=quantity,
-            item_quantity_adjusted=quantity_adjusted,
-            sync_batch_id=batch_id,
-        )
-        session.add(record)
-        count += 1
 
-    await session.commit()
-    return count
+def _revenue_row(row: dict, branch_id: int, target_date: date, batch_id: str) -> dict:
+    """Transform one OLAP SALES row into a daily_revenue column dict.
+
+    The row's OpenDate.Typed is used as its date; target_date is the fallback.
+    """
+    raw_order_type = row.get("OrderType", "")
+    delivery_source = row.get("Delivery.SourceKey")
+    item_name = row.get("DishName")
+    quantity = _safe_decimal(row.get("DishAmountInt"))
+    return {
+        "branch_id": branch_id,
+        "date": _row_date(row.get("OpenDate.Typed"), target_date),
+        "order_type": map_order_type(raw_order_type, delivery_source),
+        "order_type_detail": raw_order_type,
+        "delivery_source": delivery_source,
+        "revenue_amount": _safe_decimal(row.get("DishDiscountSumInt")),
+        "order_count": _safe_int(row.get("DishAmountInt")),
+        "item_name": item_name,
+        "item_quantity": quantity,
+        "item_quantity_adjusted": adjust_quantity(item_name, quantity),
+        "sync_batch_id": batch_id,
+    }
 
 
 async def _sync_attendance(
-    client: IikoClient,
+    records: list[dict],
+    role_map: dict[str, str],
+    employee_map: dict[str, str],
     session: AsyncSession,
     branch_id: int,
-    date_str: str,
+    date_from: date,
+    date_to: date,
     batch_id: str,
     iiko_department_id: str | None = None,
-) -> int:
-    records = await client.get_attendance(date_from=date_str, date_to=date_str)
-
-    # Resolve role and employee names
-    role_map = await client.get_roles()
-    employee_map = await client.get_employees()
-
-    # Delete existing attendance for this date/branch to allow re-sync
-    from sqlalchemy import and_, delete
-
-    target_date = date.fromisoformat(date_str)
-    await session.execute(
-        delete(EmployeeAttendance).where(
-            and_(
-                EmployeeAttendance.branch_id == branch_id,
-                EmployeeAttendance.date_from >= datetime(
-                    target_date.year, target_date.month, target_date.day
-                ),
-                EmployeeAttendance.date_from < datetime(
-                    target_date.year, target_date.month, target_date.day
-                ) + timedelta(days=1),
-            )
-        )
-    )
+) -> StageResult:
+    date_str = date_from.isoformat()
 
-    count = 0
+    rows = []
     for rec in records:
         # Filter by department (attendance API returns ALL branches)
         if iiko_department_id and rec.get("departmentId") != iiko_department_id:
             continue
+        row = _attendance_row(rec, role_map, employee_map, branch_id, date_str, batch_id)
+        if row is not None:
+            rows.append(row)
 
-        att_id = rec.get("id")
-        if not att_id:
-            continue
+    window = and_(
+        EmployeeAttendance.branch_id == branch_id,
+        EmployeeAttendance.date_from >= datetime.combine(date_from, datetime.min.time()),
+        EmployeeAttendance.date_from
+        < datetime.combine(date_to + timedelta(days=1), datetime.min.time()),
+    )
+    return await _write_stage(
+        session,
+        "attendance",
+        EmployeeAttendance,
+        window,
+        rows,
+        ["iiko_attendance_id"],
+        branch_id,
+        date_from,
+        date_to,
+        batch_id,
+    )
 
-        # Duration (Продолжительность) = dateFrom→dateTo from Attendance Journal.
-        # iiko attendance XML has no "duration" field; calculate from timestamps.
-        dt_from = _parse_datetime(rec.get("dateFrom", date_str))
-        dt_to = _parse_datetime(rec.get("dateTo"))
-        if dt_from and dt_to and dt_to > dt_from:
-            worked_min = int((dt_to - dt_from).total_seconds() / 60)
-        else:
-            worked_min = 0
-        payment_sum = _safe_decimal(rec.get("regularPaymentSum"))
-        overtime_sum = _safe_decimal(rec.get("overtimePayedSum"))
-        total_payment = (payment_sum + overtime_sum).quantize(Decimal("0.01"))
-
-        emp_id = rec.get("employeeId", "")
-        role_id = rec.get("roleId")
-
-        record = EmployeeAttendance(
-            iiko_attendance_id=att_id,
-            branch_id=branch_id,
-            employee_id=emp_id,
-            employee_name=employee_map.get(emp_id),
-            role_id=role_id,
-            role_name=role_map.get(role_id) if role_id else None,
-            date_from=dt_from,
-            date_to=dt_to,
-            worked_minutes=worked_min,
-            worked_hours=Decimal(str(round(worked_min / 60, 2))),
-            iiko_payment_sum=total_payment,
-            sync_batch_id=batch_id,
-        )
-        session.add(record)
-        count += 1
 
-    await session.commit()
-    return count
+def _attendance_row(
+    rec: dict,
+    role_map: dict[str, str],
+    employee_map: dict[str, str],
+    branch_id: int,
+    date_str: str,
+    batch_id: str,
+) -> dict | None:
+    """Transform one attendance record into an employee_attendance column dict."""
+    att_id = rec.get("id")
+    if not att_id:
+        return None
+
+    # Duration (Продолжительность) = dateFrom→dateTo from Attendance Journal.
+    # iiko attendance XML has no "duration" field; calculate from timestamps.
+    dt_from = _parse_datetime(rec.get("dateFrom", date_str))
+    dt_to = _parse_datetime(rec.get("dateTo"))
+    if dt_from and dt_to and dt_to > dt_from:
+        worked_min = int((dt_to - dt_from).total_seconds() / 60)
+    else:
+        worked_min = 0
+    payment_sum = _safe_decimal(rec.get("regularPaymentSum"))
+    overtime_sum = _safe_decimal(rec.get("overtimePayedSum"))
+    total_payment = (payment_sum + overtime_sum).quantize(Decimal("0.01"))
+
+    emp_id = rec.get("employeeId", "")
+    role_id = rec.get("roleId")
+    return {
+        "iiko_attendance_id": att_id,
+        "branch_id": branch_id,
+        "employee_id": emp_id,
+        "employee_name": employee_map.get(emp_id),
+        "role_id": role_id,
+        "role_name": role_map.get(role_id) if role_id else None,
+        "date_from": dt_from,
+        "date_to": dt_to,
+        "worked_minutes": worked_min,
+        "worked_hours": Decimal(str(round(worked_min / 60, 2))),
+        "iiko_payment_sum": total_payment,
+        "sync_batch_id": batch_id,
+    }
 
 
 def _parse_datetime(value: str | None) -> datetime | None:
@@ -282,79 +1070,97 @@ def _parse_datetime(value: str | None) -> datetime | None:
     return None
 
 
+def _row_date(value: str | None, default: date) -> date:
+    """Calendar date of an iiko date/datetime string, or default if unparseable."""
+    parsed = _parse_datetime(value)
+    return parsed.date() if parsed else default
+
+
 async def _sync_writeoffs(
-    client: IikoClient,
+    docs: list[dict],
+    product_map: dict[str, str],
+    account_map: dict[str, str],
     session: AsyncSession,
     branch_id: int,
-    target_date: date,
-    date_str: str,
+    date_from: date,
+    date_to: date,
     batch_id: str,
-    iiko_department_id: str | None = None,
-) -> int:
-    """Fetch write-off documents via /v2/documents/writeoff (PROCESSED only)."""
-    from sqlalchemy import and_, delete
-
-    # Delete old writeoff records for this date/branch
-    await session.execute(
-        delete(Writeoff).where(
-            and_(
-                Writeoff.branch_id == branch_id,
-                Writeoff.date == target_date,
-            )
+) -> StageResult:
+    """Store write-off documents from /v2/documents/writeoff (PROCESSED only)."""
+    rows = []
+    for doc in docs:
+        rows.extend(
+            _writeoff_rows(doc, product_map, account_map, branch_id, date_from, batch_id)
         )
+    window = and_(
+        Writeoff.branch_id == branch_id,
+        Writeoff.date >= date_from,
+        Writeoff.date <= date_to,
+    )
+    return await _write_stage(
+        session,
+        "writeoffs",
+        Writeoff,
+        window,
+        rows,
+        ["iiko_document_id", "line_number"],
+        branch_id,
+        date_from,
+        date_to,
+        batch_id,
+        require_rows=any(
+            doc.get("status") == "PROCESSED" and (doc.get("id") or doc.get("documentNumber"))
+            for doc in docs
+        ),
     )
 
-    try:
-        docs = await client.get_writeoff_documents(date_str, date_str)
-    except Exception as e:
-        logger.warning(f"Write-off documents API failed: {e} — skipping writeoffs")
-        await session.commit()
-        return 0
 
-    # Resolve product and account names from iiko
-    try:
-        product_map = await client.get_products()
-    except Exception as e:
-        logger.warning(f"Product name resolution failed: {e}")
-        product_map = {}
+def _writeoff_rows(
+    doc: dict,
+    product_map: dict[str, str],
+    account_map: dict[str, str],
+    branch_id: int,
+    target_date: date,
+    batch_id: str,
+) -> list[dict]:
+    """Transform one write-off document into writeoffs column dicts (one per item).
 
-    try:
-        account_entities = await client.get_entity_list(["Account"], include_deleted=True)
-        account_map = {e["id"]: e.get("name", "") for e in account_entities}
-    except Exception as e:
-        logger.warning(f"Account name resolution failed: {e}")
-        account_map = {}
+    Items are dated by the document's dateIncoming; target_date is the fallback.
+    """
+    # Only PROCESSED docs (API already filters, but double-check)
+    if doc.get("status") != "PROCESSED":
+        return []
 
-    count = 0
-    for doc in docs:
-        # Only PROCESSED docs (API already filters, but double-check)
-        if doc.get("status") != "PROCESSED":
-            continue
+    doc_date = _row_date(doc.get("dateIncoming"), target_date)
 
-        doc_number = doc.get("documentNumber")
-        account_id = doc.get("accountId")
-        account_name = account_map.get(account_id, "") if account_id else ""
-
-        for item in doc.get("items", []):
-            cost = _safe_decimal(item.get("cost"))
-            product_id = item.get("productId", "unknown")
-            product_name = product_map.get(product_id)
-            quantity = _safe_decimal(item.get("amount"))
-
-            record = Writeoff(
-                branch_id=branch_id,
-                date=target_date,
-                article_name=product_id,
-                category=map_writeoff_category(account_name or product_id),
-                amount=cost,
-                document_number=doc_number,
-                account_name=account_name or None,
-                product_name=product_name,
-                item_quantity=quantity if quantity else None,
-                sync_batch_id=batch_id,
-            )
-            session.add(record)
-            count += 1
+    doc_number = doc.get("documentNumber")
+    account_id = doc.get("accountId")
+    account_name = account_map.get(account_id, "") if account_id else ""
+
+    doc_id = doc.get("id") or doc_number
+    if not doc_id:
+        # Without a key its lines could not be told apart from other documents'
+        logger.warning(f"Write-off document without id or number dated {doc_date} — skipped")
+        return []
 
-    await session.commit()
-    return count
+    rows = []
+    for position, item in enumerate(doc.get("items", []), start=1):
+        product_id = item.get("productId", "unknown")
+        quantity = _safe_decimal(item.get("amount"))
+        rows.append(
+            {
+                "branch_id": branch_id,
+                "date": doc_date,
+                "article_name": product_id,
+                "category": map_writeoff_category(account_name or product_id),
+                "amount": _safe_decimal(item.get("cost")),
+                "document_number": doc_number,
+                "iiko_document_id": doc_id,
+                "line_number": _safe_int(item.get("num"), position),
+                "account_name": account_name or None,
+                "product_name": product_map.get(product_id),
+                "item_quantity": quantity if quantity else None,
+                "sync_batch_id": batch_id,
+            }
+        )
+    return rows
@@ -5,6 +5,7 @@ from sqlalchemy import and_, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Writeoff
+from app.services.pagination import SortKey, keyset_page
 
 
 async def get_writeoffs(
@@ -21,18 +22,61 @@ async def get_writeoffs(
         )
         .order_by(Writeoff.date)
     )
-    return [
-        {
-            "date": r.date,
-            "document_number": r.document_number,
-            "account_name": r.account_name,
-            "product_name": r.product_name,
-            "item_quantity": r.item_quantity,
-            "category": r.category,
-            "amount": r.amount,
-        }
-        for r in result.scalars().all()
-    ]
+    return [_writeoff_dict(r) for r in result.scalars().all()]
+
+
+WRITEOFF_SORTS = {
+    "date": SortKey(Writeoff.date, date.fromisoformat),
+    "amount": SortKey(Writeoff.amount, Decimal),
+    "item": SortKey(func.coalesce(Writeoff.product_name, ""), str),
+}
+
+
+async def get_writeoffs_page(
+    session: AsyncSession,
+    branch_id: int,
+    date_from: date,
+    date_to: date,
+    sort: str = "date",
+    order: str = "asc",
+    limit: int = 100,
+    cursor: str | None = None,
+    category: str | None = None,
+    item: str | None = None,
+) -> dict:
+    """One keyset page of write-off lines, filtered by category and product substring."""
+    stmt = select(Writeoff).where(
+        and_(
+            Writeoff.branch_id == branch_id,
+            Writeoff.date >= date_from,
+            Writeoff.date <= date_to,
+        )
+    )
+    if category:
+        stmt = stmt.where(Writeoff.category == category)
+    if item:
+        stmt = stmt.where(Writeoff.product_name.icontains(item, autoescape=True))
+    rows, next_cursor, total, exact = await keyset_page(
+        session, stmt, Writeoff.id, sort, order, WRITEOFF_SORTS[sort], limit, cursor
+    )
+    return {
+        "items": [_writeoff_dict(r) for r in rows],
+        "next_cursor": next_cursor,
+        "total_estimate": total,
+        "total_exact": exact,
+    }
+
+
+def _writeoff_dict(r: Writeoff) -> dict:
+    return {
+        "date": r.date,
+        "document_number": r.document_number,
+        "account_name": r.account_name,
+        "product_name": r.product_name,
+        "item_quantity": r.item_quantity,
+        "category": r.category,
+        "amount": r.amount,
+    }
 
 
 async def get_writeoff_summary(
@@ -72,3 +116,34 @@ async def get_writeoff_total(
         )
     )
     return result.scalar() or Decimal("0")
+
+
+def daily_writeoff_breakdown(branch_id: int, date_from: date, date_to: date):
+    """Per-day write-off total plus {category: amount} JSONB for the KPF rollup."""
+    by_category = (
+        select(
+            Writeoff.date,
+            Writeoff.category,
+            func.sum(Writeoff.amount).label("amount"),
+        )
+        .where(
+            and_(
+                Writeoff.branch_id == branch_id,
+                Writeoff.date >= date_from,
+                Writeoff.date <= date_to,
+            )
+        )
+        .group_by(Writeoff.date, Writeoff.category)
+        .subquery("wo_category")
+    )
+    return (
+        select(
+            by_category.c.date,
+            func.sum(by_category.c.amount).label("writeoff_total"),
+            func.jsonb_object_agg(by_category.c.category, by_category.c.amount).label(
+                "writeoffs_by_category"
+            ),
+        )
+        .group_by(by_category.c.date)
+        .subquery("wo")
+    )
@@ -0,0 +1,5 @@
+import asyncio
+
+from app.worker.runner import run_worker
+
+asyncio.run(run_worker())
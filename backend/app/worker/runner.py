@@ -0,0 +1,115 @@
+"""Sync worker process: runs queued sync jobs and the nightly schedule.
+
+Start with ``python -m app.worker``. Any number of worker processes may
+poll the same queue; SKIP LOCKED hands each job to exactly one of them.
+"""
+
+import asyncio
+import os
+import signal
+import socket
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.db.engine import engine
+from app.models import SyncJob
+from app.services.iiko_client import iiko_sessions
+from app.services.job_queue import claim_job, finish_job, heartbeat, requeue_stale, run_job
+from app.worker.scheduler import shutdown_scheduler, start_scheduler
+
+
+async def run_worker(concurrency: int | None = None) -> None:
+    """Poll the job queue until SIGTERM/SIGINT, then let running jobs finish."""
+    concurrency = max(concurrency or settings.SYNC_WORKER_CONCURRENCY, 1)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    start_scheduler()
+    logger.info(f"Sync worker {worker_id} started — {concurrency} job(s) at a time")
+    slots = asyncio.Semaphore(concurrency)
+    running: set[asyncio.Task] = set()
+    try:
+        await requeue_stale()
+        while not stop.is_set():
+            await slots.acquire()
+            try:
+                job = await claim_job(worker_id)
+            except Exception as e:
+                logger.error(f"Claiming a sync job failed: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), settings.SYNC_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    await requeue_stale()
+                continue
+            task = asyncio.create_task(_execute(job, slots))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    finally:
+        logger.info(f"Sync worker {worker_id} stopping — {len(running)} job(s) to finish")
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        shutdown_scheduler()
+        await iiko_sessions.close()
+        await engine.dispose()
+
+
+async def _execute(job: SyncJob, slots: asyncio.Semaphore) -> None:
+    """Run one job with a heartbeat, record its outcome and free its slot."""
+    logger.info(
+        f"Sync job {job.id} started: {job.kind} {job.date_from}..{job.date_to} "
+        f"(attempt {job.attempts})"
+    )
+    work = asyncio.create_task(run_job(job))
+    beating = asyncio.create_task(
+        _keep_alive(job.id, work, settings.SYNC_JOB_STALE_MINUTES * 60 / 3)
+    )
+    try:
+        outcome = await work
+    except asyncio.CancelledError:
+        if not beating.done():
+            raise
+        # The lease lapsed; requeue_stale() hands the job out again
+        logger.error(f"Sync job {job.id} abandoned — its heartbeat could not be recorded")
+        return
+    except Exception as e:
+        outcome = e
+    finally:
+        beating.cancel()
+        slots.release()
+    await finish_job(job.id, outcome)
+    if isinstance(outcome, BaseException):
+        logger.error(f"Sync job {job.id} failed: {outcome}")
+    else:
+        logger.info(f"Sync job {job.id} done — {outcome} records")
+
+
+async def _keep_alive(job_id: int, work: asyncio.Task, interval: float) -> None:
+    """Heartbeat a running job; cancel ``work`` once its lease can't be trusted.
+
+    A single failed heartbeat (database blip) is logged and retried on the
+    next beat. After SYNC_JOB_HEARTBEAT_FAILURES in a row the job may be
+    about to be requeued to another worker, so it is stopped here rather
+    than left to run twice.
+    """
+    failures = 0
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await heartbeat(job_id)
+        except Exception as e:
+            failures += 1
+            logger.warning(
+                f"Sync job {job_id} heartbeat failed "
+                f"({failures}/{settings.SYNC_JOB_HEARTBEAT_FAILURES}): {e}"
+            )
+            if failures >= settings.SYNC_JOB_HEARTBEAT_FAILURES:
+                work.cancel()
+                return
+        else:
+            failures = 0
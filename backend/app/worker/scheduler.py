@@ -19,7 +19,8 @@ def start_scheduler():
     )
     scheduler.start()
     logger.info(
-        f"Scheduler started. Daily sync at {settings.SYNC_HOUR:02d}:{settings.SYNC_MINUTE:02d}"
+        f"Scheduler started. Daily sync at {settings.SYNC_HOUR:02d}:{settings.SYNC_MINUTE:02d}, "
+        f"last {settings.SYNC_RESYNC_DAYS} day(s)"
     )
 
 
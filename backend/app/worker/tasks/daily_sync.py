@@ -1,10 +1,21 @@
+from datetime import date, timedelta
+
+from app.core.config import settings
 from app.core.logger import logger
-from app.services.sync_service import daily_sync
+from app.db.engine import async_session
+from app.services.job_queue import enqueue_sync
 
 
 async def run_daily_sync():
-    """Scheduled task: sync yesterday's data from iiko."""
+    """Scheduled task: queue a sync of the last SYNC_RESYNC_DAYS days up to yesterday.
+
+    Days whose iiko data did not change since the last run are skipped. Every
+    worker runs the schedule; the queue folds their jobs into one.
+    """
+    date_to = date.today() - timedelta(days=1)
+    date_from = date_to - timedelta(days=max(settings.SYNC_RESYNC_DAYS, 1) - 1)
     try:
-        await daily_sync(target_date=None, sync_type="daily")
+        async with async_session() as session:
+            await enqueue_sync(session, "trailing", date_from, date_to, sync_type="daily")
     except Exception as e:
-        logger.error(f"Scheduled daily sync failed: {e}")
+        logger.error(f"Queueing scheduled daily sync failed: {e}")
@@ -0,0 +1,127 @@
+"""Benchmark: labor_service.get_labor latency and statement count vs headcount.
+
+Seeds a throw-away branch with N employees x 30 days of shifts and two SCD2
+rate versions each, times get_labor, then removes everything it inserted.
+
+Usage (against a migrated database from DATABASE_URL):
+    python -m benchmarks.bench_labor [headcount ...]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, event
+
+from app.db.engine import async_session, engine
+from app.models import Branch, EmployeeAttendance, StaffRate
+from app.services.labor_service import get_labor
+
+DAYS = 30
+RUNS = 7
+ROLES = ["Повар СВОБ", "Официант СВОБ", "Бармен", "Посудомойка СВОБ", "Управляющий"]
+PERIOD_START = date(2026, 1, 1)
+
+_statements = 0
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(*_args):
+    global _statements
+    _statements += 1
+
+
+async def _seed(headcount: int) -> int:
+    async with async_session() as session:
+        branch = Branch(
+            iiko_department_id=f"bench-{uuid.uuid4()}", name="bench", is_active=False
+        )
+        session.add(branch)
+        await session.flush()
+        for e in range(headcount):
+            emp_id = f"bench-emp-{e}"
+            session.add_all(
+                [
+                    StaffRate(
+                        employee_id=emp_id,
+                        employee_name=f"Bench {e}",
+                        branch_id=branch.id,
+                        hourly_rate=Decimal(200 + e % 50),
+                        version=1,
+                        is_current=False,
+                        valid_from=date(2025, 1, 1),
+                        valid_to=PERIOD_START + timedelta(days=DAYS // 2),
+                    ),
+                    StaffRate(
+                        employee_id=emp_id,
+                        employee_name=f"Bench {e}",
+                        branch_id=branch.id,
+                        hourly_rate=Decimal(250 + e % 50),
+                        version=2,
+                        is_current=True,
+                        valid_from=PERIOD_START + timedelta(days=DAYS // 2),
+                        valid_to=None,
+                    ),
+                ]
+            )
+            for d in range(DAYS):
+                start = datetime.combine(PERIOD_START + timedelta(days=d), datetime.min.time())
+                session.add(
+                    EmployeeAttendance(
+                        branch_id=branch.id,
+                        employee_id=emp_id,
+                        employee_name=f"Bench {e}",
+                        role_name=ROLES[e % len(ROLES)],
+                        date_from=start + timedelta(hours=10),
+                        date_to=start + timedelta(hours=20),
+                        worked_minutes=600,
+                        worked_hours=Decimal("10"),
+                    )
+                )
+        await session.commit()
+        return branch.id
+
+
+async def _cleanup(branch_id: int) -> None:
+    async with async_session() as session:
+        await session.execute(
+            delete(EmployeeAttendance).where(EmployeeAttendance.branch_id == branch_id)
+        )
+        await session.execute(delete(StaffRate).where(StaffRate.branch_id == branch_id))
+        await session.execute(delete(Branch).where(Branch.id == branch_id))
+        await session.commit()
+
+
+async def bench(headcount: int) -> tuple[int, float]:
+    global _statements
+    branch_id = await _seed(headcount)
+    period_end = PERIOD_START + timedelta(days=DAYS - 1)
+    try:
+        timings = []
+        async with async_session() as session:
+            await get_labor(session, branch_id, PERIOD_START, period_end)  # warm-up
+            for _ in range(RUNS):
+                _statements = 0
+                t0 = time.perf_counter()
+                await get_labor(session, branch_id, PERIOD_START, period_end)
+                timings.append((time.perf_counter() - t0) * 1000)
+        return _statements, statistics.median(timings)
+    finally:
+        await _cleanup(branch_id)
+
+
+async def main(headcounts: list[int]) -> None:
+    print(f"{'headcount':>10} {'shifts':>8} {'statements':>11} {'median ms':>10}")
+    for n in headcounts:
+        statements, median_ms = await bench(n)
+        print(f"{n:>10} {n * DAYS:>8} {statements:>11} {median_ms:>10.2f}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    counts = [int(a) for a in sys.argv[1:]] or [10, 40, 80, 160, 320]
+    asyncio.run(main(counts))
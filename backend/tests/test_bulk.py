@@ -0,0 +1,47 @@
+"""Unit tests for bulk-write stream helpers."""
+
+import asyncio
+
+import pytest
+
+from app.db.bulk import abatched, prefetch
+
+
+async def _collect(stream):
+    return [item async for item in stream]
+
+
+async def _rows(n: int, fail_at: int | None = None):
+    for i in range(n):
+        if i == fail_at:
+            raise RuntimeError("stream broke")
+        yield {"i": i}
+
+
+# ── abatched ──────────────────────────────────────────────────
+
+
+class TestAbatched:
+    def test_sync_iterable(self):
+        batches = asyncio.run(_collect(abatched([{"i": i} for i in range(5)], 2)))
+        assert [len(b) for b in batches] == [2, 2, 1]
+
+    def test_async_iterable(self):
+        batches = asyncio.run(_collect(abatched(_rows(4), 2)))
+        assert [[r["i"] for r in b] for b in batches] == [[0, 1], [2, 3]]
+
+    def test_empty(self):
+        assert asyncio.run(_collect(abatched([], 2))) == []
+
+
+# ── prefetch ──────────────────────────────────────────────────
+
+
+class TestPrefetch:
+    def test_preserves_order(self):
+        items = asyncio.run(_collect(prefetch(_rows(10), depth=2)))
+        assert [r["i"] for r in items] == list(range(10))
+
+    def test_propagates_producer_error(self):
+        with pytest.raises(RuntimeError, match="stream broke"):
+            asyncio.run(_collect(prefetch(_rows(10, fail_at=3))))
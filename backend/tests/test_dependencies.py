@@ -0,0 +1,50 @@
+"""Unit tests for ETag helpers used by conditional GETs."""
+
+from app.dependencies import etag_matches, make_etag
+
+PARAMS = [("branch_id", "1"), ("date_from", "2025-01-01"), ("date_to", "2025-01-31")]
+
+
+# ── make_etag ──────────────────────────────────────────────────
+
+
+class TestMakeEtag:
+    def test_strong_and_quoted(self):
+        etag = make_etag("/api/v1/revenue", PARAMS, "abc@2025-02-01")
+        assert etag.startswith('"') and etag.endswith('"')
+        assert not etag.startswith("W/")
+
+    def test_param_order_irrelevant(self):
+        assert make_etag("/x", PARAMS, "v") == make_etag("/x", PARAMS[::-1], "v")
+
+    def test_changes_with_version(self):
+        assert make_etag("/x", PARAMS, "v1") != make_etag("/x", PARAMS, "v2")
+
+    def test_changes_with_path(self):
+        assert make_etag("/a", PARAMS, "v") != make_etag("/b", PARAMS, "v")
+
+    def test_changes_with_range(self):
+        other = [("branch_id", "1"), ("date_from", "2025-01-02"), ("date_to", "2025-01-31")]
+        assert make_etag("/x", PARAMS, "v") != make_etag("/x", other, "v")
+
+
+# ── etag_matches ───────────────────────────────────────────────
+
+
+class TestEtagMatches:
+    def test_missing_header(self):
+        assert not etag_matches(None, '"a"')
+        assert not etag_matches("", '"a"')
+
+    def test_exact(self):
+        assert etag_matches('"a"', '"a"')
+        assert not etag_matches('"b"', '"a"')
+
+    def test_list(self):
+        assert etag_matches('"x", "a" ,"y"', '"a"')
+
+    def test_weak_comparison(self):
+        assert etag_matches('W/"a"', '"a"')
+
+    def test_wildcard(self):
+        assert etag_matches("*", '"a"')
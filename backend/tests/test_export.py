@@ -0,0 +1,110 @@
+"""Unit tests for the streaming export writers."""
+
+import asyncio
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.services.export_service import (
+    DATASETS,
+    _Drain,
+    check_format,
+    write_csv,
+    write_parquet,
+    write_xlsx,
+)
+
+COLUMNS = [("branch_id", "int"), ("date", "date"), ("item_name", "str"), ("amount", "decimal")]
+BATCHES = [
+    [(1, date(2025, 1, 1), "Хинкали", Decimal("12.50")), (1, date(2025, 1, 1), None, Decimal("3"))],
+    [(2, date(2025, 1, 2), 'Соус "ткемали", 50 г', Decimal("0.75"))],
+]
+
+
+async def _batches(batches=BATCHES):
+    for batch in batches:
+        yield batch
+
+
+def _collect(chunks) -> list[bytes]:
+    async def run():
+        return [chunk async for chunk in chunks]
+
+    return asyncio.run(run())
+
+
+# ── write_csv ──────────────────────────────────────────────────
+
+
+class TestWriteCsv:
+    def test_header_sent_before_rows(self):
+        chunks = _collect(write_csv(COLUMNS, _batches()))
+        assert chunks[0].decode("utf-8-sig") == "branch_id,date,item_name,amount\r\n"
+        assert len(chunks) == 1 + len(BATCHES)
+
+    def test_rows_round_trip(self):
+        data = b"".join(_collect(write_csv(COLUMNS, _batches()))).decode("utf-8-sig")
+        rows = list(csv.reader(io.StringIO(data)))
+        assert rows[1] == ["1", "2025-01-01", "Хинкали", "12.50"]
+        assert rows[2] == ["1", "2025-01-01", "", "3"]
+        assert rows[3] == ["2", "2025-01-02", 'Соус "ткемали", 50 г', "0.75"]
+
+    def test_empty_export_has_header(self):
+        data = b"".join(_collect(write_csv(COLUMNS, _batches([]))))
+        assert data.decode("utf-8-sig") == "branch_id,date,item_name,amount\r\n"
+
+
+# ── optional writers ───────────────────────────────────────────
+
+
+class TestWriteParquet:
+    def test_round_trip(self):
+        pq = pytest.importorskip("pyarrow.parquet")
+        data = b"".join(_collect(write_parquet(COLUMNS, _batches())))
+        table = pq.read_table(io.BytesIO(data))
+        assert table.num_rows == 3
+        assert table.column("amount").to_pylist()[0] == Decimal("12.50")
+        assert table.column("date").to_pylist()[2] == date(2025, 1, 2)
+
+
+class TestWriteXlsx:
+    def test_round_trip(self):
+        openpyxl = pytest.importorskip("openpyxl")
+        data = b"".join(_collect(write_xlsx(COLUMNS, _batches(), "revenue")))
+        sheet = openpyxl.load_workbook(io.BytesIO(data), read_only=True)["revenue"]
+        rows = list(sheet.iter_rows(values_only=True))
+        assert rows[0] == ("branch_id", "date", "item_name", "amount")
+        assert len(rows) == 4
+
+    def test_splits_sheets_at_row_limit(self, monkeypatch):
+        openpyxl = pytest.importorskip("openpyxl")
+        monkeypatch.setattr("app.services.export_service.XLSX_MAX_ROWS", 2)
+        data = b"".join(_collect(write_xlsx(COLUMNS, _batches(), "revenue")))
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True)
+        assert workbook.sheetnames == ["revenue", "revenue (2)"]
+
+
+# ── helpers ────────────────────────────────────────────────────
+
+
+class TestDrain:
+    def test_take_empties(self):
+        sink = _Drain()
+        sink.write(b"abc")
+        sink.write(memoryview(b"de"))
+        assert sink.tell() == 5
+        assert sink.take() == b"abcde"
+        assert sink.take() == b""
+        assert sink.tell() == 5
+
+
+class TestDatasets:
+    def test_branch_id_leads_every_dataset(self):
+        for spec in DATASETS.values():
+            assert spec.columns[0] == ("branch_id", "int")
+
+    def test_csv_needs_no_extra(self):
+        check_format("csv")
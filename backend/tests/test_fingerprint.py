@@ -0,0 +1,42 @@
+"""Unit tests for sync payload fingerprints."""
+
+from datetime import date
+from decimal import Decimal
+
+from app.services.fingerprint import Fingerprint, payload_fingerprint
+
+
+ROWS = [
+    {"date": date(2026, 2, 1), "item_name": "Хинкали", "revenue_amount": Decimal("100")},
+    {"date": date(2026, 2, 1), "item_name": "Узвар", "revenue_amount": Decimal("50")},
+]
+
+
+# ── payload_fingerprint ────────────────────────────────────────
+
+
+class TestPayloadFingerprint:
+    def test_order_independent(self):
+        assert payload_fingerprint(ROWS) == payload_fingerprint(list(reversed(ROWS)))
+
+    def test_ignores_batch_id(self):
+        a = [{**r, "sync_batch_id": "a"} for r in ROWS]
+        b = [{**r, "sync_batch_id": "b"} for r in ROWS]
+        assert payload_fingerprint(a) == payload_fingerprint(b)
+
+    def test_value_change_detected(self):
+        changed = [ROWS[0], {**ROWS[1], "revenue_amount": Decimal("51")}]
+        assert payload_fingerprint(changed) != payload_fingerprint(ROWS)
+
+    def test_duplicate_row_detected(self):
+        assert payload_fingerprint(ROWS + [ROWS[0]]) != payload_fingerprint(ROWS)
+
+    def test_empty_payload(self):
+        assert payload_fingerprint([]).startswith("0:")
+
+    def test_incremental_matches_one_shot(self):
+        fingerprint = Fingerprint()
+        fingerprint.update(ROWS[:1])
+        fingerprint.update(ROWS[1:])
+        assert fingerprint.hexdigest() == payload_fingerprint(ROWS)
+        assert fingerprint.count == 2
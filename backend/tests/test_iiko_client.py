@@ -0,0 +1,215 @@
+"""Unit tests for IikoClient XML parsing and the shared session manager."""
+
+import asyncio
+
+import httpx
+import pytest
+from lxml import etree
+
+from app.services.iiko_client import IikoClient, IikoSessionManager, _drain_events
+from app.services.resilience import CircuitBreaker
+
+
+ATTENDANCE_XML = (
+    b"<attendances>"
+    b"<attendance><id>a1</id><employeeId>e1</employeeId>"
+    b"<paymentDetails><regularPaymentSum>1000</regularPaymentSum>"
+    b"<overtimePayedSum>50</overtimePayedSum></paymentDetails></attendance>"
+    b"<attendance><id>a2</id><employeeId>e2</employeeId></attendance>"
+    b"</attendances>"
+)
+
+
+# ── _parse_attendance_xml ──────────────────────────────────────
+
+
+class TestParseAttendanceXml:
+    def test_flattens_payment_details(self):
+        records = IikoClient._parse_attendance_xml(ATTENDANCE_XML)
+        assert records[0] == {
+            "id": "a1",
+            "employeeId": "e1",
+            "regularPaymentSum": "1000",
+            "overtimePayedSum": "50",
+        }
+        assert records[1] == {"id": "a2", "employeeId": "e2"}
+
+
+# ── _drain_events ──────────────────────────────────────────────
+
+
+class TestDrainEvents:
+    def test_chunked_feed_matches_buffered_parse(self):
+        parser = etree.XMLPullParser(events=("end",), tag="attendance")
+        records = []
+        for i in range(0, len(ATTENDANCE_XML), 7):
+            parser.feed(ATTENDANCE_XML[i : i + 7])
+            records.extend(IikoClient._attendance_record(e) for e in _drain_events(parser))
+        parser.close()
+        records.extend(IikoClient._attendance_record(e) for e in _drain_events(parser))
+        assert records == IikoClient._parse_attendance_xml(ATTENDANCE_XML)
+
+    def test_processed_elements_are_released(self):
+        parser = etree.XMLPullParser(events=("end",), tag="attendance")
+        parser.feed(ATTENDANCE_XML)
+        parser.close()
+        elements = list(_drain_events(parser))
+        root = elements[-1].getparent()
+        assert len(root) == 1
+        assert len(elements[-1]) == 0
+
+
+# ── IikoSessionManager token pool ──────────────────────────────
+
+
+class _CountingManager(IikoSessionManager):
+    """Session manager whose logins hand out numbered tokens without network."""
+
+    def __init__(self, max_tokens: int):
+        super().__init__(max_tokens)
+        self.logins = 0
+
+    async def _login_request(self) -> str:
+        self.logins += 1
+        token = f"tok-{self.logins}"
+        await asyncio.sleep(0)
+        return token
+
+
+async def _hold_leases(manager: IikoSessionManager, n: int) -> list[str]:
+    async def hold() -> str:
+        async with manager.lease() as token:
+            await asyncio.sleep(0.01)
+            return token
+
+    return await asyncio.gather(*(hold() for _ in range(n)))
+
+
+class TestSessionManager:
+    def test_tokens_capped_and_shared(self):
+        manager = _CountingManager(max_tokens=2)
+        tokens = asyncio.run(_hold_leases(manager, 10))
+        assert manager.logins == 2
+        assert set(tokens) == {"tok-1", "tok-2"}
+
+    def test_token_reused_between_calls(self):
+        manager = _CountingManager(max_tokens=3)
+
+        async def sequential():
+            for _ in range(5):
+                async with manager.lease():
+                    pass
+
+        asyncio.run(sequential())
+        assert manager.logins == 1
+
+    def test_invalidated_token_replaced(self):
+        manager = _CountingManager(max_tokens=1)
+
+        async def run():
+            async with manager.lease() as first:
+                pass
+            manager.invalidate(first)
+            async with manager.lease() as second:
+                return first, second
+
+        assert asyncio.run(run()) == ("tok-1", "tok-2")
+
+    def test_throttle_caps_concurrency_per_class(self):
+        manager = _CountingManager(max_tokens=1)
+        manager._bucket.rate = 0  # isolate the semaphores
+        active = {"olap": 0, "reference": 0}
+        peak = {"olap": 0, "reference": 0}
+
+        async def call(endpoint: str):
+            async with manager.throttle(endpoint):
+                active[endpoint] += 1
+                peak[endpoint] = max(peak[endpoint], active[endpoint])
+                await asyncio.sleep(0.01)
+                active[endpoint] -= 1
+
+        async def run():
+            await asyncio.gather(
+                *(call("olap") for _ in range(6)), *(call("reference") for _ in range(6))
+            )
+
+        asyncio.run(run())
+        assert peak["olap"] == 2
+        assert peak["reference"] == 4
+
+
+# ── circuit breaker probes ─────────────────────────────────────
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _half_open_client(handler, tokens: list[str]) -> tuple[IikoClient, CircuitBreaker]:
+    """Client on a mock transport whose breaker has just turned half-open."""
+    manager = IikoSessionManager(max_tokens=1)
+    manager._bind_loop()
+    manager._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    manager._bucket.rate = 0
+    manager._tokens = dict.fromkeys(tokens, 0)
+    clock = FakeClock()
+    manager.breaker = CircuitBreaker(1, 60, clock=clock)
+    manager.breaker.record_failure()
+    clock.now = 61
+    return IikoClient(manager), manager.breaker
+
+
+def _reply(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/auth"):
+        return httpx.Response(200, text="fresh")
+    if request.url.params.get("key") != "fresh":
+        return httpx.Response(401)
+    return httpx.Response(200, json={"ok": True})
+
+
+class TestBreakerProbe:
+    def test_probe_with_expired_token_relogs_in(self, monkeypatch):
+        monkeypatch.setattr("app.services.iiko_client.settings.IIKO_RETRY_ATTEMPTS", 1)
+
+        async def run():
+            client, breaker = _half_open_client(_reply, ["expired"])
+            resp = await client._request("GET", "/resto/api/employees")
+            return resp.json(), breaker.state
+
+        assert asyncio.run(run()) == ({"ok": True}, "closed")
+
+    def test_probe_that_must_log_in(self, monkeypatch):
+        monkeypatch.setattr("app.services.iiko_client.settings.IIKO_RETRY_ATTEMPTS", 1)
+
+        async def run():
+            client, breaker = _half_open_client(_reply, [])
+            resp = await client._request("GET", "/resto/api/employees")
+            return resp.json(), breaker.state
+
+        assert asyncio.run(run()) == ({"ok": True}, "closed")
+
+    def test_cancelled_probe_released(self):
+        hang = True
+
+        async def handler(request):
+            if hang:
+                await asyncio.Event().wait()
+            return _reply(request)
+
+        async def run():
+            nonlocal hang
+            client, breaker = _half_open_client(handler, ["fresh"])
+            probe = asyncio.create_task(client._request("GET", "/resto/api/employees"))
+            await asyncio.sleep(0.01)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+            hang = False
+            resp = await client._request("GET", "/resto/api/employees")
+            return resp.status_code, breaker.state
+
+        assert asyncio.run(run()) == (200, "closed")
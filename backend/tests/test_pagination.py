@@ -0,0 +1,49 @@
+"""Unit tests for keyset pagination cursors."""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.services.pagination import SortKey, decode_cursor, encode_cursor
+
+DATE_KEY = SortKey(None, date.fromisoformat)
+AMOUNT_KEY = SortKey(None, Decimal)
+ITEM_KEY = SortKey(None, str)
+
+
+# ── cursors ────────────────────────────────────────────────────
+
+
+class TestCursor:
+    def test_round_trip_date(self):
+        cursor = encode_cursor("date", "asc", date(2025, 3, 1), 42)
+        assert decode_cursor(cursor, "date", "asc", DATE_KEY) == (date(2025, 3, 1), 42)
+
+    def test_round_trip_amount_keeps_precision(self):
+        cursor = encode_cursor("amount", "desc", Decimal("1234.50"), 7)
+        assert decode_cursor(cursor, "amount", "desc", AMOUNT_KEY) == (Decimal("1234.50"), 7)
+
+    def test_round_trip_unicode_item(self):
+        cursor = encode_cursor("item", "asc", "Хинкали с говядиной", 3)
+        assert decode_cursor(cursor, "item", "asc", ITEM_KEY) == ("Хинкали с говядиной", 3)
+
+    def test_url_safe(self):
+        cursor = encode_cursor("item", "asc", "a/b+c?d", 1)
+        assert all(ch not in cursor for ch in "+/=?&")
+
+    def test_other_sort_rejected(self):
+        cursor = encode_cursor("date", "asc", date(2025, 3, 1), 42)
+        with pytest.raises(ValueError, match="different sort"):
+            decode_cursor(cursor, "amount", "asc", AMOUNT_KEY)
+        with pytest.raises(ValueError, match="different sort"):
+            decode_cursor(cursor, "date", "desc", DATE_KEY)
+
+    def test_garbage_rejected(self):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor("not-a-cursor", "date", "asc", DATE_KEY)
+
+    def test_bad_value_rejected(self):
+        cursor = encode_cursor("date", "asc", "yesterday", 1)
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_cursor(cursor, "date", "asc", DATE_KEY)
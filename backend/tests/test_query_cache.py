@@ -0,0 +1,142 @@
+"""Unit tests for the dashboard query cache."""
+
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.services import query_cache
+from app.services.query_cache import MemoryCache, _on_notify, cache_key, cached
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache_state(monkeypatch):
+    """A fresh memory backend with generations followed for branch 1."""
+    monkeypatch.setattr(query_cache, "backend", MemoryCache(16, 60))
+    monkeypatch.setattr(query_cache, "_generations", {1: 3})
+    monkeypatch.setattr(query_cache, "_listening", True)
+    return query_cache
+
+
+def _counting_compute():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    return compute, calls
+
+
+D1, D2 = date(2025, 1, 1), date(2025, 1, 31)
+
+
+# ── MemoryCache ────────────────────────────────────────────────
+
+
+class TestMemoryCache:
+    def test_hit_and_miss(self):
+        cache = MemoryCache(4, 60, clock=FakeClock())
+        asyncio.run(cache.set("a", 1))
+        assert asyncio.run(cache.get("a")) == 1
+        assert asyncio.run(cache.get("b")) is query_cache._MISSING
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(2, 60, clock=FakeClock())
+
+        async def run():
+            await cache.set("a", 1)
+            await cache.set("b", 2)
+            await cache.get("a")  # "b" is now least recently used
+            await cache.set("c", 3)
+            return [await cache.get(k) for k in ("a", "b", "c")]
+
+        assert asyncio.run(run()) == [1, query_cache._MISSING, 3]
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = MemoryCache(4, 60, clock=clock)
+        asyncio.run(cache.set("a", 1))
+        clock.now = 59
+        assert asyncio.run(cache.get("a")) == 1
+        clock.now = 60
+        assert asyncio.run(cache.get("a")) is query_cache._MISSING
+        assert len(cache) == 0
+
+    def test_falsy_values_cached(self):
+        cache = MemoryCache(4, 60, clock=FakeClock())
+        asyncio.run(cache.set("empty", []))
+        assert asyncio.run(cache.get("empty")) == []
+
+
+# ── cache_key ──────────────────────────────────────────────────
+
+
+class TestCacheKey:
+    def test_generation_changes_key(self):
+        assert cache_key("kpf", 1, D1, D2, 1) != cache_key("kpf", 1, D1, D2, 2)
+
+    def test_parts(self):
+        assert cache_key("labor", 2, D1, D2, 5) == "kpf:labor:2:2025-01-01:2025-01-31:5"
+
+
+# ── cached ─────────────────────────────────────────────────────
+
+
+class TestCached:
+    def test_second_call_served_from_cache(self, cache_state):
+        compute, calls = _counting_compute()
+        first = asyncio.run(cached("kpf", 1, D1, D2, compute))
+        second = asyncio.run(cached("kpf", 1, D1, D2, compute))
+        assert first == second == {"n": 1}
+        assert len(calls) == 1
+
+    def test_ranges_and_endpoints_separate(self, cache_state):
+        compute, calls = _counting_compute()
+        asyncio.run(cached("kpf", 1, D1, D2, compute))
+        asyncio.run(cached("kpf", 1, D1, D1, compute))
+        asyncio.run(cached("labor", 1, D1, D2, compute))
+        assert len(calls) == 3
+
+    def test_generation_bump_recomputes(self, cache_state):
+        compute, calls = _counting_compute()
+        asyncio.run(cached("kpf", 1, D1, D2, compute))
+        _on_notify(None, 0, query_cache.GENERATION_CHANNEL, "1:4")
+        assert asyncio.run(cached("kpf", 1, D1, D2, compute)) == {"n": 2}
+
+    def test_stale_notify_ignored(self, cache_state):
+        _on_notify(None, 0, query_cache.GENERATION_CHANNEL, "1:2")
+        assert cache_state._generations[1] == 3
+
+    def test_malformed_notify_ignored(self, cache_state):
+        for payload in ("", "1", "1:x", "1:2:3", None):
+            _on_notify(None, 0, query_cache.GENERATION_CHANNEL, payload)
+        assert cache_state._generations == {1: 3}
+
+    def test_bypass_when_not_listening(self, cache_state, monkeypatch):
+        monkeypatch.setattr(query_cache, "_listening", False)
+        compute, calls = _counting_compute()
+        asyncio.run(cached("kpf", 1, D1, D2, compute))
+        asyncio.run(cached("kpf", 1, D1, D2, compute))
+        assert len(calls) == 2
+
+    def test_bypass_unknown_branch(self, cache_state):
+        compute, calls = _counting_compute()
+        asyncio.run(cached("kpf", 9, D1, D2, compute))
+        asyncio.run(cached("kpf", 9, D1, D2, compute))
+        assert len(calls) == 2
+
+    def test_bypass_when_disabled(self, cache_state, monkeypatch):
+        monkeypatch.setattr(query_cache.settings, "CACHE_ENABLED", False)
+        compute, calls = _counting_compute()
+        asyncio.run(cached("kpf", 1, D1, D2, compute))
+        asyncio.run(cached("kpf", 1, D1, D2, compute))
+        assert len(calls) == 2
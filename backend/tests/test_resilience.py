@@ -0,0 +1,211 @@
+"""Unit tests for iiko retry, backoff, circuit-breaker and throttling helpers."""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryStats,
+    TokenBucket,
+    backoff_delay,
+    endpoint_class,
+    endpoint_concurrency,
+    parse_retry_after,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# ── endpoint_class ─────────────────────────────────────────────
+
+
+class TestEndpointClass:
+    def test_olap(self):
+        assert endpoint_class("/resto/api/v2/reports/olap") == "olap"
+
+    def test_documents(self):
+        assert endpoint_class("/resto/api/v2/documents/writeoff") == "documents"
+        assert endpoint_class("/resto/api/employees/attendance") == "documents"
+
+    def test_auth(self):
+        assert endpoint_class("/resto/api/auth") == "auth"
+        assert endpoint_class("/resto/api/logout") == "auth"
+
+    def test_reference_default(self):
+        assert endpoint_class("/resto/api/corporation/departments") == "reference"
+        assert endpoint_class("/resto/api/v2/entities/list") == "reference"
+
+
+class TestEndpointConcurrency:
+    def test_auth_ungated(self):
+        assert endpoint_concurrency("auth") is None
+
+    def test_olap_gated(self):
+        assert endpoint_concurrency("olap") >= 1
+
+
+# ── parse_retry_after ──────────────────────────────────────────
+
+
+class TestParseRetryAfter:
+    def test_missing(self):
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("") is None
+
+    def test_seconds(self):
+        assert parse_retry_after("7") == 7.0
+
+    def test_http_date(self):
+        when = datetime.now(timezone.utc) + timedelta(seconds=30)
+        assert 25 <= parse_retry_after(format_datetime(when, usegmt=True)) <= 30
+
+    def test_past_date_is_zero(self):
+        when = datetime.now(timezone.utc) - timedelta(minutes=5)
+        assert parse_retry_after(format_datetime(when, usegmt=True)) == 0.0
+
+    def test_garbage(self):
+        assert parse_retry_after("soon") is None
+
+
+# ── backoff_delay ──────────────────────────────────────────────
+
+
+class TestBackoffDelay:
+    def test_exponential_ceiling(self):
+        top = [backoff_delay(n, 0.5, 30, rng=lambda: 1.0) for n in (1, 2, 3, 4)]
+        assert top == [0.5, 1.0, 2.0, 4.0]
+
+    def test_capped(self):
+        assert backoff_delay(20, 0.5, 30, rng=lambda: 1.0) == 30
+
+    def test_full_jitter(self):
+        assert backoff_delay(3, 0.5, 30, rng=lambda: 0.0) == 0.0
+        assert backoff_delay(3, 0.5, 30, rng=lambda: 0.5) == 1.0
+
+    def test_retry_after_wins(self):
+        assert backoff_delay(1, 0.5, 30, retry_after=12, rng=lambda: 0.0) == 12
+
+    def test_retry_after_capped(self):
+        assert backoff_delay(1, 0.5, 30, retry_after=600) == 30
+
+
+# ── RetryStats ─────────────────────────────────────────────────
+
+
+class TestRetryStats:
+    def test_record_retry(self):
+        stats = RetryStats()
+        stats.record_retry("olap", 1.5)
+        stats.record_retry("olap", 0.5)
+        stats.record_retry("documents", 1.0)
+        snap = stats.snapshot()
+        assert snap["retries"] == 3
+        assert snap["retry_wait_seconds"] == 3.0
+        assert snap["retries_by_endpoint"] == {"olap": 2, "documents": 1}
+
+
+# ── CircuitBreaker ─────────────────────────────────────────────
+
+
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(3, 60, clock=FakeClock())
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_success_resets_count(self):
+        breaker = CircuitBreaker(3, 60, clock=FakeClock())
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_single_probe(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(1, 60, clock=clock)
+        breaker.record_failure()
+        clock.now = 61
+        assert breaker.state == "half_open"
+        breaker.before_call()  # the probe
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_released_probe_lets_next_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(1, 60, clock=clock)
+        breaker.record_failure()
+        clock.now = 61
+        assert breaker.before_call() is True
+        breaker.release_probe()
+        assert breaker.before_call() is True
+
+    def test_probe_success_closes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(1, 60, clock=clock)
+        breaker.record_failure()
+        clock.now = 61
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+        breaker.before_call()
+
+    def test_probe_failure_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(5, 60, clock=clock)
+        for _ in range(5):
+            breaker.record_failure()
+        clock.now = 61
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        clock.now = 100
+        with pytest.raises(CircuitOpenError) as exc:
+            breaker.before_call()
+        assert exc.value.retry_in == pytest.approx(21)
+
+
+# ── TokenBucket ────────────────────────────────────────────────
+
+
+class TestTokenBucket:
+    def test_burst_is_free(self):
+        bucket = TokenBucket(rate=2, burst=3, clock=FakeClock())
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_waiters_queue_up(self):
+        bucket = TokenBucket(rate=2, burst=1, clock=FakeClock())
+        assert [bucket.reserve() for _ in range(4)] == [0.0, 0.5, 1.0, 1.5]
+
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, burst=2, clock=clock)
+        bucket.reserve()
+        bucket.reserve()
+        clock.now = 0.5
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == 0.5
+
+    def test_refill_capped_at_burst(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+        clock.now = 100
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.1]
+
+    def test_zero_rate_disables(self):
+        bucket = TokenBucket(rate=0, burst=1, clock=FakeClock())
+        assert all(bucket.reserve() == 0.0 for _ in range(100))
@@ -0,0 +1,49 @@
+"""Unit tests for the sync worker's job heartbeat."""
+
+import asyncio
+
+from app.worker import runner
+
+
+def _run_with_heartbeats(monkeypatch, results: list) -> tuple[bool, int]:
+    """Run a job alongside _keep_alive; heartbeats return or raise from ``results``."""
+    calls = []
+
+    async def heartbeat(job_id):
+        calls.append(job_id)
+        result = results[len(calls) - 1] if len(calls) <= len(results) else None
+        if isinstance(result, Exception):
+            raise result
+
+    monkeypatch.setattr(runner, "heartbeat", heartbeat)
+
+    async def run():
+        work = asyncio.create_task(asyncio.sleep(0.05))
+        beating = asyncio.create_task(runner._keep_alive(7, work, 0.001))
+        try:
+            await work
+        except asyncio.CancelledError:
+            pass
+        beating.cancel()
+        return work.cancelled()
+
+    return asyncio.run(run()), len(calls)
+
+
+# ── _keep_alive ────────────────────────────────────────────────
+
+
+class TestKeepAlive:
+    def test_isolated_failures_tolerated(self, monkeypatch):
+        monkeypatch.setattr(runner.settings, "SYNC_JOB_HEARTBEAT_FAILURES", 2)
+        errors = [ConnectionError("blip"), None] * 50
+        cancelled, beats = _run_with_heartbeats(monkeypatch, errors)
+        assert not cancelled
+        assert beats > 2
+
+    def test_consecutive_failures_cancel_job(self, monkeypatch):
+        monkeypatch.setattr(runner.settings, "SYNC_JOB_HEARTBEAT_FAILURES", 3)
+        errors = [None] + [ConnectionError("down")] * 100
+        cancelled, beats = _run_with_heartbeats(monkeypatch, errors)
+        assert cancelled
+        assert beats == 4
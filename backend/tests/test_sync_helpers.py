@@ -1,9 +1,25 @@
 """Unit tests for sync_service helper functions."""
 
-from datetime import datetime
+import asyncio
+from datetime import date, datetime
 from decimal import Decimal
 
-from app.services.sync_service import _parse_datetime, _safe_decimal, _safe_int
+from app.services.backfill_service import split_range
+from app.services.sync_service import (
+    _attendance_row,
+    _demux_by_department,
+    _docs_for_department,
+    SharedSyncData,
+    _SalesFanOut,
+    _fetch_shared,
+    _parse_datetime,
+    _revenue_row,
+    _row_date,
+    _safe_decimal,
+    _safe_int,
+    _split_shared_by_day,
+    _writeoff_rows,
+)
 
 
 # ── _parse_datetime ─────────────────────────────────────────────
@@ -75,3 +91,420 @@ class TestSafeInt:
 
     def test_float_truncates(self):
         assert _safe_int(3.9) == 3
+
+
+# ── _docs_for_department ───────────────────────────────────────
+
+
+class TestDocsForDepartment:
+    DOCS = [
+        {"documentNumber": "1", "storeId": "store-a"},
+        {"documentNumber": "2", "storeId": "store-b"},
+        {"documentNumber": "3", "storeId": "store-unknown"},
+    ]
+    STORES = {"store-a": "dept-a", "store-b": "dept-b"}
+
+    def test_filters_by_store_department(self):
+        docs = _docs_for_department(self.DOCS, self.STORES, "dept-a", single_branch=False)
+        assert [d["documentNumber"] for d in docs] == ["1"]
+
+    def test_unmapped_store_dropped_in_multi_branch(self):
+        docs = _docs_for_department(self.DOCS, self.STORES, "dept-c", single_branch=False)
+        assert docs == []
+
+    def test_single_branch_keeps_everything(self):
+        docs = _docs_for_department(self.DOCS, {}, "dept-a", single_branch=True)
+        assert docs == self.DOCS
+
+
+# ── _demux_by_department ───────────────────────────────────────
+
+
+def _demux(rows: list[dict], department_ids: list[str]) -> dict[str, list[dict]]:
+    async def stream():
+        for row in rows:
+            yield row
+
+    return asyncio.run(_demux_by_department(stream(), department_ids))
+
+
+class TestDemuxByDepartment:
+    def test_rows_split_per_department(self):
+        rows = [
+            {"Department.Id": "a", "DishName": "x"},
+            {"Department.Id": "b", "DishName": "y"},
+            {"Department.Id": "a", "DishName": "z"},
+        ]
+        buckets = _demux(rows, ["a", "b"])
+        assert [r["DishName"] for r in buckets["a"]] == ["x", "z"]
+        assert [r["DishName"] for r in buckets["b"]] == ["y"]
+
+    def test_department_without_rows_gets_empty_bucket(self):
+        assert _demux([], ["a"]) == {"a": []}
+
+    def test_unknown_department_ignored(self):
+        buckets = _demux([{"Department.Id": "zzz"}], ["a"])
+        assert buckets == {"a": []}
+
+
+# ── _SalesFanOut ───────────────────────────────────────────────
+
+
+class TestSalesFanOut:
+    def test_rows_reach_readers_before_report_ends(self):
+        async def scenario():
+            more = asyncio.Event()
+
+            async def report():
+                yield {"Department.Id": "a", "DishName": "x"}
+                await more.wait()
+                yield {"Department.Id": "b", "DishName": "y"}
+
+            fan_out = _SalesFanOut(report(), ["a", "b"], depth=2)
+            a, b = fan_out.stream("a"), fan_out.stream("b")
+            first = await asyncio.wait_for(anext(a), 1)
+            more.set()
+            rest_a = [r async for r in a]
+            rest_b = [r async for r in b]
+            await fan_out.close()
+            return first, rest_a, rest_b
+
+        first, rest_a, rest_b = asyncio.run(scenario())
+        assert first == {"Department.Id": "a", "DishName": "x"}
+        assert rest_a == []
+        assert [r["DishName"] for r in rest_b] == ["y"]
+
+    def test_queue_bounded_per_department(self):
+        async def scenario():
+            read = 0
+
+            async def report():
+                nonlocal read
+                for i in range(10):
+                    read += 1
+                    yield {"Department.Id": "a", "n": i}
+
+            fan_out = _SalesFanOut(report(), ["a"], depth=2)
+            for _ in range(5):
+                await asyncio.sleep(0)
+            ahead = read
+            rows = [r async for r in fan_out.stream("a")]
+            await fan_out.close()
+            return ahead, rows
+
+        ahead, rows = asyncio.run(scenario())
+        assert ahead <= 3  # two queued plus the one waiting to be put
+        assert [r["n"] for r in rows] == list(range(10))
+
+    def test_released_department_does_not_block_others(self):
+        async def scenario():
+            async def report():
+                for i in range(5):
+                    yield {"Department.Id": "b", "n": i}
+                    yield {"Department.Id": "a", "n": i}
+
+            fan_out = _SalesFanOut(report(), ["a", "b"], depth=1)
+            fan_out.release("b")  # e.g. that branch failed before reading
+            rows = await asyncio.wait_for(_collect(fan_out.stream("a")), 1)
+            await fan_out.close()
+            return rows
+
+        assert [r["n"] for r in asyncio.run(scenario())] == list(range(5))
+
+    def test_report_failure_raised_in_every_stream(self):
+        async def scenario():
+            async def report():
+                yield {"Department.Id": "a"}
+                raise RuntimeError("olap down")
+
+            fan_out = _SalesFanOut(report(), ["a", "b"], depth=2)
+            outcomes = await asyncio.gather(
+                _collect(fan_out.stream("a")),
+                _collect(fan_out.stream("b")),
+                return_exceptions=True,
+            )
+            await fan_out.close()
+            return outcomes
+
+        outcomes = asyncio.run(scenario())
+        assert all(isinstance(o, RuntimeError) for o in outcomes)
+
+
+async def _collect(rows) -> list[dict]:
+    return [r async for r in rows]
+
+
+# ── bulk row builders ──────────────────────────────────────────
+
+
+class TestRevenueRow:
+    def test_maps_olap_fields(self):
+        row = _revenue_row(
+            {
+                "OrderType": "Доставка",
+                "Delivery.SourceKey": "Broniboy",
+                "DishName": "Хинкали с мясом",
+                "DishDiscountSumInt": "550.5",
+                "DishAmountInt": "5",
+            },
+            branch_id=1,
+            target_date=date(2026, 2, 1),
+            batch_id="b1",
+        )
+        assert row["branch_id"] == 1
+        assert row["date"] == date(2026, 2, 1)
+        assert row["order_type_detail"] == "Доставка"
+        assert row["delivery_source"] == "Broniboy"
+        assert row["revenue_amount"] == Decimal("550.5")
+        assert row["order_count"] == 5
+        assert row["item_quantity"] == Decimal("5")
+        assert row["sync_batch_id"] == "b1"
+
+    def test_dated_by_open_date(self):
+        row = _revenue_row({"OpenDate.Typed": "2026-02-03"}, 1, date(2026, 2, 1), "b1")
+        assert row["date"] == date(2026, 2, 3)
+
+
+class TestAttendanceRow:
+    def test_computes_duration_and_payment(self):
+        row = _attendance_row(
+            {
+                "id": "a1",
+                "employeeId": "e1",
+                "roleId": "r1",
+                "dateFrom": "2026-02-01T10:00:00+03:00",
+                "dateTo": "2026-02-01T18:30:00+03:00",
+                "regularPaymentSum": "1000",
+                "overtimePayedSum": "50.555",
+            },
+            role_map={"r1": "Повар"},
+            employee_map={"e1": "Иван"},
+            branch_id=1,
+            date_str="2026-02-01",
+            batch_id="b1",
+        )
+        assert row["worked_minutes"] == 510
+        assert row["worked_hours"] == Decimal("8.5")
+        assert row["iiko_payment_sum"] == Decimal("1050.56")
+        assert row["role_name"] == "Повар"
+        assert row["employee_name"] == "Иван"
+
+    def test_missing_id_skipped(self):
+        assert _attendance_row({}, {}, {}, 1, "2026-02-01", "b1") is None
+
+
+class TestWriteoffRows:
+    def test_one_row_per_item(self):
+        doc = {
+            "status": "PROCESSED",
+            "documentNumber": "W-1",
+            "items": [
+                {"productId": "p1", "cost": "10", "amount": "2"},
+                {"productId": "p2", "cost": "5", "amount": "0"},
+            ],
+        }
+        rows = _writeoff_rows(doc, {"p1": "Мука"}, {}, 1, date(2026, 2, 1), "b1")
+        assert [r["article_name"] for r in rows] == ["p1", "p2"]
+        assert rows[0]["product_name"] == "Мука"
+        assert rows[0]["item_quantity"] == Decimal("2")
+        assert rows[1]["item_quantity"] is None
+
+    def test_natural_key(self):
+        doc = {
+            "id": "doc-uuid",
+            "status": "PROCESSED",
+            "documentNumber": "W-1",
+            "items": [{"num": 3, "productId": "p1"}, {"productId": "p2"}],
+        }
+        rows = _writeoff_rows(doc, {}, {}, 1, date(2026, 2, 1), "b1")
+        assert [(r["iiko_document_id"], r["line_number"]) for r in rows] == [
+            ("doc-uuid", 3),
+            ("doc-uuid", 2),  # no num: position in the document
+        ]
+
+    def test_document_number_fallback_key(self):
+        doc = {"status": "PROCESSED", "documentNumber": "W-1", "items": [{"productId": "p1"}]}
+        rows = _writeoff_rows(doc, {}, {}, 1, date(2026, 2, 1), "b1")
+        assert rows[0]["iiko_document_id"] == "W-1"
+
+    def test_doc_without_key_skipped(self):
+        doc = {"status": "PROCESSED", "items": [{"productId": "p1"}]}
+        assert _writeoff_rows(doc, {}, {}, 1, date(2026, 2, 1), "b1") == []
+
+    def test_unprocessed_doc_skipped(self):
+        assert _writeoff_rows({"status": "NEW", "items": [{}]}, {}, {}, 1, date(2026, 2, 1), "b1") == []
+
+
+# ── _row_date ──────────────────────────────────────────────────
+
+
+class TestRowDate:
+    def test_datetime_string(self):
+        assert _row_date("2026-02-03T12:00:00", date(2026, 1, 1)) == date(2026, 2, 3)
+
+    def test_missing_uses_default(self):
+        assert _row_date(None, date(2026, 1, 1)) == date(2026, 1, 1)
+
+
+# ── split_range ────────────────────────────────────────────────
+
+
+class TestSplitRange:
+    def test_week_chunks_with_remainder(self):
+        chunks = split_range(date(2026, 1, 1), date(2026, 1, 17), 7)
+        assert chunks == [
+            (date(2026, 1, 1), date(2026, 1, 7)),
+            (date(2026, 1, 8), date(2026, 1, 14)),
+            (date(2026, 1, 15), date(2026, 1, 17)),
+        ]
+
+    def test_single_day(self):
+        assert split_range(date(2026, 1, 1), date(2026, 1, 1), 7) == [
+            (date(2026, 1, 1), date(2026, 1, 1))
+        ]
+
+    def test_empty_when_reversed(self):
+        assert split_range(date(2026, 1, 2), date(2026, 1, 1), 7) == []
+
+
+# ── _fetch_shared ──────────────────────────────────────────────
+
+
+class _SlowClient:
+    """IikoClient stand-in where every call takes ``delay`` seconds.
+
+    ``max_in_flight`` records how many payload calls (SALES, attendance,
+    documents) were ever waiting at once; dictionary lookups are not counted.
+    """
+
+    def __init__(
+        self, delay: float = 0.05, writeoffs_fail: bool = False, failing=("accounts",)
+    ):
+        self.delay = delay
+        self.writeoffs_fail = writeoffs_fail
+        self.failing = failing
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _wait(self, payload: bool = False):
+        self.in_flight += payload
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= payload
+
+    async def iter_olap_report(self, **kwargs):
+        await self._wait(payload=True)
+        for dept in kwargs["filters"]["Department.Id"]["values"]:
+            yield {"Department.Id": dept, "DishName": "Хинкали"}
+
+    async def iter_attendance(self, date_from, date_to):
+        await self._wait(payload=True)
+        yield {"departmentId": "d1", "roleId": "r1", "employeeId": "e1"}
+        yield {"departmentId": "other", "roleId": "r2", "employeeId": "e2"}
+
+    async def get_writeoff_documents(self, date_from, date_to):
+        await self._wait(payload=True)
+        if self.writeoffs_fail:
+            raise RuntimeError("documents down")
+        return [{"storeId": "s1", "accountId": "a1", "items": []}]
+
+    async def get_reference(self, kind, required=()):
+        await self._wait()
+        if kind in self.failing:
+            raise RuntimeError(f"{kind} down")
+        return {key: kind for key in required}
+
+
+class TestFetchShared:
+    def test_fetch_chains_run_concurrently(self):
+        client = _SlowClient(delay=0.01)
+        shared = asyncio.run(
+            _fetch_shared(client, "2026-02-01", "2026-02-01", ["d1", "d2"], combine_sales=True)
+        )
+        # SALES, attendance and documents are requested side by side, not in turn
+        assert client.max_in_flight == 3
+        assert shared.revenue_rows == {
+            "d1": [{"Department.Id": "d1", "DishName": "Хинкали"}],
+            "d2": [{"Department.Id": "d2", "DishName": "Хинкали"}],
+        }
+        assert [a["employeeId"] for a in shared.attendance] == ["e1"]
+        assert shared.role_map == {"r1": "roles"}
+
+    def test_failed_dictionary_keeps_documents(self):
+        shared = asyncio.run(_fetch_shared(_SlowClient(0), "2026-02-01", "2026-02-01", ["d1"]))
+        assert shared.writeoff_docs is not None
+        assert shared.account_map == {}
+        assert shared.store_departments == {"s1": "store_departments"}
+        assert shared.revenue_rows is None  # SALES is streamed unless combine_sales
+
+    def test_failed_documents_skip_writeoffs(self):
+        client = _SlowClient(0, writeoffs_fail=True)
+        shared = asyncio.run(_fetch_shared(client, "2026-02-01", "2026-02-01", ["d1"]))
+        assert shared.writeoff_docs is None
+        assert shared.attendance
+
+    def test_failed_store_map_skips_writeoffs_for_several_branches(self):
+        client = _SlowClient(0, failing=("store_departments",))
+        shared = asyncio.run(_fetch_shared(client, "2026-02-01", "2026-02-01", ["d1", "d2"]))
+        assert shared.writeoff_docs is None
+
+    def test_failed_store_map_keeps_documents_for_single_branch(self):
+        client = _SlowClient(0, failing=("store_departments",))
+        shared = asyncio.run(_fetch_shared(client, "2026-02-01", "2026-02-01", ["d1"]))
+        assert shared.writeoff_docs is not None
+
+
+# ── _split_shared_by_day ───────────────────────────────────────
+
+
+class TestSplitSharedByDay:
+    def _shared(self, **kwargs) -> SharedSyncData:
+        return SharedSyncData(
+            attendance=[
+                {"id": "a1", "dateFrom": "2026-02-01T09:00:00+03:00"},
+                {"id": "a2", "dateFrom": "2026-02-02T23:30:00+03:00"},
+            ],
+            role_map={"r1": "Повар"},
+            **kwargs,
+        )
+
+    def test_one_slice_per_day(self):
+        days = _split_shared_by_day(self._shared(), date(2026, 2, 1), date(2026, 2, 3))
+        assert list(days) == [date(2026, 2, 1), date(2026, 2, 2), date(2026, 2, 3)]
+        assert [a["id"] for a in days[date(2026, 2, 2)].attendance] == ["a2"]
+        assert days[date(2026, 2, 3)].attendance == []
+        assert days[date(2026, 2, 3)].role_map == {"r1": "Повар"}
+
+    def test_revenue_split_per_department_and_day(self):
+        shared = self._shared(
+            revenue_rows={
+                "d1": [
+                    {"OpenDate.Typed": "2026-02-01", "DishName": "x"},
+                    {"OpenDate.Typed": "2026-02-02", "DishName": "y"},
+                ],
+                "d2": [],
+            }
+        )
+        days = _split_shared_by_day(shared, date(2026, 2, 1), date(2026, 2, 2))
+        assert days[date(2026, 2, 2)].revenue_rows == {
+            "d1": [{"OpenDate.Typed": "2026-02-02", "DishName": "y"}],
+            "d2": [],
+        }
+
+    def test_documents_dated_by_date_incoming(self):
+        shared = self._shared(
+            writeoff_docs=[
+                {"id": "w1", "dateIncoming": "2026-02-02T12:00:00"},
+                {"id": "w2", "dateIncoming": "2026-02-05T12:00:00"},  # outside window
+            ]
+        )
+        days = _split_shared_by_day(shared, date(2026, 2, 1), date(2026, 2, 2))
+        assert days[date(2026, 2, 1)].writeoff_docs == []
+        assert [d["id"] for d in days[date(2026, 2, 2)].writeoff_docs] == ["w1"]
+
+    def test_failed_documents_stay_unknown(self):
+        days = _split_shared_by_day(self._shared(), date(2026, 2, 1), date(2026, 2, 1))
+        assert days[date(2026, 2, 1)].writeoff_docs is None
+        assert days[date(2026, 2, 1)].revenue_rows is None